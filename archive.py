@@ -0,0 +1,141 @@
+"""
+archive - Lazy, out-of-core access to an archive of CXML files
+
+A multi-season archive of ensemble forecasts does not fit in memory once it
+has been parsed. `openArchive` instead returns a Dask DataFrame over the
+archive, with one partition per file (or per ensemble member), whose columns
+and types are fixed in advance (`ARCHIVE_COLUMNS`). Nothing is parsed when
+the archive is opened: each partition is parsed by `loadPartition` when it
+is computed, so group-bys and reductions over the archive run in parallel
+and only hold a few partitions in memory at a time.
+
+Partitions by member are located by scanning the raw bytes of each file for
+its `<data>` elements (see `chunkload.fileLayout`), which is much quicker
+than parsing it.
+
+Requires `dask[dataframe]`.
+
+"""
+
+import mmap
+import logging as log
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pandas as pd
+
+import pycxml
+import chunkload
+import merge
+
+HEADER_COLUMNS = merge.HEADER_COLUMNS
+ARCHIVE_COLUMNS = HEADER_COLUMNS + pycxml.ENSEMBLE_COLUMNS + \
+    pycxml.RADII_COLUMNS
+
+# Column types of every partition. Deterministic forecasts have a member of
+# NaN, as in `merge.stackResults`.
+ARCHIVE_DTYPES = dict({col: np.float64 for col in ARCHIVE_COLUMNS},
+                      centre=object, disturbance=object,
+                      basetime='datetime64[ns]',
+                      creationtime='datetime64[ns]',
+                      validtime='datetime64[ns]')
+
+
+def archiveMeta():
+    """
+    An empty frame with the columns and types of an archive partition.
+    """
+    return conform(pd.DataFrame(columns=ARCHIVE_COLUMNS))
+
+
+def conform(df):
+    """
+    Give a frame of fixes the columns (`ARCHIVE_COLUMNS`) and types
+    (`ARCHIVE_DTYPES`) of an archive partition. Columns that are not
+    present are filled with missing values.
+    """
+    df = df.reindex(columns=ARCHIVE_COLUMNS)
+    return pd.DataFrame({col: df[col].astype(ARCHIVE_DTYPES[col])
+                         for col in ARCHIVE_COLUMNS}, index=df.index)
+
+
+def partitions(paths, by="file", lenient=True):
+    """
+    The partitions of an archive.
+
+    :param list paths: paths of the CXML files.
+    :param str by: "file" for one partition per file, or "member" for one
+    partition per ensemble member (deterministic forecasts are still one
+    partition per file).
+    :param bool lenient: if True, a file whose members cannot be located
+    (e.g. a truncated one) is one partition, loaded by the recovering
+    parser, rather than raising an exception.
+
+    :returns: list of (path, start, end) tuples. `start` and `end` are the
+    byte offsets of a member's `<data>` element, or None for a whole file.
+    """
+    if by not in ("file", "member"):
+        raise ValueError(f"Unknown partitioning {by!r}")
+    parts = []
+    for path in paths:
+        if by == "member":
+            try:
+                with open(path, 'rb') as fh, mmap.mmap(
+                        fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    layout = chunkload.fileLayout(mm)
+            except (ValueError, ET.ParseError) as e:
+                if not lenient:
+                    raise
+                log.warning("Unable to scan %s (%s); it is one partition",
+                            path, e)
+                layout = None
+            if layout is not None:
+                parts.extend((path, start, end) for start, end in layout[2])
+                continue
+        parts.append((path, None, None))
+    log.debug("Archive of %d files in %d partitions", len(paths), len(parts))
+    return parts
+
+
+def loadPartition(part, lenient=True):
+    """
+    Parse a partition of an archive.
+
+    :param tuple part: (path, start, end) of the partition (see
+    `partitions`).
+    :param bool lenient: see `pycxml.loadfile`.
+
+    :returns: :class:`pandas.DataFrame` with the columns and types of
+    `archiveMeta`.
+    """
+    path, start, end = part
+    if start is None:
+        result = pycxml.loadfile(path, lenient=lenient)
+    else:
+        with open(path, 'rb') as fh, \
+                mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            roottag, header, _ = chunkload.fileHeader(mm)
+        result, _, errors = chunkload.parseRange(path, start, end, roottag,
+                                                 lenient)
+        attrs = pycxml.headerAttributes(header, errors if lenient else None)
+        for df in result:
+            df.attrs.update(attrs)
+    return conform(merge.stackResults([result]))
+
+
+def openArchive(paths, by="file", lenient=True):
+    """
+    Open an archive of CXML files as a lazy Dask DataFrame. Files are only
+    parsed when the partitions holding them are computed.
+
+    :param list paths: paths of the CXML files.
+    :param str by: "file" or "member" (see `partitions`).
+    :param bool lenient: see `pycxml.loadfile`.
+
+    :returns: :class:`dask.dataframe.DataFrame` with the columns
+    `ARCHIVE_COLUMNS`, and one partition per file or ensemble member.
+    """
+    import dask.dataframe as dd
+
+    return dd.from_map(loadPartition, partitions(list(paths), by, lenient),
+                       lenient=lenient, meta=archiveMeta())
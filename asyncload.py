@@ -0,0 +1,119 @@
+"""
+asyncload - Asynchronous loading of CXML data
+
+`pycxml.loadfile` blocks while it reads and parses a file. In an asyncio
+service that receives bulletins over sockets and from local storage, one
+large ensemble file would stall the event loop. `aload` reads the data
+without blocking the loop, then parses it in an executor: a thread pool by
+default, or any :class:`concurrent.futures.Executor` (e.g. a
+:class:`ProcessPoolExecutor` for large ensembles). `aload_many` loads many
+sources with a bounded number in flight.
+
+Cancelling an `aload` call stops waiting for the result. A parse that has
+not yet started in a process pool is cancelled outright; one that is
+already running completes in the background and its result is discarded.
+
+"""
+
+import os
+import asyncio
+import logging as log
+
+import pycxml
+
+
+def _readFile(path):
+    with open(path, 'rb') as fh:
+        return fh.read()
+
+
+def _parse(data, name, compact):
+    """
+    Executor function: parse an in-memory CXML document.
+    """
+    return pycxml.loadstring(data, compact=compact, name=name)
+
+
+async def readSource(source):
+    """
+    Read the contents of a source without blocking the event loop.
+
+    :param source: path to a CXML file, :class:`bytes` holding a CXML
+    document, or an :class:`asyncio.StreamReader` that yields one.
+
+    :returns: tuple of (data, name)
+    """
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source), "<bytes>"
+    if isinstance(source, asyncio.StreamReader):
+        return await source.read(), "<stream>"
+    path = os.fspath(source)
+    if not os.path.isfile(path):
+        log.error("%s is not a file", path)
+        raise IOError(f"{path} is not a file")
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, _readFile, path), path
+
+
+async def aload(source, executor=None, compact=False):
+    """
+    Load CXML data asynchronously.
+
+    :param source: path to a CXML file, :class:`bytes` holding a CXML
+    document, or an :class:`asyncio.StreamReader` that yields one.
+    :param executor: :class:`concurrent.futures.Executor` the data are
+    parsed in. The event loop's default (thread pool) executor is used if
+    None.
+    :param bool compact: see `pycxml.loadfile`.
+
+    :returns: as for `pycxml.loadfile`.
+    """
+    data, name = await readSource(source)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, _parse, data, name, compact)
+
+
+async def aload_many(sources, executor=None, limit=4, compact=False,
+                     return_exceptions=False):
+    """
+    Load many sources asynchronously, with at most `limit` in flight at
+    once. Sources are drawn from `sources` only as capacity becomes free,
+    so a long or unbounded iterable does not queue up work in advance.
+
+    :param sources: iterable of sources accepted by `aload`.
+    :param executor: executor the data are parsed in (see `aload`).
+    :param int limit: maximum number of sources being read or parsed at
+    once.
+    :param bool compact: see `pycxml.loadfile`.
+    :param bool return_exceptions: if True, an exception raised while
+    loading a source is returned in place of its result. Otherwise the
+    first exception cancels the remaining loads and is raised.
+
+    :returns: list of results, in the order of `sources`.
+    """
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    results = {}
+    queue = enumerate(sources)
+
+    async def worker():
+        for i, source in queue:
+            try:
+                results[i] = await aload(source, executor, compact)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                log.error("Failed to load %s: %s", source, e)
+                results[i] = e
+
+    tasks = [asyncio.ensure_future(worker()) for _ in range(limit)]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    return [results[i] for i in range(len(results))]
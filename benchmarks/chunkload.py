@@ -0,0 +1,59 @@
+"""
+Single-file parallel parsing benchmark for pycxml.
+
+Writes a synthetic ensemble forecast with many members to a temporary file,
+and reports the time taken to load it with `pycxml.loadfile`, and with
+`chunkload.loadParallel` for each number of worker processes given.
+
+Usage:
+
+    python benchmarks/chunkload.py [--members N] [--workers N [N ...]]
+
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "tests")]
+
+import pycxml  # noqa: E402
+import chunkload  # noqa: E402
+from make_cxml import ensembleXML  # noqa: E402
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--members", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, os.cpu_count() or 1}))
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        xmlfile = os.path.join(tmpdir, "ensemble.xml")
+        with open(xmlfile, 'w') as fh:
+            fh.write(ensembleXML(nmembers=args.members))
+        size = os.path.getsize(xmlfile) / 2 ** 20
+        print(f"{args.members} members, {size:.1f} MB")
+
+        serial = timed(pycxml.loadfile, xmlfile)
+        print(f"{'loader':<20} {'time (s)':>10} {'speedup':>8}")
+        print(f"{'loadfile':<20} {serial:>10.2f} {1.:>8.2f}")
+        for workers in args.workers:
+            elapsed = timed(chunkload.loadParallel, xmlfile, workers)
+            print(f"{f'loadParallel({workers})':<20} {elapsed:>10.2f} "
+                  f"{serial / elapsed:>8.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
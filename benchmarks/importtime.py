@@ -0,0 +1,89 @@
+"""
+Import time regression benchmark for pycxml.
+
+Runs a set of short scripts under `python -X importtime` and reports the
+cumulative import time of each, along with any heavy dependencies (numpy,
+pandas, lxml) they pulled in. Header-only calls must not import any of
+these, and validation-only calls must not import numpy or pandas. The
+script exits with a non-zero status if either rule is broken, so it can be
+used as a regression check.
+
+Usage:
+
+    python benchmarks/importtime.py [--repeat N] [xmlfile]
+
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("numpy", "pandas", "lxml")
+
+CASES = [
+    # (name, script, heavy modules the script is allowed to import)
+    ("import", "import pycxml", ()),
+    ("header", "import pycxml; pycxml.loadheader({xmlfile!r})", ()),
+    ("validate", "import pycxml\n"
+                 "try:\n"
+                 "    pycxml.validate({xmlfile!r})\n"
+                 "except AssertionError:\n"
+                 "    pass", ("lxml",)),
+    ("loadfile", "import pycxml; pycxml.loadfile({xmlfile!r})", HEAVY),
+]
+
+
+def importTimes(script):
+    """
+    Run `script` under `-X importtime`.
+
+    :returns: :class:`dict` of top-level module name to cumulative import
+    time in microseconds, for modules imported by the script.
+    """
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c",
+                           script], cwd=ROOT, capture_output=True,
+                          text=True, check=True)
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        try:
+            cumulative = int(cumulative)
+        except ValueError:
+            continue  # Header line
+        name = name.strip().split(".")[0]
+        times[name] = max(times.get(name, 0), cumulative)
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("xmlfile", nargs="?",
+                        default=os.path.join(ROOT, "tests", "test_data",
+                                             "forecast.xml"))
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    failed = False
+    print(f"{'case':<10} {'best (ms)':>10}  heavy modules imported")
+    for name, script, allowed in CASES:
+        script = script.format(xmlfile=args.xmlfile)
+        best, heavy = None, set()
+        for _ in range(args.repeat):
+            times = importTimes(script)
+            total = sum(t for m, t in times.items())
+            best = total if best is None else min(best, total)
+            heavy |= {m for m in HEAVY if m in times}
+        unexpected = heavy - set(allowed)
+        failed |= bool(unexpected)
+        flag = "  <-- unexpected" if unexpected else ""
+        print(f"{name:<10} {best / 1000.:>10.1f}  "
+              f"{', '.join(sorted(heavy)) or '-'}{flag}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
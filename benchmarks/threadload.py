@@ -0,0 +1,111 @@
+"""
+Thread pool against process pool benchmark for pycxml.
+
+Writes an archive of synthetic ensemble forecasts to a temporary directory,
+and loads (`pycxml.loadfiles`) and validates it serially, in a pool of
+worker processes, and in a pool of threads (`threadload`), reporting the
+time taken and the peak memory used for each.
+
+Each run is made in a fresh interpreter so that peak memory is measured
+separately. Memory is the peak resident set size of the parent process,
+plus that of the largest worker process times the number of workers (an
+upper bound, as pages shared by forked workers are counted in each).
+
+Usage:
+
+    python benchmarks/threadload.py [--files N] [--members N]
+        [--workers N [N ...]]
+
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "tests")]
+
+MODES = ("serial", "processes", "threads")
+
+
+def run(task, mode, workers, xmlfiles):
+    """
+    Load or validate the files in one mode; the result is printed as JSON
+    on stdout for the parent.
+    """
+    import pycxml
+    import cli
+    import threadload
+
+    start = time.perf_counter()
+    if task == "load":
+        pycxml.loadfiles(xmlfiles, workers=1 if mode == "serial" else
+                         workers, threads=mode == "threads")
+    elif mode == "threads":
+        list(threadload.validateThreaded(xmlfiles, workers))
+    else:
+        list(cli.runTasks(cli.validateTask, xmlfiles,
+                          1 if mode == "serial" else workers))
+    elapsed = time.perf_counter() - start
+    parent = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    child = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    print(json.dumps({'time': elapsed, 'parent': parent, 'child': child}))
+
+
+def measure(task, mode, workers, xmlfiles):
+    output = subprocess.run(
+        [sys.executable, __file__, "--run", task, mode, str(workers)] +
+        xmlfiles, check=True, capture_output=True, text=True).stdout
+    result = json.loads(output.splitlines()[-1])
+    nworkers = workers if mode == "processes" else 0
+    # ru_maxrss is in kB on Linux
+    result['memory'] = (result['parent'] + nworkers * result['child']) / 1024
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--files", type=int, default=16)
+    parser.add_argument("--members", type=int, default=51)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({2, os.cpu_count() or 1}))
+    parser.add_argument("--run", nargs=3, help=argparse.SUPPRESS)
+    args, xmlfiles = parser.parse_known_args(argv)
+    if args.run:
+        task, mode, workers = args.run
+        run(task, mode, int(workers), xmlfiles)
+        return 0
+
+    from make_cxml import ensembleXML
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        xmlfiles = []
+        text = ensembleXML(nmembers=args.members)
+        for n in range(args.files):
+            xmlfiles.append(os.path.join(tmpdir, f"ensemble{n:03d}.xml"))
+            with open(xmlfiles[-1], 'w') as fh:
+                fh.write(text)
+        size = sum(os.path.getsize(f) for f in xmlfiles) / 2 ** 20
+        print(f"{args.files} files of {args.members} members, {size:.1f} MB")
+
+        print(f"{'task':<10} {'mode':<16} {'time (s)':>10} {'files/s':>8} "
+              f"{'memory (MB)':>12}")
+        for task in ("load", "validate"):
+            for mode in MODES:
+                for workers in ([1] if mode == "serial" else args.workers):
+                    result = measure(task, mode, workers, xmlfiles)
+                    label = mode if mode == "serial" else \
+                        f"{mode}({workers})"
+                    print(f"{task:<10} {label:<16} {result['time']:>10.2f} "
+                          f"{args.files / result['time']:>8.1f} "
+                          f"{result['memory']:>12.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""
+Wind field footprint benchmark for pycxml.
+
+Computes the maximum gust footprints of a synthetic ensemble forecast on a
+realistic grid (0.02 degree spacing over 10 x 16 degrees, about 400,000
+points by default) with hourly time steps, and reports the time taken and
+the throughput in grid point-time steps per second, for each number of
+worker processes given.
+
+Usage:
+
+    python benchmarks/windfield.py [--members N] [--resolution DEG]
+        [--workers N [N ...]]
+
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "tests")]
+
+import pycxml  # noqa: E402
+import windfield  # noqa: E402
+from interpolate import interpolateTracks  # noqa: E402
+from make_cxml import ensembleXML  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--members", type=int, default=16)
+    parser.add_argument("--resolution", type=float, default=0.02)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, os.cpu_count() or 1}))
+    args = parser.parse_args(argv)
+
+    tracks = pycxml.loadstring(ensembleXML(nmembers=args.members))
+    tracks = interpolateTracks(tracks, "1h")
+    # The synthetic tracks run from 12S 120E to 24S 126E
+    lon = np.arange(118., 128., args.resolution)
+    lat = np.arange(-26., -10., args.resolution)
+    nsteps = sum(len(t) for t in tracks)
+    work = nsteps * lon.size * lat.size
+    print(f"{args.members} members, {nsteps} time steps, "
+          f"{lat.size} x {lon.size} grid")
+
+    print(f"{'workers':>8} {'time (s)':>10} {'Mpoints/s':>10}")
+    for workers in args.workers:
+        start = time.perf_counter()
+        windfield.footprints(tracks, lon, lat, freq=None, workers=workers)
+        elapsed = time.perf_counter() - start
+        print(f"{workers:>8} {elapsed:>10.2f} {work / elapsed / 1e6:>10.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+"""
+chunkload - Parse a single large ensemble file in parallel
+
+A global ensemble bulletin can be hundreds of MB, so loading a batch of
+files in parallel (`pycxml.loadfiles`) does not help with it. Here the file
+is memory-mapped, and the byte ranges of its `<data>` elements (one per
+ensemble member) are located with a regular expression scan of the raw
+bytes, without parsing any XML. The header is parsed once, in this process,
+and the members are divided into chunks of roughly equal size that are
+parsed in a pool of worker processes. Each worker maps the file itself, so
+only the byte ranges are sent to it, and returns its members in shared
+memory (see `sharedframes`).
+
+The scan assumes that `<data` and `</data>` do not appear inside comments or
+CDATA sections, which is the case for bulletins written by forecast
+systems.
+
+"""
+
+import re
+import mmap
+import logging as log
+import xml.etree.ElementTree as ET
+
+import pycxml
+from sharedframes import toShared, sharedPool, collectShared
+
+DATA_START = re.compile(rb"<data[\s>]")
+DATA_END = re.compile(rb"</data\s*>")
+ROOT_START = re.compile(rb"<cxml(?:\s[^>]*)?>")
+HEADER = re.compile(rb"<header[\s>].*?</header\s*>", re.DOTALL)
+
+# Number of chunks per worker process. More chunks than workers balances
+# the load when members differ in size.
+CHUNKS_PER_WORKER = 4
+
+
+def dataRanges(mm, start=0):
+    """
+    Byte ranges of the `<data>` elements of a CXML document.
+
+    :param mm: :class:`mmap.mmap` (or :class:`bytes`) of the document.
+    :param int start: offset to start scanning from.
+
+    :returns: list of (start, end) byte offsets, `end` being the offset just
+    past the closing tag.
+    """
+    ranges = []
+    pos = start
+    while True:
+        match = DATA_START.search(mm, pos)
+        if match is None:
+            return ranges
+        end = DATA_END.search(mm, match.end())
+        if end is None:
+            raise ValueError(f"Unterminated data element at byte "
+                             f"{match.start()}")
+        ranges.append((match.start(), end.end()))
+        pos = end.end()
+
+
+def splitRanges(ranges, nchunks):
+    """
+    Divide consecutive byte ranges into at most `nchunks` groups of roughly
+    equal total size.
+
+    :returns: list of (start, end) byte offsets of each group.
+    """
+    total = ranges[-1][1] - ranges[0][0]
+    target = total / max(nchunks, 1)
+    chunks, first = [], ranges[0][0]
+    for start, end in ranges:
+        if end - first >= target:
+            chunks.append((first, end))
+            first = end
+    if first < ranges[-1][1]:
+        chunks.append((first, ranges[-1][1]))
+    return chunks
+
+
+def _mergeMissing(missing, other):
+    """
+    Add the counts and sample fixes of one missing-field summary to another.
+    """
+    for field, entry in other.items():
+        total = missing.setdefault(field, {'count': 0, 'fixes': []})
+        total['count'] += entry['count']
+        room = pycxml.MISSING_SAMPLES - len(total['fixes'])
+        total['fixes'].extend(entry['fixes'][:max(room, 0)])
+
+
+def fileHeader(mm):
+    """
+    Read the part of an ensemble CXML document before its first `<data>`
+    element.
+
+    :param mm: :class:`mmap.mmap` (or :class:`bytes`) of the document.
+
+    :returns: tuple of (root start tag, parsed header element, offset of the
+    first `<data>` element), or None if the document is not an ensemble
+    forecast or its layout is not recognised.
+    """
+    first = DATA_START.search(mm)
+    prolog = mm[:first.start()] if first else b""
+    root = ROOT_START.search(prolog)
+    header = HEADER.search(prolog)
+    if first is None or root is None or header is None:
+        return None
+    header = ET.fromstring(header.group(0))
+    if not pycxml.isEnsemble(header):
+        return None
+    return root.group(0), header, first.start()
+
+
+def fileLayout(mm):
+    """
+    Locate the parts of an ensemble CXML document, without parsing its
+    data.
+
+    :param mm: :class:`mmap.mmap` (or :class:`bytes`) of the document.
+
+    :returns: tuple of (root start tag, parsed header element, byte ranges
+    of the `<data>` elements), or None as for `fileHeader`.
+    """
+    prolog = fileHeader(mm)
+    if prolog is None:
+        return None
+    roottag, header, first = prolog
+    return roottag, header, dataRanges(mm, first)
+
+
+def parseRange(xmlfile, start, end, roottag, lenient=False):
+    """
+    Parse the ensemble members held in a byte range of a file.
+
+    :param str xmlfile: path to the CXML file.
+    :param int start: offset of the first `<data>` element of the range.
+    :param int end: offset just past the last `</data>` of the range.
+    :param bytes roottag: root start tag of the document (see
+    `fileLayout`).
+    :param bool lenient: see `pycxml.loadfile`.
+
+    :returns: tuple of (list of member frames, missing-field summary,
+    errors).
+    """
+    with open(xmlfile, 'rb') as fh, \
+            mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        # The root start tag is repeated so that any namespaces declared on
+        # it are in scope
+        text = roottag + mm[start:end] + b"</cxml>"
+    missing = {}
+    errors = [] if lenient else None
+    xroot = pycxml.recoverParse(text, errors) if lenient else \
+        ET.fromstring(text)
+    data = xroot.findall("./data[@type='ensembleForecast']")
+    frames = pycxml.parseEnsemble(data, missing, errors)
+    return frames, missing, errors or []
+
+
+def _parseChunk(xmlfile, start, end, roottag, lenient):
+    """
+    Parse the ensemble members held in a byte range of a file, in a worker
+    process.
+
+    :returns: tuple of (`toShared` descriptor of the member frames,
+    missing-field summary, errors).
+    """
+    frames, missing, errors = parseRange(xmlfile, start, end, roottag,
+                                         lenient)
+    return toShared(frames), missing, errors
+
+
+def loadParallel(xmlfile, workers=4, lenient=False):
+    """
+    Load a single CXML ensemble file, parsing its members in parallel.
+    Files that are not ensemble forecasts are loaded with `pycxml.loadfile`.
+
+    :param str xmlfile: path to the CXML file to load.
+    :param int workers: number of worker processes.
+    :param bool lenient: see `pycxml.loadfile`.
+
+    :returns: list of :class:`pandas.DataFrame`, one per member, as for
+    `pycxml.loadfile`. Numeric columns are float64 (or datetime64 for
+    validtime), and are views of shared memory. In lenient mode, a file
+    whose members cannot be located (e.g. a truncated one) is loaded with
+    `pycxml.loadfile` instead, and the failure is recorded as a "file"
+    error.
+    """
+    try:
+        with open(xmlfile, 'rb') as fh, \
+                mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            layout = fileLayout(mm)
+    except (ValueError, ET.ParseError) as e:
+        if not lenient:
+            raise
+        # e.g. a truncated file: the recovering parser still reads the
+        # members it holds
+        log.warning("Unable to scan %s (%s); loading it whole", xmlfile, e)
+        result = pycxml.loadfile(xmlfile, lenient=True)
+        first = result[0] if isinstance(result, list) and result else result
+        if hasattr(first, 'attrs'):
+            pycxml.recordError(first.attrs['errors'], 'file', None, e)
+        return result
+    if layout is None:
+        return pycxml.loadfile(xmlfile, lenient=lenient)
+    roottag, header, ranges = layout
+
+    chunks = splitRanges(ranges, workers * CHUNKS_PER_WORKER)
+    log.info("Parsing %d members of %s in %d chunks", len(ranges), xmlfile,
+             len(chunks))
+    missing = {}
+    errors = [] if lenient else None
+    attrs = {'missing': missing}
+    if lenient:
+        attrs['errors'] = errors
+    attrs.update(pycxml.headerAttributes(header, errors))
+
+    forecasts = []
+    with sharedPool(workers) as pool:
+        futures = [pool.submit(_parseChunk, xmlfile, start, end, roottag,
+                               lenient)
+                   for start, end in chunks]
+        for frames, chunkMissing, chunkErrors in collectShared(futures,
+                                                               pool):
+            forecasts.extend(frames)
+            _mergeMissing(missing, chunkMissing)
+            if lenient:
+                errors.extend(chunkErrors)
+    for df in forecasts:
+        df.attrs = attrs
+    pycxml.reportMissing(xmlfile, missing)
+    return forecasts
@@ -0,0 +1,359 @@
+"""
+cli - Command line interface to pycxml
+
+Usage:
+
+    python -m pycxml validate FILES... [--sample FRACTION]
+    python -m pycxml convert FILES... --outdir DIR [--format FORMAT]
+    python -m pycxml scan FILES... [--output FILE]
+    python -m pycxml stats FILES... [--output FILE]
+    python -m pycxml serve FILES... [--port PORT]
+
+FILES may be paths, glob patterns (quote them to use `**`), or zip/tar
+archives of CXML files. `--workers N` processes the files in a pool of N
+worker processes (or threads, with `--threads`). Each command reports its
+throughput (files/s and fixes/s) on stderr, and exits with a non-zero
+status if any file failed.
+
+"""
+
+import os
+import io
+import sys
+import csv
+import time
+import argparse
+import logging as log
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+import pycxml
+from sources import (expandSources, sourceName, readSource, loadSource,
+                     loadHeader, closeArchives)
+
+FORMATS = {'csv': '.csv', 'parquet': '.parquet', 'netcdf': '.nc'}
+TEXT_COLUMNS = ['disturbance', 'validtime']
+# Columns that --columns may select:
+COLUMNS = pycxml.ENSEMBLE_COLUMNS + pycxml.RADII_COLUMNS
+
+
+def parseErrors(result):
+    """
+    Number of errors recovered from while parsing in lenient mode.
+    """
+    if isinstance(result, list):
+        result = result[0] if result else None
+    if result is None:
+        return 0
+    return len(result.attrs.get('errors', []))
+
+
+def toFrame(result, columns=None):
+    """
+    Convert a `pycxml.loadfile` result to a single DataFrame with numeric
+    column types, optionally restricted to `columns`.
+    """
+    import pandas as pd
+    if isinstance(result, list):
+        result = (pd.concat(result, ignore_index=True) if result
+                  else pd.DataFrame())
+    elif result is None:
+        result = pd.DataFrame()
+    df = result.copy()
+    for col in df.columns:
+        if col == 'validtime':
+            df[col] = pd.to_datetime(df[col])
+        elif col == 'member':
+            df[col] = df[col].astype('Int64')
+        elif col not in TEXT_COLUMNS:
+            df[col] = df[col].astype(float)
+    if columns:
+        df = df.reindex(columns=columns)
+    return df
+
+
+def sourceRoot(sources):
+    """
+    The deepest directory holding all the sources (files or archives).
+    """
+    paths = [s[0] if isinstance(s, tuple) else s for s in sources]
+    if not paths:
+        return os.curdir
+    return os.path.commonpath([os.path.dirname(os.path.abspath(p))
+                               for p in paths])
+
+
+def outputName(source, fmt, root=None):
+    """
+    Name of the output file for a source. The path of the file (or
+    archive) relative to `root` (default: its own directory) is part of the
+    name, so that files of the same name in different directories are
+    written to different outputs.
+    """
+    path = source[0] if isinstance(source, tuple) else source
+    if root is None:
+        root = os.path.dirname(os.path.abspath(path))
+    rel = os.path.relpath(os.path.abspath(path), root)
+    head, base = os.path.split(rel)
+    if isinstance(source, tuple):
+        base = base.split('.')[0] + "_" + source[1]
+    stem = os.path.join(head, base).replace(os.sep, '_').replace('/', '_')
+    return os.path.splitext(stem)[0] + FORMATS[fmt]
+
+
+def outputNames(sources, fmt):
+    """
+    Names of the output files for a list of sources.
+
+    :raises ValueError: if two sources would be written to the same file.
+    """
+    root = sourceRoot(sources)
+    names = {}
+    for source in sources:
+        name = outputName(source, fmt, root)
+        if name in names:
+            raise ValueError(f"{sourceName(names[name])} and "
+                             f"{sourceName(source)} would both be written "
+                             f"to {name}")
+        names[name] = source
+    return {source: name for name, source in names.items()}
+
+
+def writeFrame(df, outfile, fmt):
+    if fmt == 'csv':
+        df.to_csv(outfile, index=False)
+    elif fmt == 'parquet':
+        df.to_parquet(outfile, index=False)
+    elif fmt == 'netcdf':
+        df.reset_index(drop=True).to_xarray().to_netcdf(outfile)
+
+
+def validateTask(source, sample=1.):
+    if sample >= 1.:
+        from validator import getValidator
+        getValidator().validate(io.BytesIO(readSource(source)))
+    else:
+        pycxml.checkfile(io.BytesIO(readSource(source)), sample)
+    return {'valid': True}
+
+
+def convertTask(source, outdir, fmt, columns, lenient=False, root=None,
+                lxml=False):
+    result = loadSource(source, lenient, lxml)
+    df = toFrame(result, columns)
+    outfile = os.path.join(outdir, outputName(source, fmt, root))
+    writeFrame(df, outfile, fmt)
+    return {'fixes': len(df), 'parse_errors': parseErrors(result),
+            'output': outfile}
+
+
+def scanTask(source):
+    return loadHeader(source)
+
+
+def statsTask(source, columns, lenient=False, lxml=False):
+    result = loadSource(source, lenient, lxml)
+    df = toFrame(result)
+    stats = {'fixes': len(df), 'parse_errors': parseErrors(result)}
+    for key in ('disturbance', 'member'):
+        if key in df.columns:
+            stats[f"{key}s"] = df[key].nunique()
+    if 'validtime' in df.columns and len(df):
+        stats['first'] = df['validtime'].min()
+        stats['last'] = df['validtime'].max()
+    for col in columns or df.columns:
+        if col in df.columns and col not in TEXT_COLUMNS + ['member']:
+            stats[f"{col}_count"] = int(df[col].count())
+    return stats
+
+
+def runTask(task, source):
+    """
+    Run a task on a source, catching errors so that one bad file does not
+    stop the batch.
+
+    :returns: :class:`dict` of task results, with the source name and any
+    error message.
+    """
+    try:
+        result = task(source)
+    except Exception as e:
+        log.error("%s: %s", sourceName(source), e)
+        result = {'error': f"{type(e).__name__}: {e}"}
+    return dict({'source': sourceName(source)}, **result)
+
+
+def runTasks(task, sources, workers=1, threads=False):
+    """
+    Apply a task to every source, in parallel if `workers` > 1, in a pool
+    of processes or, if `threads` is True, of threads (see `threadload`).
+
+    :returns: generator of task results, in the order of `sources`. The
+    archives read in this process are closed once it is exhausted (or
+    closed).
+    """
+    func = partial(runTask, task)
+    try:
+        if workers <= 1 or len(sources) <= 1:
+            yield from map(func, sources)
+        elif threads:
+            from threadload import threadMap
+            yield from threadMap(func, sources, workers)
+        else:
+            chunksize = max(1, len(sources) // (4 * workers))
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                yield from pool.map(func, sources, chunksize=chunksize)
+    finally:
+        closeArchives()
+
+
+def writeTable(rows, output=None):
+    """
+    Write a list of dicts as CSV to `output`, or stdout.
+    """
+    fields = []
+    for row in rows:
+        fields.extend(k for k in row if k not in fields)
+    fh = open(output, 'w', newline='') if output else sys.stdout
+    try:
+        writer = csv.DictWriter(fh, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+    finally:
+        if output:
+            fh.close()
+
+
+def reportThroughput(results, elapsed):
+    nfiles = len(results)
+    nfixes = sum(r.get('fixes', 0) for r in results)
+    nerrors = sum(1 for r in results if r.get('error'))
+    elapsed = max(elapsed, 1e-9)
+    print(f"{nfiles} files ({nerrors} failed), {nfixes} fixes in "
+          f"{elapsed:.2f} s: {nfiles / elapsed:.1f} files/s, "
+          f"{nfixes / elapsed:.1f} fixes/s", file=sys.stderr)
+
+
+def buildParser():
+    parser = argparse.ArgumentParser(
+        prog="pycxml", description="Bulk processing of CXML files")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="Log progress information")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("files", nargs="+",
+                        help="CXML files, glob patterns or zip/tar archives")
+    common.add_argument("-w", "--workers", type=int, default=1,
+                        help="Number of worker processes (default 1)")
+    common.add_argument("--threads", action="store_true",
+                        help="Use a pool of threads rather than processes, "
+                             "and parse with lxml")
+
+    validate = subparsers.add_parser(
+        "validate", parents=[common],
+        help="Validate files against the CXML schema")
+    validate.add_argument("-s", "--sample", type=float, default=1.,
+                          help="Fraction of files to validate against the "
+                               "full schema (default 1). Other files get a "
+                               "fast structural check, and are validated "
+                               "in full only if it fails")
+
+    convert = subparsers.add_parser("convert", parents=[common],
+                                    help="Convert files to tabular formats")
+    convert.add_argument("-o", "--outdir", required=True,
+                         help="Directory to write converted files to")
+    convert.add_argument("-f", "--format", choices=sorted(FORMATS),
+                         default="csv", help="Output format (default csv)")
+    convert.add_argument("-c", "--columns",
+                         help="Comma-separated list of columns to write")
+    convert.add_argument("--lenient", action="store_true",
+                         help="Recover from malformed XML and skip fixes "
+                              "that cannot be parsed")
+
+    scan = subparsers.add_parser("scan", parents=[common],
+                                 help="Build an index of file headers")
+    scan.add_argument("-o", "--output", help="CSV file to write the index "
+                                             "to (default stdout)")
+
+    stats = subparsers.add_parser("stats", parents=[common],
+                                  help="Summary statistics for each file")
+    stats.add_argument("-o", "--output", help="CSV file to write the "
+                                              "statistics to (default "
+                                              "stdout)")
+    stats.add_argument("-c", "--columns",
+                       help="Comma-separated list of columns to summarise")
+    stats.add_argument("--lenient", action="store_true",
+                       help="Recover from malformed XML and skip fixes "
+                            "that cannot be parsed")
+
+    serve = subparsers.add_parser("serve", parents=[common],
+                                  help="Answer queries over HTTP (see "
+                                       "`server`)")
+    serve.add_argument("--host", default="127.0.0.1",
+                       help="Address to listen on (default 127.0.0.1)")
+    serve.add_argument("-p", "--port", type=int, default=8000,
+                       help="Port to listen on (default 8000)")
+    serve.add_argument("--cache", type=int, default=64,
+                       help="Number of parsed files held in memory "
+                            "(default 64)")
+    return parser
+
+
+def main(argv=None):
+    parser = buildParser()
+    args = parser.parse_args(argv)
+    log.basicConfig(level=log.INFO if args.verbose else log.WARNING,
+                    format="%(asctime)s %(levelname)s %(message)s")
+
+    sources = expandSources(args.files)
+    if args.command == "serve":
+        from server import serve
+        serve(sources, args.host, args.port, maxfiles=args.cache)
+        return 0
+    columns = getattr(args, 'columns', None)
+    columns = columns.split(',') if columns else None
+    unknown = [c for c in columns or [] if c not in COLUMNS]
+    if unknown:
+        parser.error(f"unknown columns: {', '.join(unknown)} (choose from "
+                     f"{', '.join(COLUMNS)})")
+
+    if args.command == "validate":
+        task = partial(validateTask, sample=args.sample)
+        if args.threads:
+            # Compile the schema once, before the threads share it
+            from validator import getValidator
+            getValidator()
+    elif args.command == "convert":
+        try:
+            outputNames(sources, args.format)
+        except ValueError as e:
+            parser.error(str(e))
+        os.makedirs(args.outdir, exist_ok=True)
+        task = partial(convertTask, outdir=args.outdir, fmt=args.format,
+                       columns=columns, lenient=args.lenient,
+                       root=sourceRoot(sources), lxml=args.threads)
+    elif args.command == "scan":
+        task = scanTask
+    else:
+        task = partial(statsTask, columns=columns, lenient=args.lenient,
+                       lxml=args.threads)
+
+    start = time.perf_counter()
+    results = []
+    for result in runTasks(task, sources, args.workers, args.threads):
+        results.append(result)
+        if args.command == "validate":
+            status = "valid" if result.get('valid') else \
+                f"INVALID: {result['error']}"
+            print(f"{result['source']}: {status}")
+    elapsed = time.perf_counter() - start
+
+    if args.command in ("scan", "stats"):
+        writeTable(results, args.output)
+    reportThroughput(results, elapsed)
+    return 1 if any(r.get('error') for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
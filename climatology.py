@@ -0,0 +1,158 @@
+"""
+climatology - Accumulated cyclone energy, power dissipation and lifetime
+maximum intensity of storms and seasons
+
+Metrics are computed for every storm (each disturbance, and each ensemble
+member) in a set of fixes at once. Wind speeds are converted from km/h in
+one call to `converter.convert`, the fixes are sorted once by an integer code
+for each storm, and the sums and maxima for all storms are grouped NumPy
+reductions (`numpy.add.reduceat`, and a `numpy.lexsort` for the lifetime
+maxima) over the runs of equal codes, rather than a loop over storms.
+
+Definitions:
+
+* ACE: 1e-4 times the sum of the squared maximum wind speed (kt) over the
+  synoptic (00, 06, 12 and 18 UTC) fixes with winds of at least
+  `THRESHOLD` kt.
+* PDI: the sum of the cubed maximum wind speed (m/s) times the 6-hour
+  interval (s), over the same fixes (m^3/s^2).
+* LMI: the largest maximum wind speed over all fixes, with its time and
+  position.
+
+The season of a storm is that of its first fix. Seasons start in
+`SEASON_START` (July, for the southern hemisphere) and are labelled by the
+year in which they end.
+
+"""
+
+import logging as log
+
+import numpy as np
+import pandas as pd
+
+import merge
+from converter import convert
+
+THRESHOLD = 35.  # kt
+SYNOPTIC_INTERVAL = 6 * 3600  # s
+SEASON_START = 7
+WIND_UNITS = "km/h"
+STORM_KEYS = ["disturbance", "member"]
+STORM_COLUMNS = ["season", "start", "end", "fixes", "ace", "pdi", "lmi",
+                 "lmitime", "lmilatitude", "lmilongitude", "minpcentre"]
+SEASON_COLUMNS = ["storms", "ace", "pdi", "meanlmi", "maxlmi"]
+
+
+def season(times, start=SEASON_START):
+    """
+    Season of each time, as the year in which the season ends.
+
+    :param times: array of times.
+    :param int start: month in which seasons start.
+    """
+    times = pd.DatetimeIndex(pd.to_datetime(times))
+    year = times.year.to_numpy()
+    if start > 1:
+        year = year + (times.month.to_numpy() >= start)
+    return year
+
+
+def _fixes(fixes):
+    """
+    A frame of fixes, with one fix for each disturbance, member and
+    validtime (taken from the latest bulletin), sorted by those keys.
+    """
+    if not isinstance(fixes, pd.DataFrame):
+        fixes = merge.stackResults(fixes)
+    df = fixes.copy()
+    if 'member' not in df.columns:
+        df['member'] = np.nan
+    df['validtime'] = pd.to_datetime(df['validtime'])
+    return merge.deduplicate(df, STORM_KEYS + ["validtime"],
+                             ["basetime", "creationtime"])
+
+
+def _floats(df, column):
+    if column not in df.columns:
+        return np.full(len(df), np.nan)
+    return df[column].astype(float).to_numpy()
+
+
+def stormMetrics(fixes, units="kts", threshold=THRESHOLD,
+                 seasonstart=SEASON_START):
+    """
+    ACE, PDI and lifetime maximum intensity of every storm.
+
+    :param fixes: :class:`pandas.DataFrame` of fixes (e.g. from
+    `merge.mergeResults`), or an iterable or :class:`dict` of
+    `pycxml.loadfile` results. Where bulletins overlap, the fix from the
+    latest bulletin is used.
+    :param str units: units of the reported LMI ("kts", "m/s" or "km/h").
+    :param float threshold: least wind speed (kt) of fixes counted in the
+    ACE and PDI.
+    :param int seasonstart: month in which seasons start.
+
+    :returns: :class:`pandas.DataFrame` indexed by disturbance and member
+    (NaN for deterministic tracks), with the columns `STORM_COLUMNS`.
+    """
+    df = _fixes(fixes)
+    if len(df) == 0:
+        index = pd.MultiIndex.from_arrays([[], []], names=STORM_KEYS)
+        return pd.DataFrame(columns=STORM_COLUMNS, index=index)
+
+    # `deduplicate` sorts by storm and then time, so each storm is a run
+    # of rows
+    codes = [pd.factorize(df[k])[0] for k in STORM_KEYS]
+    code = codes[0].astype(np.int64) * (codes[1].max() + 2) + codes[1] + 1
+    first = np.flatnonzero(np.r_[True, code[1:] != code[:-1]])
+    nfixes = np.diff(np.r_[first, len(df)])
+    storm = np.repeat(np.arange(len(first)), nfixes)
+
+    wind = _floats(df, 'windspeed')
+    kts = np.asarray(convert(wind, WIND_UNITS, "kts"), dtype=float)
+    mps = np.asarray(convert(wind, WIND_UNITS, "m/s"), dtype=float)
+    times = df['validtime'].to_numpy(dtype='datetime64[s]')
+    seconds = times.view(np.int64)
+    synoptic = (seconds % SYNOPTIC_INTERVAL) == 0
+    counted = synoptic & (kts >= threshold)
+    ace = 1e-4 * np.add.reduceat(np.where(counted, kts ** 2, 0.), first)
+    pdi = SYNOPTIC_INTERVAL * np.add.reduceat(
+        np.where(counted, mps ** 3, 0.), first)
+
+    # The fix of greatest wind speed in each storm is the last of its run
+    # when sorted by storm and then wind speed (NaN first)
+    order = np.lexsort((np.where(np.isnan(wind), -np.inf, wind), storm))
+    last = order[np.r_[first[1:], len(df)] - 1]
+    pcentre = _floats(df, 'pcentre')
+    minp = np.fmin.reduceat(pcentre, first)
+
+    lmi = np.asarray(convert(wind[last], WIND_UNITS, units), dtype=float)
+    result = pd.DataFrame({
+        'season': season(times[first], seasonstart),
+        'start': times[first],
+        'end': times[np.r_[first[1:], len(df)] - 1],
+        'fixes': nfixes, 'ace': ace, 'pdi': pdi, 'lmi': lmi,
+        'lmitime': times[last],
+        'lmilatitude': _floats(df, 'latitude')[last],
+        'lmilongitude': _floats(df, 'longitude')[last],
+        'minpcentre': minp},
+        index=pd.MultiIndex.from_arrays(
+            [df[k].to_numpy()[first] for k in STORM_KEYS], names=STORM_KEYS))
+    log.debug("Metrics of %d storms from %d fixes", len(result), len(df))
+    return result
+
+
+def seasonMetrics(storms, by="season"):
+    """
+    Seasonal totals of storm metrics.
+
+    :param storms: :class:`pandas.DataFrame` from `stormMetrics`.
+    :param by: column (or list of columns) to group storms by.
+
+    :returns: :class:`pandas.DataFrame` indexed by `by`, with the number of
+    storms, their total ACE and PDI, and their mean and greatest LMI.
+    """
+    return storms.groupby(by).agg(storms=("ace", "size"),
+                                  ace=("ace", "sum"), pdi=("pdi", "sum"),
+                                  meanlmi=("lmi", "mean"),
+                                  maxlmi=("lmi", "max"))
@@ -0,0 +1,272 @@
+"""
+cluster - Reduce an ensemble forecast to a few representative tracks
+
+Hazard models cannot afford to run every member of a large ensemble, so the
+member tracks are clustered and one representative member (the medoid) of
+each cluster is kept, weighted by the share of the ensemble in its cluster.
+
+The tracks are first resampled to a common time axis (`trackArrays`), giving
+(member, time) arrays of longitude and latitude, with NaN where a member has
+no fix. The distance between two tracks is the mean great-circle separation
+of their positions over the times they share. The full member-by-member
+distance matrix is computed with vectorised haversine in blocks of rows,
+bounded in memory like the footprints of `windfield`, and the members are
+then clustered either by k-medoids or by average-linkage hierarchical
+clustering.
+
+Hierarchical clustering requires `scipy`.
+
+"""
+
+import logging as log
+
+import numpy as np
+import pandas as pd
+
+from compact import CompactEnsemble
+from interpolate import interpolateTracks
+from windfield import EARTH_RADIUS
+
+# Approximate memory used per (member pair, time) element of a block, and the
+# default bound on the memory used for a block:
+BYTES_PER_ELEMENT = 6 * 8
+MAX_BYTES = 64 * 2 ** 20
+
+CLUSTER_COLUMNS = ["cluster", "member", "size", "weight", "spread"]
+
+
+def trackArrays(tracks, freq="6h"):
+    """
+    Resample ensemble member tracks to a common time axis.
+
+    :param tracks: list of :class:`pandas.DataFrame` (one per member), as
+    returned by `pycxml.loadfile`, or a :class:`compact.CompactEnsemble`.
+    :param freq: time step of the common axis, as understood by
+    :class:`pandas.Timedelta`. Not used for a `CompactEnsemble`, whose
+    validtimes are already shared by all members.
+
+    :returns: tuple of (validtimes, member numbers, longitude, latitude).
+    Longitude and latitude are float arrays of shape (member, time), NaN
+    where a member has no position.
+    """
+    if isinstance(tracks, CompactEnsemble):
+        return (tracks.validtime, np.asarray(tracks.members),
+                tracks.field('longitude').astype(float),
+                tracks.field('latitude').astype(float))
+
+    frames = [f for f in tracks if len(f)]
+    members = np.array([f['member'].iloc[0] if 'member' in f.columns else n
+                        for n, f in enumerate(frames)])
+    frames = interpolateTracks(frames, freq)
+    times = [pd.to_datetime(f['validtime']).to_numpy(dtype='datetime64[s]')
+             for f in frames]
+    validtime = np.unique(np.concatenate(times)) if times else \
+        np.array([], dtype='datetime64[s]')
+    row = np.repeat(np.arange(len(frames)), [len(t) for t in times])
+    col = np.searchsorted(validtime, np.concatenate(times)) if times else \
+        np.array([], dtype=int)
+    lon = np.full((len(frames), len(validtime)), np.nan)
+    lat = np.full((len(frames), len(validtime)), np.nan)
+    if frames:
+        lon[row, col] = np.concatenate([f['longitude'].to_numpy(float)
+                                        for f in frames])
+        lat[row, col] = np.concatenate([f['latitude'].to_numpy(float)
+                                        for f in frames])
+    return validtime, members, lon, lat
+
+
+def distanceMatrix(lon, lat, maxbytes=MAX_BYTES):
+    """
+    Mean great-circle distance (km) between every pair of tracks, over the
+    times at which both have a position.
+
+    :param lon: longitudes, shape (member, time), NaN where missing.
+    :param lat: latitudes, shape (member, time), NaN where missing.
+    :param int maxbytes: approximate bound on the memory used by each block
+    of rows.
+
+    :returns: :class:`numpy.ndarray` of shape (member, member). NaN for
+    pairs of tracks with no time in common.
+    """
+    nmembers, ntimes = lon.shape
+    lon, lat = np.radians(lon), np.radians(lat)
+    coslat = np.cos(lat)
+    block = max(1, maxbytes // max(nmembers * ntimes * BYTES_PER_ELEMENT, 1))
+    dist = np.empty((nmembers, nmembers))
+    for start in range(0, nmembers, block):
+        sl = slice(start, start + block)
+        a = (np.sin((lat[sl, None, :] - lat[None, :, :]) / 2.) ** 2 +
+             coslat[sl, None, :] * coslat[None, :, :] *
+             np.sin((lon[sl, None, :] - lon[None, :, :]) / 2.) ** 2)
+        d = 2. * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.)))
+        valid = ~np.isnan(d)
+        count = valid.sum(axis=2)
+        total = np.where(valid, d, 0.).sum(axis=2)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            dist[sl] = np.where(count > 0, total / count, np.nan)
+    log.debug("Distance matrix of %d tracks in blocks of %d", nmembers,
+              block)
+    return dist
+
+
+def _fillMissing(dist):
+    """
+    Replace the distances between tracks with no time in common by twice
+    the largest distance, so they are not clustered together.
+    """
+    dist = dist.copy()
+    missing = np.isnan(dist)
+    if missing.any():
+        finite = dist[~missing]
+        dist[missing] = 2. * (finite.max() if finite.size else 1.)
+    np.fill_diagonal(dist, 0.)
+    return dist
+
+
+def _medoid(dist, weights, members):
+    """
+    The member of a cluster with the least weighted distance to the others.
+    """
+    sub = dist[np.ix_(members, members)]
+    return members[np.argmin(weights[members] @ sub)]
+
+
+def kMedoids(dist, nclusters, weights=None, maxiter=100):
+    """
+    Cluster by k-medoids (alternating assignment and medoid update, from a
+    greedy initial set of medoids).
+
+    :param dist: distance matrix, shape (member, member).
+    :param int nclusters: number of clusters.
+    :param weights: weight of each member (default equal weights).
+    :param int maxiter: maximum number of iterations.
+
+    :returns: tuple of (cluster label of each member, index of the medoid
+    of each cluster).
+    """
+    n = len(dist)
+    nclusters = min(nclusters, n)
+    weights = np.ones(n) if weights is None else np.asarray(weights, float)
+
+    # Greedy initialisation: each medoid is the member that most reduces
+    # the weighted distance of all members to their nearest medoid
+    medoids = [np.argmin(weights @ dist)]
+    nearest = dist[:, medoids[0]]
+    for _ in range(1, nclusters):
+        cost = weights @ np.minimum(nearest[:, None], dist)
+        cost[medoids] = np.inf
+        medoids.append(np.argmin(cost))
+        nearest = np.minimum(nearest, dist[:, medoids[-1]])
+    medoids = np.array(medoids)
+
+    for _ in range(maxiter):
+        labels = np.argmin(dist[:, medoids], axis=1)
+        # Medoids are assigned to their own clusters even when tied
+        labels[medoids] = np.arange(nclusters)
+        update = np.array([_medoid(dist, weights, np.flatnonzero(labels == c))
+                           for c in range(nclusters)])
+        if np.array_equal(update, medoids):
+            break
+        medoids = update
+    return labels, medoids
+
+
+def hierarchical(dist, nclusters, weights=None):
+    """
+    Cluster by average-linkage hierarchical clustering.
+
+    :param dist: distance matrix, shape (member, member).
+    :param int nclusters: number of clusters.
+    :param weights: weight of each member, used to choose the medoids
+    (default equal weights).
+
+    :returns: tuple of (cluster label of each member, index of the medoid
+    of each cluster).
+    """
+    from scipy.cluster.hierarchy import linkage, fcluster
+    from scipy.spatial.distance import squareform
+
+    n = len(dist)
+    weights = np.ones(n) if weights is None else np.asarray(weights, float)
+    if n == 1:
+        return np.zeros(1, dtype=int), np.zeros(1, dtype=int)
+    tree = linkage(squareform(dist, checks=False), method='average')
+    _, labels = np.unique(fcluster(tree, nclusters, criterion='maxclust'),
+                          return_inverse=True)
+    medoids = np.array([_medoid(dist, weights, np.flatnonzero(labels == c))
+                        for c in range(labels.max() + 1)])
+    return labels, medoids
+
+
+def _memberWeights(tracks, members, weights):
+    """
+    Weights of the members kept by `trackArrays`, in the same order.
+    """
+    if weights is None:
+        return np.ones(len(members))
+    if isinstance(weights, pd.Series):
+        weights = weights.reindex(members)
+        if weights.isna().any():
+            raise ValueError(f"No weight for members "
+                             f"{list(weights.index[weights.isna()])}")
+        return weights.to_numpy(dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    if len(weights) != len(tracks):
+        raise ValueError(f"{len(weights)} weights for {len(tracks)} "
+                         f"members")
+    if isinstance(tracks, CompactEnsemble):
+        return weights
+    # trackArrays drops the members with no fixes
+    return weights[np.array([len(f) > 0 for f in tracks], dtype=bool)]
+
+
+def representativeMembers(tracks, nclusters=5, freq="6h",
+                          method="kmedoids", weights=None,
+                          maxbytes=MAX_BYTES):
+    """
+    Cluster the member tracks of an ensemble forecast and select a
+    representative member from each cluster.
+
+    :param tracks: ensemble member tracks of a single disturbance (see
+    `trackArrays`).
+    :param int nclusters: number of clusters.
+    :param freq: time step of the common time axis.
+    :param str method: "kmedoids" or "hierarchical".
+    :param weights: weight of each member (default equal weights): one per
+    member of `tracks`, in order, or a :class:`pandas.Series` indexed by
+    member number. Members with no fixes are dropped along with their
+    weights.
+    :param int maxbytes: see `distanceMatrix`.
+
+    :returns: :class:`pandas.DataFrame` with a row for each cluster, sorted
+    by decreasing weight, holding the representative member number, the
+    number of members in the cluster, the share of the total member weight
+    in the cluster, and the cluster's spread (the weighted mean distance in
+    km of its members from the representative). The cluster of each member
+    is stored in `attrs['clusters']`, a :class:`pandas.Series` indexed by
+    member number.
+    """
+    if method not in ("kmedoids", "hierarchical"):
+        raise ValueError(f"Unknown clustering method: {method}")
+    _, members, lon, lat = trackArrays(tracks, freq)
+    if len(members) == 0:
+        return pd.DataFrame(columns=CLUSTER_COLUMNS)
+    weights = _memberWeights(tracks, members, weights)
+    dist = _fillMissing(distanceMatrix(lon, lat, maxbytes))
+    cluster = kMedoids if method == "kmedoids" else hierarchical
+    labels, medoids = cluster(dist, nclusters, weights)
+
+    ids = np.arange(len(medoids))
+    size = np.bincount(labels, minlength=len(medoids))
+    weight = np.bincount(labels, weights, minlength=len(medoids))
+    spread = np.bincount(labels, weights * dist[np.arange(len(labels)),
+                                                medoids[labels]],
+                         minlength=len(medoids)) / weight
+    result = pd.DataFrame({'cluster': ids, 'member': members[medoids],
+                           'size': size, 'weight': weight / weights.sum(),
+                           'spread': spread})
+    result = result.sort_values('weight', ascending=False,
+                                kind='stable').reset_index(drop=True)
+    result.attrs['clusters'] = pd.Series(labels, index=members,
+                                         name='cluster')
+    return result
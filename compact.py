@@ -0,0 +1,233 @@
+"""
+compact - Compact array representation of ensemble forecasts
+
+Ensemble forecasts returned by `pycxml.loadfile` are a list of
+`object`-dtype DataFrames, one per member. For large ensembles this is
+expensive: every value is a boxed Python object. `CompactEnsemble` stores
+the same tracks as a single contiguous float32 array of shape
+(member, leadtime, field), with a shared validtime axis and NaN for missing
+values. Views into pandas and xarray are created without copying the data.
+
+"""
+
+import logging as log
+from datetime import datetime
+from functools import partial
+
+import numpy as np
+
+from pycxml import (DATEFMT, RADII_COLUMNS, OPTIONAL_FIELDS, getMSLP,
+                    getWindSpeed, getRmax, getPoci, parsePosition,
+                    parseDisturbance, recordMissing, recordError,
+                    fixIdentifier)
+from windradii import extractRadii
+
+COMPACT_FIELDS = ["latitude", "longitude", "pcentre", "windspeed",
+                  "rmax", "poci"] + RADII_COLUMNS
+
+
+class CompactEnsemble:
+    """
+    Ensemble forecast tracks held in contiguous NumPy arrays.
+
+    :param data: :class:`numpy.ndarray` of float32 values, shape
+    (member, leadtime, field). Missing values are NaN.
+    :param validtime: :class:`numpy.ndarray` of `datetime64[s]` values
+    shared by all members.
+    :param members: :class:`numpy.ndarray` of int16 member numbers.
+    :param list fields: names of the fields along the last axis of `data`.
+    :param disturbance: :class:`numpy.ndarray` of disturbance IDs, one per
+    member.
+    :param basetime: :class:`datetime` the forecast was initialised, if
+    known.
+    """
+
+    def __init__(self, data, validtime, members, fields=COMPACT_FIELDS,
+                 disturbance=None, basetime=None):
+        self.data = data
+        self.validtime = validtime
+        self.members = members
+        self.fields = list(fields)
+        self.disturbance = disturbance
+        self.basetime = basetime
+        self.attrs = {}
+
+    def __repr__(self):
+        nmem, ntimes, nfields = self.data.shape
+        return (f"<CompactEnsemble members={nmem} times={ntimes} "
+                f"fields={nfields} nbytes={self.nbytes}>")
+
+    def __len__(self):
+        return len(self.members)
+
+    @property
+    def nbytes(self):
+        """
+        Total number of bytes held by the arrays of this ensemble.
+        """
+        nbytes = (self.data.nbytes + self.validtime.nbytes +
+                  self.members.nbytes)
+        if self.disturbance is not None:
+            nbytes += self.disturbance.nbytes
+        return nbytes
+
+    @property
+    def leadtime(self):
+        """
+        Lead time of each validtime, in hours, as int16. None if the base
+        time of the forecast is not known.
+        """
+        if self.basetime is None:
+            return None
+        delta = self.validtime - np.datetime64(self.basetime, 's')
+        return (delta // np.timedelta64(1, 'h')).astype(np.int16)
+
+    def field(self, name):
+        """
+        View of a single field for all members and lead times.
+
+        :param str name: name of the field.
+
+        :returns: :class:`numpy.ndarray` view, shape (member, leadtime).
+        """
+        return self.data[:, :, self.fields.index(name)]
+
+    def member(self, index):
+        """
+        `pandas.DataFrame` view of a single member's track, indexed by
+        validtime. The frame shares memory with the ensemble array.
+
+        :param int index: position of the member along the member axis.
+        """
+        import pandas as pd
+        return pd.DataFrame(self.data[index], columns=self.fields,
+                            index=pd.DatetimeIndex(self.validtime,
+                                                   name='validtime'),
+                            copy=False)
+
+    def to_dataframe(self):
+        """
+        `pandas.DataFrame` view of all members, indexed by (member,
+        validtime). The contiguous array is reshaped rather than copied.
+        """
+        import pandas as pd
+        nmem, ntimes, nfields = self.data.shape
+        index = pd.MultiIndex.from_product(
+            [self.members, pd.DatetimeIndex(self.validtime)],
+            names=['member', 'validtime'])
+        return pd.DataFrame(self.data.reshape(nmem * ntimes, nfields),
+                            columns=self.fields, index=index, copy=False)
+
+    def to_xarray(self):
+        """
+        `xarray.DataArray` wrapping the ensemble array, with dimensions
+        (member, validtime, field). Requires `xarray`.
+        """
+        import xarray as xr
+        coords = {'member': self.members,
+                  'validtime': self.validtime,
+                  'field': self.fields}
+        if self.disturbance is not None:
+            coords['disturbance'] = ('member', self.disturbance)
+        return xr.DataArray(self.data, dims=('member', 'validtime', 'field'),
+                            coords=coords, name='track', attrs=self.attrs)
+
+
+def parseEnsembleCompact(data, missing=None, basetime=None, errors=None,
+                         fields=COMPACT_FIELDS):
+    """
+    Parse ensemble forecast data elements directly into a
+    :class:`CompactEnsemble`, without building intermediate DataFrames.
+
+    :param list data: list of ensemble forecast data elements.
+    :param dict missing: optional missing-field summary, updated in place.
+    :param basetime: :class:`datetime` the forecast was initialised.
+    :param list errors: if given, a fix that cannot be parsed is recorded
+    here (see `pycxml.recordError`) and left as NaN, rather than raising an
+    exception.
+    :param list fields: names of the fields to retain.
+
+    :returns: :class:`CompactEnsemble`
+    """
+    fieldIndex = {f: i for i, f in enumerate(fields)}
+    radiiIndex = [(i, fieldIndex[f]) for i, f in enumerate(RADII_COLUMNS)
+                  if f in fieldIndex]
+    # Fixes whose wind radii are still to be extracted, and their (member,
+    # validtime) positions in the ensemble array:
+    radiiFixes, radiiRows = [], []
+
+    # First pass: the shared validtime axis. Validtime strings repeat across
+    # members, so each distinct string is only converted once.
+    disturbances = [d.find('disturbance') for d in data]
+    vtstrings = sorted({f.findtext('validTime')
+                        for dist in disturbances if dist is not None
+                        for f in dist.findall('fix')} - {None})
+    times = {}
+    for vt in vtstrings:
+        try:
+            times[vt] = datetime.strptime(vt, DATEFMT)
+        except ValueError:
+            if errors is None:
+                raise
+    vtindex = {vt: i for i, vt in enumerate(times)}
+    validtime = np.array(list(times.values()), dtype='datetime64[s]')
+
+    array = np.full((len(data), len(vtindex), len(fields)), np.nan,
+                    dtype=np.float32)
+    members = np.full(len(data), -1, dtype=np.int16)
+    distIds = []
+
+    for m, (d, dist) in enumerate(zip(data, disturbances)):
+        try:
+            member = d.attrib['member']
+            members[m] = int(member)
+            distId = parseDisturbance(dist)[0]
+        except Exception as e:
+            if errors is None:
+                raise
+            recordError(errors, 'data', f"member {d.attrib.get('member')}",
+                        e)
+            distIds.append("")
+            continue
+        distIds.append(distId)
+        fixes = dist.findall('fix')
+        log.debug("Ensemble member %s: number of fixes: %d",
+                  member, len(fixes))
+        for f in fixes:
+            try:
+                row = array[m, vtindex[f.findtext('validTime')]]
+                values = dict(zip(("longitude", "latitude"),
+                                  parsePosition(f.find('longitude'),
+                                                f.find('latitude'))))
+                values['pcentre'] = getMSLP(f)
+                values['windspeed'] = getWindSpeed(f)
+                values['rmax'] = getRmax(f)
+                values['poci'] = getPoci(f)
+            except Exception as e:
+                if errors is None:
+                    raise
+                recordError(errors, 'fix', fixIdentifier(distId, f, member),
+                            e)
+                continue
+            for field, value in values.items():
+                if value is None:
+                    if missing is not None and field in OPTIONAL_FIELDS:
+                        recordMissing(missing, field,
+                                      partial(fixIdentifier, distId, f,
+                                              member))
+                elif field in fieldIndex:
+                    row[fieldIndex[field]] = value
+            if radiiIndex:
+                radiiFixes.append(f)
+                radiiRows.append((m, vtindex[f.findtext('validTime')]))
+
+    if radiiFixes:
+        # All wind radii are extracted (and converted to km) in one call
+        radii = extractRadii(radiiFixes).reshape(len(radiiFixes), -1)
+        src, dest = zip(*radiiIndex)
+        m, t = np.array(radiiRows).T
+        array[m[:, None], t[:, None], np.array(dest)] = \
+            radii[:, np.array(src)]
+
+    return CompactEnsemble(array, validtime, members, fields,
+                           np.array(distIds), basetime)
@@ -1,6 +1,100 @@
 import math
-import numpy as np
-import numpy.ma as ma
+
+
+# Alternative names of units:
+UNIT_ALIASES = {'kmh': 'kph', 'km/h': 'kph', 'km h-1': 'kph',
+                'm/s': 'mps', 'm s-1': 'mps', 'kt': 'kts', 'kn': 'kts',
+                'mi/h': 'mph', 'mi h-1': 'mph', 'mb': 'hPa'}
+
+# Conversion tables, by input and then output units. These are built once,
+# when the module is imported, and only ever read, so they are shared by
+# every caller (and thread).
+CONVERSIONS = {
+    # Speeds:
+    "mps": {"kph": 3.6, "kts": 1.944, "mph": 2.2369},
+    "mph": {"kph": 1.60934, "kts": 0.86898, "mps": 0.44704},
+    "kph": {"kts": 0.539957, "mps": 0.2777778, "mph": 0.621371},
+    "kts": {"kph": 1.852, "mps": 0.5144, "mph": 1.15},
+
+    # Pressures:
+    "kPa": {"hPa": 10., "Pa": 1000.,
+            "inHg": 0.295299831,
+            "mmHg": 7.500615613,
+            "Pascals": 1000.},
+    "hPa": {"kPa": 0.1, "Pa": 100.,
+            "inHg": 0.02953,
+            "mmHg": 0.750061561,
+            "Pascals": 100.},
+    "Pa": {"kPa": 0.001,
+           "hPa": 0.01,
+           "inHg": 0.0002953,
+           "mmHg": 0.007500616,
+           "Pascals": 1.0},
+    "Pascals": {"kPa": 0.001,
+                "hPa": 0.01,
+                "inHg": 0.0002953,
+                "mmHg": 0.007500616,
+                "Pa": 1.0},
+    "inHg": {"kPa": 3.386388667,
+             "hPa": 33.863886667,
+             "Pa": 3386.388666667,
+             "mmHg": 25.4},
+    "mmHg": {"kPa": 0.13332239,
+             "hPa": 1.3332239,
+             "Pa": 133.32239,
+             "inHg": 0.0394},
+
+    # Temperatures:
+    "C": {"F": 1.8,
+          "K": 1.},
+    "F": {"C": 0.5556},
+    "K": {"C": 1.},
+
+    # Lengths:
+    "km": {"m": 1000.,
+           "mi": 0.621371192,
+           "deg": 0.00899886,
+           "nm": 0.539957,
+           "rad": 0.0001570783,
+           "ft": 3280.8399},
+    "m": {"km": 0.001,
+          "mi": 0.000621371,
+          "deg": 0.00000899886,
+          "nm": 0.000539957,
+          "rad": 0.0000001570783,
+          "ft": 3.2808399},
+    "deg": {"km": 111.1251,
+            "m": 111125.1,
+            "mi": 69.0499358,
+            "nm": 60.0,
+            "rad": math.pi/180.},
+    "mi": {"km": 1.60934,
+           "m": 1609.34,
+           "deg": 0.014482,
+           "ft": 5280.},
+    "nm": {"km": 1.852,
+           "m": 1852,
+           "deg": 0.01666,
+           "rad": math.pi/10800.,
+           "ft": 6076.1155},
+    "ft": {"km": 0.0003048,
+           "m": 0.3048,
+           "mi": 0.000189394,
+           "nm": 0.000164579},
+    "rad": {"nm": 10800./math.pi,
+            "km": 6366.248653,
+            "deg": 180./math.pi},
+
+    # Mixing ratio:
+    "gkg": {"kgkg": 0.001},
+    "kgkg": {"gkg": 1000}}
+
+# Additions required before multiplication:
+CONVERT_PRE = {"F": {"C": -32.}}
+# Additions required after multiplication:
+CONVERT_POST = {"C": {"K": 273.,
+                      "F": 32.},
+                "K": {"C": -273.}}
 
 
 def convert(value, inunits, outunits):
@@ -14,147 +108,47 @@ def convert(value, inunits, outunits):
     :returns: Value converted to ``outunits`` units.
 
     """
-    startValue = value
+    # numpy is imported here rather than at module level, so that importing
+    # this module (and `pycxml`) stays cheap.
+    import numpy.ma as ma
+
     value = ma.array(value, dtype=float)
     if inunits == outunits:
         # Do nothing:
         return value
-    if inunits == 'kmh':
-        inunits = 'kph'
-    if inunits == 'km/h':
-        inunits = 'kph'
-    if inunits == "m/s":
-        inunits = "mps"
-    if inunits == "m s-1":
-        inunits = "mps"
-    if inunits == 'kt':
-        inunits = 'kts'
-    if inunits == 'kn':
-        inunits = 'kts'
-
-    if outunits == 'kmh':
-        outunits = 'kph'
-    if outunits == 'km/h':
-        outunits = 'kph'
-    if outunits == "m/s":
-        outunits = "mps"
-    if outunits == "m s-1":
-        outunits = "mps"
-    if outunits == 'kt':
-        outunits = 'kts'
-    if outunits == 'kn':
-        outunits = 'kts'
+    inunits = UNIT_ALIASES.get(inunits, inunits)
+    outunits = UNIT_ALIASES.get(outunits, outunits)
 
-    # Speeds:
-    mps = {"kph": 3.6, "kts": 1.944, "mph": 2.2369}
-    mph = {"kph": 1.60934, "kts": 0.86898, "mps": 0.44704}
-    kph = {"kts": 0.539957, "mps": 0.2777778, "mph": 0.621371}
-    kts = {"kph": 1.852, "mps": 0.5144, "mph": 1.15}
+    if outunits in CONVERT_PRE.get(inunits, ()):
+        value += CONVERT_PRE[inunits][outunits]
 
-    # Temperatures:
-    C = {"F": 1.8,
-         "K": 1.}
-    F = {"C": 0.5556}
-    K = {"C": 1.}
+    if outunits in CONVERSIONS.get(inunits, ()):
+        value = value * CONVERSIONS[inunits][outunits]
 
-    # Pressures:
-    kPa = {"hPa": 10., "Pa": 1000.,
-           "inHg": 0.295299831,
-           "mmHg": 7.500615613,
-           "Pascals": 1000.}
-    hPa = {"kPa": 0.1, "Pa": 100.,
-           "inHg": 0.02953,
-           "mmHg": 0.750061561,
-           "Pascals": 100.}
-    Pa = {"kPa": 0.001,
-          "hPa": 0.01,
-          "inHg": 0.0002953,
-          "mmHg": 0.007500616,
-          "Pascals": 1.0}
-    inHg = {"kPa": 3.386388667,
-            "hPa": 33.863886667,
-            "Pa": 3386.388666667,
-            "mmHg": 25.4}
-    mmHg = {"kPa": 0.13332239,
-            "hPa": 1.3332239,
-            "Pa": 133.32239,
-            "inHg": 0.0394}
-    pascals = {"kPa": 0.001,
-               "hPa": 0.01,
-               "inHg": 0.0002953,
-               "mmHg": 0.007500616,
-               "Pa": 1.0}
+    if outunits in CONVERT_POST.get(inunits, ()):
+        value += CONVERT_POST[inunits][outunits]
 
-    # Lengths:
-    km = {"m": 1000.,
-          "mi": 0.621371192,
-          "deg": 0.00899886,
-          "nm": 0.539957,
-          "rad": 0.0001570783}
-    deg = {"km": 111.1251,
-           "m": 111125.1,
-           "mi": 69.0499358,
-           "nm": 60.0,
-           "rad": math.pi/180.}
-    m = {"km": 0.001,
-         "mi": 0.000621371,
-         "deg": 0.00000899886,
-         "nm": 0.000539957,
-         "rad": 0.0000001570783}
-    mi = {"km": 1.60934,
-          "m": 1609.34,
-          "deg": 0.014482}
-    nm = {"km": 1.852,
-          "m": 1852,
-          "deg": 0.01666,
-          "rad": math.pi/10800.}
-    rad = {"nm": 10800./math.pi,
-           "km": 6366.248653,
-           "deg": 180./math.pi}
+    return value
 
-    # Mixing ratio:
-    gkg = {"kgkg": 0.001}
-    kgkg = {"gkg": 1000}
-
-    convert = {"mps": mps,
-               "mph": mph,
-               "kph": kph,
-               "kts": kts,
-               "kPa": kPa,
-               "hPa": hPa,
-               "Pa": Pa,
-               "Pascals": pascals,
-               "inHg": inHg,
-               "mmHg": mmHg,
-               "C": C,
-               "F": F,
-               "K": K,
-               "km": km,
-               "m": m,
-               "deg": deg,
-               "mi": mi,
-               "nm": nm,
-               "rad": rad,
-               "gkg": gkg,
-               "kgkg": kgkg}
-
-    # Additions required before multiplication:
-    convert_pre = {"F": {"C": -32.}}
-    # Additions required after multiplication:
-    convert_post = {"C": {"K": 273.,
-                          "F": 32.},
-                    "K": {"C": -273.}}
-
-    if inunits in convert_pre:
-        if outunits in convert_pre[inunits]:
-            value += convert_pre[inunits][outunits]
-
-    if inunits in convert:
-        if outunits in convert[inunits]:
-            value = value * convert[inunits][outunits]
-
-    if inunits in convert_post:
-        if outunits in convert_post[inunits]:
-            value += convert_post[inunits][outunits]
 
-    return value
+def convertArray(values, units, outunits):
+    """
+    Convert an array of values with an array of (input) units, calling
+    `convert` once for each distinct unit.
+
+    :param values: array of values to be converted.
+    :param units: array of the input units of each value.
+    :param str outunits: Output units.
+
+    :returns: :class:`numpy.ndarray` of float values, converted to
+    ``outunits`` units.
+    """
+    import numpy as np
+
+    result = np.array(values, dtype=float)
+    units = np.asarray(units)
+    for inunits in np.unique(units):
+        sel = units == inunits
+        result[sel] = np.asarray(convert(result[sel], inunits, outunits),
+                                 dtype=float)
+    return result
@@ -0,0 +1,276 @@
+"""
+extractor - Typed extraction of any fix field described by the CXML schema
+
+`pycxml.parseFix` reads a handful of fields, each with its own `find` call.
+Here the fields of a fix are instead described by a table built once from
+the schema (`extractorTable`): the element path below `fix`, the data type,
+the type of the `units` attribute and whether the element is nillable, along
+with the attributes (`source`, `precision`, `sector`, ...) of each element.
+
+`extractFixes` walks the elements of each fix once, following only the
+branches that hold a requested field, and collects the raw text of every
+field. The values are then converted to typed columns in bulk: numbers with
+`pandas.to_numeric`, and quantities to common units (`OUTPUT_UNITS`) with one
+call to `converter.convert` per distinct unit. Requesting every field costs
+little more than requesting a few.
+
+Field names are the element path below `fix`, joined with "." and without
+the `cycloneData` level (e.g. "Dvorak.finalTnumber", "eye.diameter",
+"maximumWind.speed"). Attributes are named "<element>@<attribute>" (e.g.
+"eye@source", "minimumPressure.pressure@precision"), or just the attribute
+name for attributes of `fix` and `cycloneData` (e.g. "hour").
+
+Repeated elements (a fix may carry several `cycloneData` elements) are read
+from their first occurrence, as in `pycxml.parseFix`. Wind, sea and fixed
+radii contours are not included, as they are held in arrays by `windradii`.
+
+"""
+
+import logging as log
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from functools import lru_cache
+
+from validator import CXML_SCHEMA, XS
+from converter import convertArray
+
+XSI_NIL = "{http://www.w3.org/2001/XMLSchema-instance}nil"
+
+# Data types of schema types; any other type is read as text:
+DTYPES = {"anyNumber": "float", "xs:decimal": "float",
+          "xs:integer": "int", "xs:dateTime": "datetime",
+          "xs:boolean": "bool"}
+
+# Units that quantities are converted to, for each type of `units`
+# attribute. Other quantities (times, angles, precipitation rates,
+# positions) are returned as given, with their units in an "@units" field.
+OUTPUT_UNITS = {"lengthType": "km", "speedType": "km/h",
+                "pressureType": "hPa", "tempType": "C"}
+
+Field = namedtuple('Field', ['name', 'path', 'attribute', 'dtype', 'units',
+                             'nillable'])
+Field.__doc__ = """
+A field of a fix that can be extracted.
+
+:param str name: name of the field, and of its column.
+:param tuple path: tags of the elements from `fix` down to the field's
+element.
+:param str attribute: name of the attribute holding the value, or None if
+the value is the element's text.
+:param str dtype: "float", "int", "str", "datetime" or "bool".
+:param str units: schema type of the element's `units` attribute (e.g.
+"lengthType"), or None.
+:param bool nillable: whether the element may be empty (`xsi:nil`).
+"""
+
+
+def _fieldName(path, attribute=None):
+    """
+    Name of the field held by the element at `path`, or by one of its
+    attributes.
+    """
+    name = ".".join(tag for tag in path if tag != 'cycloneData')
+    if attribute is None:
+        return name
+    return f"{name}@{attribute}" if name else attribute
+
+
+class _TableBuilder:
+    """
+    Collect the fields of the elements below `fix` in a schema.
+    """
+
+    def __init__(self, xsd):
+        self.elements = {e.attrib['name']: e
+                         for e in xsd.findall(f"{XS}element")}
+        self.fields = []
+
+    def attributes(self, path, attrs, units=None):
+        for attr in attrs:
+            name, atype = attr.attrib['name'], attr.attrib.get('type')
+            if name == 'units':
+                continue
+            # A precision is given in the units of its element
+            self.fields.append(Field(_fieldName(path, name), path, name,
+                                     DTYPES.get(atype, "str"),
+                                     units if name == 'precision' else None,
+                                     False))
+
+    def visit(self, decl, path):
+        name = decl.attrib.get('ref') or decl.attrib['name']
+        elem = self.elements.get(name, decl)
+        if path or name != 'fix':
+            path = path + (name,)
+        nillable = elem.attrib.get('nillable') == 'true'
+        ctype = elem.find(f"{XS}complexType")
+        if ctype is None:
+            restriction = elem.find(f"{XS}simpleType/{XS}restriction")
+            base = elem.attrib.get('type') if restriction is None else \
+                restriction.attrib.get('base')
+            self.fields.append(Field(_fieldName(path), path, None,
+                                     DTYPES.get(base, "str"), None,
+                                     nillable))
+            return
+        if ctype.attrib.get('mixed') == 'true':
+            # Contours, which are held by `windradii`
+            return
+        ext = ctype.find(f"{XS}simpleContent/{XS}extension")
+        if ext is None:
+            self.attributes(path, ctype.findall(f"{XS}attribute"))
+            for group in (f"{XS}sequence", f"{XS}all"):
+                for child in ctype.findall(f"{group}/{XS}element"):
+                    self.visit(child, path)
+            return
+        attrs = ext.findall(f"{XS}attribute")
+        units = next((a.attrib.get('type') for a in attrs
+                      if a.attrib['name'] == 'units'), None)
+        self.fields.append(Field(_fieldName(path), path, None,
+                                 DTYPES.get(ext.attrib.get('base'), "str"),
+                                 units, nillable))
+        if units is not None and units not in OUTPUT_UNITS:
+            self.fields.append(Field(_fieldName(path, 'units'), path,
+                                     'units', "str", None, False))
+        self.attributes(path, attrs, units)
+
+
+@lru_cache(maxsize=None)
+def extractorTable(xsd_file: str = CXML_SCHEMA) -> tuple:
+    """
+    The fields of a fix described by a schema, reading the schema on the
+    first request only.
+
+    :param str xsd_file: Name of the CXML XSD file.
+
+    :returns: tuple of :class:`Field`, in schema order.
+    """
+    log.debug("Building extractor table from schema %s", xsd_file)
+    xsd = ET.parse(xsd_file).getroot()
+    builder = _TableBuilder(xsd)
+    builder.visit(builder.elements['fix'], ())
+    return tuple(builder.fields)
+
+
+def selectFields(fields=None, xsd_file=CXML_SCHEMA) -> list:
+    """
+    Look up fields in the extractor table.
+
+    :param fields: list of field names, or None (or "all") for every field.
+    :param str xsd_file: Name of the CXML XSD file.
+
+    :returns: list of :class:`Field`, in the order requested.
+    :raises ValueError: if a field is not described by the schema.
+    """
+    table = extractorTable(xsd_file)
+    if fields is None or fields == "all":
+        return list(table)
+    if isinstance(fields, str):
+        fields = [fields]
+    byName = {f.name: f for f in table}
+    unknown = [name for name in fields if name not in byName]
+    if unknown:
+        raise ValueError(f"Unknown fix fields: {', '.join(unknown)}")
+    return [byName[name] for name in fields]
+
+
+def _tree(table):
+    """
+    Arrange fields as a tree of element tags, so that each fix can be read
+    in a single pass. Each node is a dict with the index of the field held
+    by the element's text ('text'), the indices of the fields held by its
+    attributes ('attrs'), and its child nodes ('children').
+    """
+    root = {'text': None, 'attrs': {}, 'children': {}}
+    for i, field in enumerate(table):
+        node = root
+        for tag in field.path:
+            node = node['children'].setdefault(
+                tag, {'text': None, 'attrs': {}, 'children': {}})
+        if field.attribute is None:
+            node['text'] = i
+        else:
+            node['attrs'][field.attribute] = i
+    return root
+
+
+def _collect(elem, node, row, values, units):
+    """
+    Record the raw values of the fields below an element, keeping the
+    first value found for each field.
+    """
+    for attr, i in node['attrs'].items():
+        if values[i][row] is None:
+            values[i][row] = elem.get(attr)
+            if i in units:
+                units[i][row] = elem.get('units')
+    i = node['text']
+    if i is not None and values[i][row] is None and \
+            elem.get(XSI_NIL) != 'true':
+        values[i][row] = (elem.text or "").strip() or None
+        if i in units:
+            units[i][row] = elem.get('units')
+    children = node['children']
+    for child in elem:
+        sub = children.get(child.tag)
+        if sub is not None:
+            _collect(child, sub, row, values, units)
+
+
+def _typed(field, values, units=None):
+    """
+    Convert the raw values of a field to an array of its data type, and
+    quantities to `OUTPUT_UNITS`.
+    """
+    import numpy as np
+    import pandas as pd
+
+    # Most fields of the schema are absent from any given file
+    if field.dtype == "float" and not any(values):
+        return np.full(len(values), np.nan)
+    if field.dtype == "str" and not any(values):
+        return np.full(len(values), None, dtype=object)
+    series = pd.Series(values, dtype=object)
+    if field.dtype == "float":
+        result = pd.to_numeric(series, errors='coerce').to_numpy(float)
+        if units is not None:
+            units = np.array([u or "" for u in units])
+            result = convertArray(result, units, OUTPUT_UNITS[field.units])
+        return result
+    if field.dtype == "int":
+        return pd.to_numeric(series, errors='coerce').astype("Int64").array
+    if field.dtype == "datetime":
+        times = pd.to_datetime(series, format="ISO8601", utc=True,
+                               errors='coerce')
+        return times.dt.tz_localize(None).to_numpy()
+    if field.dtype == "bool":
+        return series.map({"true": True, "1": True, "false": False,
+                           "0": False}).astype("boolean").array
+    return series.to_numpy()
+
+
+def extractFixes(fixes, fields=None, xsd_file=CXML_SCHEMA):
+    """
+    Extract fields from a sequence of fixes into typed columns.
+
+    :param list fixes: `fix` elements (from :mod:`xml.etree.ElementTree` or
+    `lxml`).
+    :param fields: list of field names (see `selectFields`), or None for
+    every field in the schema.
+    :param str xsd_file: Name of the CXML XSD file.
+
+    :returns: :class:`pandas.DataFrame` with one row per fix and one column
+    per field. Missing and nil values are NaN (or NA, NaT or None).
+    Quantities are converted to `OUTPUT_UNITS` (e.g. "eye.diameter" in km).
+    """
+    import pandas as pd
+
+    table = selectFields(fields, xsd_file)
+    tree = _tree(table)
+    nfixes = len(fixes)
+    values = [[None] * nfixes for _ in table]
+    units = {i: [None] * nfixes for i, field in enumerate(table)
+             if field.units in OUTPUT_UNITS}
+    for row, fix in enumerate(fixes):
+        _collect(fix, tree, row, values, units)
+    return pd.DataFrame({field.name: _typed(field, values[i], units.get(i))
+                         for i, field in enumerate(table)},
+                        index=range(nfixes))
@@ -0,0 +1,171 @@
+"""
+fixindex - Spatial and temporal index over parsed fixes
+
+Answers "which fixes lie within 500 km of a site" and "which tracks pass
+through a box between T1 and T2" without scanning every fix. Positions are
+held in a KD-tree built on unit-sphere coordinates, so straight-line (chord)
+distances in the tree map directly onto great-circle distances, and
+longitudes either side of the 0/360 meridian are neighbours. Validtimes are
+held in a sorted index and queried with a binary search.
+
+Requires `scipy`.
+
+"""
+
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from interpolate import toCartesian, TRACK_KEYS
+
+EARTH_RADIUS = 6371.  # km
+
+
+def _chord(distance):
+    """
+    Chord length on the unit sphere for a great-circle distance in km.
+    """
+    return 2. * np.sin(np.minimum(distance / EARTH_RADIUS, np.pi) / 2.)
+
+
+def _datetime64(value):
+    return np.datetime64(pd.Timestamp(value).to_datetime64(), 's')
+
+
+class FixIndex:
+    """
+    Index over the fixes in one or more `pycxml.loadfile` results.
+
+    :param tracks: :class:`pandas.DataFrame`, or a list of DataFrames (one
+    per ensemble member or per file), as returned by `pycxml.loadfile`.
+    """
+
+    def __init__(self, tracks):
+        from scipy.spatial import cKDTree
+
+        frames = list(tracks) if isinstance(tracks, (list, tuple)) \
+            else [tracks]
+        self.fixes = pd.concat(frames, ignore_index=True)
+        self.xyz = toCartesian(self.fixes['longitude'].values.astype(float),
+                               self.fixes['latitude'].values.astype(float))
+        self.tree = cKDTree(self.xyz)
+        self.times = pd.to_datetime(self.fixes['validtime']).values.astype(
+            'datetime64[s]')
+        self.order = np.argsort(self.times, kind='stable')
+        self.sortedtimes = self.times[self.order]
+
+    def __len__(self):
+        return len(self.fixes)
+
+    def _timeMask(self, rows, start, end):
+        """
+        Restrict candidate rows to those valid within [start, end].
+        """
+        mask = np.ones(len(rows), dtype=bool)
+        if start is not None:
+            mask &= self.times[rows] >= _datetime64(start)
+        if end is not None:
+            mask &= self.times[rows] <= _datetime64(end)
+        return rows[mask]
+
+    def timeWindow(self, start=None, end=None):
+        """
+        Positions of fixes valid between `start` and `end` (inclusive).
+
+        :returns: sorted :class:`numpy.ndarray` of row positions
+        """
+        lo = 0 if start is None else np.searchsorted(
+            self.sortedtimes, _datetime64(start), side='left')
+        hi = len(self) if end is None else np.searchsorted(
+            self.sortedtimes, _datetime64(end), side='right')
+        return np.sort(self.order[lo:hi])
+
+    def withinRadius(self, lon, lat, distance, start=None, end=None):
+        """
+        Positions of fixes within `distance` km of a point, optionally
+        restricted to a time window.
+
+        :param float lon: longitude of the point (degrees)
+        :param float lat: latitude of the point (degrees)
+        :param float distance: search radius (km)
+
+        :returns: sorted :class:`numpy.ndarray` of row positions
+        """
+        centre = toCartesian(np.array([lon]), np.array([lat]))[0]
+        rows = np.array(self.tree.query_ball_point(centre, _chord(distance)),
+                        dtype=np.intp)
+        return np.sort(self._timeMask(rows, start, end))
+
+    def withinBox(self, lonmin, lonmax, latmin, latmax, start=None,
+                  end=None):
+        """
+        Positions of fixes within a longitude/latitude box, optionally
+        restricted to a time window. If `lonmin` > `lonmax` the box crosses
+        the 0/360 meridian.
+
+        :returns: sorted :class:`numpy.ndarray` of row positions
+        """
+        lonmin, lonmax = np.mod(lonmin, 360.), np.mod(lonmax, 360.)
+        width = np.mod(lonmax - lonmin, 360.) or 360.
+        # Candidates come from a circle enclosing points sampled along the
+        # edges of the box, then are filtered exactly:
+        clon = lonmin + width / 2.
+        clat = (latmin + latmax) / 2.
+        centre = toCartesian(np.array([clon]), np.array([clat]))[0]
+        elon = np.linspace(lonmin, lonmin + width, 17)
+        elat = np.linspace(latmin, latmax, 17)
+        edges = toCartesian(
+            np.concatenate([elon, elon, np.full(17, lonmin),
+                            np.full(17, lonmin + width)]),
+            np.concatenate([np.full(17, latmin), np.full(17, latmax),
+                            elat, elat]))
+        reach = np.linalg.norm(edges - centre, axis=1).max()
+        if width > 180.:
+            reach = 2.
+        rows = np.array(self.tree.query_ball_point(centre, reach + 1e-9),
+                        dtype=np.intp)
+
+        lon = np.mod(self.fixes['longitude'].values[rows].astype(float),
+                     360.)
+        lat = self.fixes['latitude'].values[rows].astype(float)
+        inlon = np.mod(lon - lonmin, 360.) <= width
+        inlat = (lat >= latmin) & (lat <= latmax)
+        return np.sort(self._timeMask(rows[inlon & inlat], start, end))
+
+    def select(self, rows):
+        """
+        The fixes at the given row positions.
+
+        :returns: :class:`pandas.DataFrame`
+        """
+        return self.fixes.iloc[rows]
+
+    def tracks(self, rows):
+        """
+        The distinct tracks (disturbance and, for ensembles, member) that
+        the given fixes belong to.
+
+        :returns: :class:`pandas.DataFrame`
+        """
+        keys = [k for k in TRACK_KEYS if k in self.fixes.columns]
+        return self.fixes.iloc[rows][keys].drop_duplicates().reset_index(
+            drop=True)
+
+    def save(self, path):
+        """
+        Write the index to `path`, so it can be stored alongside the parsed
+        data it was built from.
+        """
+        with open(path, 'wb') as fh:
+            pickle.dump(self, fh, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path):
+        """
+        Read an index written by :meth:`FixIndex.save`.
+
+        :returns: :class:`FixIndex`
+        """
+        with open(path, 'rb') as fh:
+            return pickle.load(fh)
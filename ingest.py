@@ -0,0 +1,266 @@
+"""
+ingest - Incremental ingestion of CXML bulletins from a spool directory
+
+New bulletins arrive in a spool directory every few minutes. Rather than
+re-running `pycxml.loadfile` over the whole directory, `ingest` keeps a
+manifest of the files it has processed (path, size, mtime and content hash)
+and parses only files that are new or have changed, using a bounded pool of
+worker processes. Each parsed result is written to a store directory, keyed
+by the content hash of the source file, as soon as it is available. The
+results of files that change or are deleted from the spool are removed from
+the store, so it does not grow without bound.
+
+`watch` repeats `ingest` at a fixed interval.
+
+"""
+
+import os
+import glob
+import json
+import time
+import pickle
+import hashlib
+import logging as log
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pycxml
+
+MANIFEST = "manifest.json"
+
+
+def fileHash(path, blocksize=1 << 20):
+    """
+    SHA-1 hash of the contents of a file.
+
+    :param str path: file to hash.
+
+    :returns: hexadecimal digest
+    """
+    sha = hashlib.sha1()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(blocksize), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+class Manifest:
+    """
+    Record of the files that have been ingested into a store. Entries are
+    keyed by absolute path and hold the size, mtime and SHA-1 hash of the
+    file when it was processed, and the name of the stored result (or the
+    error raised while parsing it).
+
+    :param str path: location of the manifest file. It is created on the
+    first call to :meth:`save`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.isfile(path):
+            with open(path) as fh:
+                self.entries = json.load(fh)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, path):
+        return os.path.abspath(path) in self.entries
+
+    def pending(self, path):
+        """
+        Determine whether a file needs to be (re-)parsed. The size and mtime
+        are compared first; the file is only hashed if either has changed.
+
+        :param str path: file to check.
+
+        :returns: tuple of (pending, stat, hash). `hash` is None if the file
+        was not hashed.
+        """
+        key = os.path.abspath(path)
+        stat = os.stat(path)
+        entry = self.entries.get(key)
+        if entry is None:
+            return True, stat, None
+        if entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+            return False, stat, None
+        digest = fileHash(path)
+        if digest == entry['hash']:
+            # Touched but not modified:
+            entry['mtime'] = stat.st_mtime
+            return False, stat, digest
+        return True, stat, digest
+
+    def update(self, path, stat, digest, output=None, error=None):
+        """
+        Record the outcome of processing a file.
+
+        :returns: list of the stored results that are no longer referenced
+        by any entry (the file's previous result, unless another file with
+        the same contents still uses it), to be removed from the store.
+        """
+        key = os.path.abspath(path)
+        previous = self.entries.get(key, {}).get('output')
+        self.entries[key] = {
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'hash': digest,
+            'output': output,
+            'error': error,
+        }
+        return self._unreferenced([previous])
+
+    def prune(self):
+        """
+        Remove the entries of files that no longer exist.
+
+        :returns: list of the stored results that are no longer referenced,
+        as for :meth:`update`.
+        """
+        gone = [key for key in self.entries if not os.path.exists(key)]
+        outputs = [self.entries.pop(key)['output'] for key in gone]
+        if gone:
+            log.info("Removed %d deleted files from the manifest", len(gone))
+        return self._unreferenced(outputs)
+
+    def _unreferenced(self, outputs):
+        used = {entry['output'] for entry in self.entries.values()}
+        return sorted({o for o in outputs if o is not None and o not in used})
+
+    def save(self):
+        """
+        Write the manifest. The file is replaced atomically so a reader never
+        sees a partial manifest.
+        """
+        tmpfile = f"{self.path}.tmp"
+        with open(tmpfile, 'w') as fh:
+            json.dump(self.entries, fh, indent=1)
+        os.replace(tmpfile, self.path)
+
+
+def _parse(path):
+    """
+    Worker function: parse a single file.
+    """
+    return pycxml.loadfile(path)
+
+
+def _store(result, store, digest):
+    """
+    Write a parsed result to the store, and return the name of the file it
+    was written to.
+    """
+    name = f"{digest}.pkl"
+    tmpfile = os.path.join(store, f"{name}.tmp")
+    with open(tmpfile, 'wb') as fh:
+        pickle.dump(result, fh, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmpfile, os.path.join(store, name))
+    return name
+
+
+def _remove(store, outputs):
+    """
+    Remove stored results that are no longer referenced by the manifest.
+    """
+    for name in outputs:
+        try:
+            os.remove(os.path.join(store, name))
+        except FileNotFoundError:
+            pass
+
+
+def ingest(spooldir, store, pattern="*.xml", workers=4, settle=2.):
+    """
+    Parse the files in `spooldir` that are new or have changed since the
+    last call, and write the results to `store`.
+
+    :param str spooldir: directory bulletins arrive in.
+    :param str store: directory parsed results and the manifest are written
+    to. It is created if it does not exist.
+    :param str pattern: glob pattern for bulletin files.
+    :param int workers: maximum number of worker processes.
+    :param float settle: files modified less than `settle` seconds ago are
+    left for the next call, as they may still be being written.
+
+    :returns: list of the files that were ingested.
+    """
+    os.makedirs(store, exist_ok=True)
+    manifest = Manifest(os.path.join(store, MANIFEST))
+    now = time.time()
+    # Results of files deleted from the spool are dropped from the store
+    stale = manifest.prune()
+
+    todo = {}
+    for path in sorted(glob.glob(os.path.join(spooldir, pattern))):
+        if not os.path.isfile(path):
+            continue
+        pending, stat, digest = manifest.pending(path)
+        if not pending or now - stat.st_mtime < settle:
+            continue
+        todo[path] = (stat, digest or fileHash(path))
+
+    if not todo:
+        manifest.save()
+        _remove(store, stale)
+        return []
+
+    log.info("Ingesting %d new or changed files from %s",
+             len(todo), spooldir)
+    ingested = []
+    with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as pool:
+        futures = {pool.submit(_parse, path): path for path in todo}
+        for future in as_completed(futures):
+            path = futures[future]
+            stat, digest = todo[path]
+            try:
+                result = future.result()
+            except Exception as e:
+                log.error("Failed to parse %s: %s", path, e)
+                stale += manifest.update(path, stat, digest, error=str(e))
+            else:
+                output = _store(result, store, digest)
+                stale += manifest.update(path, stat, digest, output=output)
+                ingested.append(path)
+            # Keep the manifest current, so results are visible to readers
+            # as soon as each file is done. Replaced results are removed
+            # only once the manifest no longer refers to them.
+            manifest.save()
+            _remove(store, stale)
+            stale = []
+    return ingested
+
+
+def readStore(store):
+    """
+    Read all results held in a store.
+
+    :param str store: directory written by `ingest`.
+
+    :returns: generator of (source path, parsed result) tuples
+    """
+    manifest = Manifest(os.path.join(store, MANIFEST))
+    for path, entry in manifest.entries.items():
+        if entry['output'] is None:
+            continue
+        with open(os.path.join(store, entry['output']), 'rb') as fh:
+            yield path, pickle.load(fh)
+
+
+def watch(spooldir, store, interval=60., iterations=None, **kwargs):
+    """
+    Ingest new bulletins from `spooldir` every `interval` seconds.
+
+    :param str spooldir: directory bulletins arrive in.
+    :param str store: directory parsed results are written to.
+    :param float interval: seconds between scans of `spooldir`.
+    :param int iterations: number of scans to make. Runs until interrupted
+    if None.
+    :param kwargs: passed to `ingest`.
+    """
+    count = 0
+    while iterations is None or count < iterations:
+        start = time.time()
+        ingest(spooldir, store, **kwargs)
+        count += 1
+        if iterations is None or count < iterations:
+            time.sleep(max(0., interval - (time.time() - start)))
@@ -0,0 +1,212 @@
+"""
+interpolate - Resample forecast tracks to regular time steps
+
+Forecast fixes are issued at irregular lead times (6, 12, 24 hours...), but
+wind field and risk models need tracks at hourly or sub-hourly steps. The
+functions here resample every track in a `pycxml.loadfile` result at once:
+all fixes are stacked into flat arrays, and the bracketing fixes of each
+output time are found with a single sorted search rather than a loop over
+members.
+
+Positions are interpolated along great circles, so tracks crossing the
+0/360 meridian returned by `pycxml.parsePosition` are handled correctly.
+Other fields are interpolated linearly, or with a cubic Hermite spline.
+
+"""
+
+import numpy as np
+import pandas as pd
+
+from pycxml import RADII_COLUMNS
+
+INTERP_FIELDS = ["pcentre", "windspeed", "rmax", "poci"] + RADII_COLUMNS
+TRACK_KEYS = ["disturbance", "member"]
+
+
+def toCartesian(lon, lat):
+    """
+    Convert geographic coordinates to unit vectors.
+
+    :param lon: :class:`numpy.ndarray` of longitudes (degrees)
+    :param lat: :class:`numpy.ndarray` of latitudes (degrees)
+
+    :returns: :class:`numpy.ndarray` of shape (n, 3)
+    """
+    lon = np.radians(lon)
+    lat = np.radians(lat)
+    coslat = np.cos(lat)
+    return np.stack([coslat * np.cos(lon), coslat * np.sin(lon),
+                     np.sin(lat)], axis=-1)
+
+
+def toGeographic(xyz):
+    """
+    Convert (not necessarily unit) vectors to geographic coordinates.
+
+    :param xyz: :class:`numpy.ndarray` of shape (n, 3)
+
+    :returns: tuple of (longitude [0, 360), latitude) arrays, in degrees
+    """
+    x, y, z = xyz[..., 0], xyz[..., 1], xyz[..., 2]
+    lat = np.degrees(np.arctan2(z, np.hypot(x, y)))
+    lon = np.mod(np.degrees(np.arctan2(y, x)), 360.)
+    return lon, lat
+
+
+def slerp(a, b, w):
+    """
+    Spherical linear interpolation between unit vectors `a` and `b`.
+
+    :param a: :class:`numpy.ndarray` of shape (n, 3)
+    :param b: :class:`numpy.ndarray` of shape (n, 3)
+    :param w: :class:`numpy.ndarray` of weights in [0, 1], shape (n,)
+
+    :returns: :class:`numpy.ndarray` of shape (n, 3)
+    """
+    dot = np.clip(np.einsum('ij,ij->i', a, b), -1., 1.)
+    omega = np.arccos(dot)
+    sinomega = np.sin(omega)
+    small = sinomega < 1e-10
+    sinomega = np.where(small, 1., sinomega)
+    wa = np.where(small, 1. - w, np.sin((1. - w) * omega) / sinomega)
+    wb = np.where(small, w, np.sin(w * omega) / sinomega)
+    return wa[:, None] * a + wb[:, None] * b
+
+
+def _tangents(values, times, start, end):
+    """
+    Finite-difference tangents for cubic Hermite interpolation. Interior
+    points use centred differences, track end points one-sided differences.
+
+    :param values: :class:`numpy.ndarray` of shape (n, k), sorted by track
+    then time.
+    :param times: :class:`numpy.ndarray` of times (float), shape (n,)
+    :param start: index of the first fix of the track each row belongs to.
+    :param end: index of the last fix of the track each row belongs to.
+    """
+    idx = np.arange(len(times))
+    prev = np.maximum(idx - 1, start)
+    nxt = np.minimum(idx + 1, end)
+    dt = times[nxt] - times[prev]
+    dt = np.where(dt == 0, np.nan, dt)
+    slope = (values[nxt] - values[prev]) / dt[:, None]
+    return np.where(np.isnan(slope) & ~np.isnan(values), 0., slope)
+
+
+def _hermite(p0, p1, m0, m1, w, h):
+    """
+    Evaluate a cubic Hermite segment at fractional position `w`.
+    """
+    w = w[:, None]
+    h = h[:, None]
+    w2 = w * w
+    w3 = w2 * w
+    return ((2 * w3 - 3 * w2 + 1) * p0 + (w3 - 2 * w2 + w) * h * m0 +
+            (-2 * w3 + 3 * w2) * p1 + (w3 - w2) * h * m1)
+
+
+def _stack(frames):
+    """
+    Concatenate track frames and sort by track, then validtime.
+
+    :returns: tuple of (sorted frame, track number of each row)
+    """
+    df = pd.concat([f.assign(_frame=i) for i, f in enumerate(frames)],
+                   ignore_index=True)
+    keys = ['_frame'] + [k for k in TRACK_KEYS if k in df.columns]
+    df['_time'] = pd.to_datetime(df['validtime']).values.astype(
+        'datetime64[s]').astype(np.int64)
+    df = df.sort_values(keys + ['_time'], kind='stable', ignore_index=True)
+    track = df.groupby(keys, sort=False, dropna=False).ngroup().values
+    return df, track
+
+
+def interpolateTracks(tracks, freq="1h", method="linear",
+                      fields=INTERP_FIELDS):
+    """
+    Interpolate all tracks in a `pycxml.loadfile` result to regular time
+    steps.
+
+    :param tracks: :class:`pandas.DataFrame`, or list of DataFrames (one per
+    ensemble member), as returned by `pycxml.loadfile`.
+    :param freq: output time step, as understood by :class:`pandas.Timedelta`
+    :param str method: "linear" or "cubic". Cubic interpolation uses a
+    cubic Hermite spline with finite-difference tangents.
+    :param list fields: fields to interpolate, in addition to position.
+    Fields not present in the input are ignored.
+
+    :returns: track(s) at the output time steps, in the same form as the
+    input. Output times are multiples of `freq` that fall within the span of
+    each track.
+    """
+    if method not in ("linear", "cubic"):
+        raise ValueError(f"Unknown interpolation method: {method}")
+
+    islist = isinstance(tracks, (list, tuple))
+    frames = list(tracks) if islist else [tracks]
+    if sum(len(f) for f in frames) == 0:
+        return tracks
+
+    step = int(pd.Timedelta(freq).total_seconds())
+    if step <= 0:
+        raise ValueError("Interpolation time step must be positive")
+
+    df, track = _stack(frames)
+    fields = [f for f in fields if f in df.columns]
+    times = df['_time'].values
+    xyz = toCartesian(df['longitude'].values.astype(float),
+                      df['latitude'].values.astype(float))
+    values = df[fields].to_numpy(dtype=float, na_value=np.nan)
+
+    # Extent of each track in the sorted arrays:
+    ntracks = track[-1] + 1
+    first = np.searchsorted(track, np.arange(ntracks), side='left')
+    last = np.searchsorted(track, np.arange(ntracks), side='right') - 1
+
+    # Output times: multiples of `step` within the span of each track
+    tstart = -(-times[first] // step) * step
+    tend = times[last] // step * step
+    counts = np.maximum((tend - tstart) // step + 1, 0)
+    outtrack = np.repeat(np.arange(ntracks), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) -
+                                                  counts, counts)
+    outtimes = np.repeat(tstart, counts) + offsets * step
+
+    # Bracketing fixes, found with one search over (track, time) keys:
+    span = times.max() - times.min() + 1
+    keys = track * span + (times - times.min())
+    outkeys = outtrack * span + (outtimes - times.min())
+    lo = np.searchsorted(keys, outkeys, side='right') - 1
+    lo = np.clip(lo, first[outtrack], np.maximum(last[outtrack] - 1,
+                                                 first[outtrack]))
+    hi = np.minimum(lo + 1, last[outtrack])
+    h = (times[hi] - times[lo]).astype(float)
+    w = np.where(h > 0, (outtimes - times[lo]) / np.where(h > 0, h, 1.), 0.)
+
+    if method == "linear":
+        pos = slerp(xyz[lo], xyz[hi], w)
+        out = values[lo] + w[:, None] * (values[hi] - values[lo])
+    else:
+        ftimes = times.astype(float)
+        start, end = first[track], last[track]
+        mxyz = _tangents(xyz, ftimes, start, end)
+        mvals = _tangents(values, ftimes, start, end)
+        pos = _hermite(xyz[lo], xyz[hi], mxyz[lo], mxyz[hi], w, h)
+        out = _hermite(values[lo], values[hi], mvals[lo], mvals[hi], w, h)
+
+    lon, lat = toGeographic(pos)
+    result = pd.DataFrame({'validtime': outtimes.astype('datetime64[s]'),
+                           'latitude': lat, 'longitude': lon})
+    for i, field in enumerate(fields):
+        result[field] = out[:, i]
+    for key in TRACK_KEYS:
+        if key in df.columns:
+            result.insert(0, key, df[key].values[lo])
+    result = result[[c for c in frames[0].columns if c in result.columns]]
+
+    if not islist:
+        return result
+    frameno = df['_frame'].values[lo]
+    bounds = np.searchsorted(frameno, np.arange(len(frames) + 1))
+    return [result.iloc[i:j].reset_index(drop=True)
+            for i, j in zip(bounds[:-1], bounds[1:])]
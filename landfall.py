@@ -0,0 +1,405 @@
+"""
+landfall - Landfall of every ensemble member, and its probability by coast
+
+Each member track is resampled to short time steps (see `interpolate`), and
+each step is treated as a straight segment in longitude and latitude. The
+coast is read either from land polygons (`Coastline`, GeoJSON) or from a
+gridded land mask (`LandMask`, an `.npz` file).
+
+For polygons, the edges of the coastline are held in a KD-tree on their
+midpoints. The coastline edges near every track segment, of every member,
+are found with one query of the tree, and all candidate pairs are tested
+for intersection at once. Rings are oriented so that land lies to the left
+of each edge, so a crossing from sea to land is a crossing with the track
+moving to the left of the edge. For a land mask, a landfall is a step from
+a sea cell to a land cell.
+
+Landfalls are reported for each member (`landfalls`), and the chance of
+first landfall on each part of the coast is the share of members making
+their first landfall there (`landfallProbability`). The coastline is divided
+into segments of about `SEGMENT_LENGTH` km along each ring; for a land mask
+each coastal cell is a segment.
+
+Requires `scipy`.
+
+"""
+
+import json
+import logging as log
+
+import numpy as np
+import pandas as pd
+
+from interpolate import interpolateTracks, TRACK_KEYS
+from windfield import distanceBearing
+
+SEGMENT_LENGTH = 50.  # km
+LANDFALL_COLUMNS = ["disturbance", "member", "landfall", "validtime",
+                    "latitude", "longitude", "pcentre", "windspeed",
+                    "segment"]
+PROBABILITY_COLUMNS = ["segment", "latitude", "longitude", "members",
+                       "probability"]
+
+
+def _signedArea(lon, lat):
+    return 0.5 * np.sum(lon[:-1] * lat[1:] - lon[1:] * lat[:-1])
+
+
+def _unwrap(lon):
+    """
+    Longitudes made continuous along a ring or track, so that no edge
+    spans more than 180 degrees, starting from the first in [0, 360).
+    """
+    step = np.mod(np.diff(lon) + 180., 360.) - 180.
+    return np.mod(lon[0], 360.) + np.concatenate([[0.], np.cumsum(step)])
+
+
+def _densify(lon, lat, maxlength):
+    """
+    Split the edges of a ring that are longer than `maxlength` (km), so
+    that each coastal segment is made of whole edges.
+    """
+    length, _ = distanceBearing(lon[:-1], lat[:-1], lon[1:], lat[1:])
+    pieces = np.maximum(np.ceil(length / maxlength), 1).astype(int)
+    edge = np.repeat(np.arange(len(pieces)), pieces)
+    w = (np.arange(pieces.sum()) - np.repeat(np.cumsum(pieces) - pieces,
+                                             pieces)) / pieces[edge]
+    return (np.append(lon[edge] + w * (lon[edge + 1] - lon[edge]), lon[-1]),
+            np.append(lat[edge] + w * (lat[edge + 1] - lat[edge]), lat[-1]))
+
+
+def _cellEdges(centres):
+    """
+    Edges of the cells of a grid axis, halfway between the cell centres.
+    """
+    if len(centres) < 2:
+        return np.array([-np.inf, np.inf])
+    half = np.diff(centres) / 2.
+    return np.concatenate([[centres[0] - half[0]], centres[:-1] + half,
+                           [centres[-1] + half[-1]]])
+
+
+def _cellIndex(edges, x):
+    """
+    Index of the cell holding each value of `x`, by binary search of the
+    cell edges, and whether it lies within the axis.
+    """
+    k = np.searchsorted(edges, x, side='right') - 1
+    inside = (k >= 0) & (k < len(edges) - 1)
+    return np.clip(k, 0, len(edges) - 2), inside
+
+
+class Coastline:
+    """
+    Coastline edges of a set of land polygons, with a spatial index.
+
+    :param list rings: list of (lon, lat, exterior) tuples, one per polygon
+    ring, with arrays of the ring's vertices (degrees) and whether it is an
+    exterior ring (land on its inside) or a hole.
+    :param float segmentLength: approximate length (km) of the coastal
+    segments that landfall probabilities are reported for.
+    """
+
+    def __init__(self, rings, segmentLength=SEGMENT_LENGTH):
+        from scipy.spatial import cKDTree
+
+        x0, y0, x1, y1, segment = [], [], [], [], []
+        nsegments = 0
+        for lon, lat, exterior in rings:
+            lon = np.asarray(lon, dtype=float)
+            lat = np.asarray(lat, dtype=float)
+            if lon[0] != lon[-1] or lat[0] != lat[-1]:
+                lon, lat = np.append(lon, lon[0]), np.append(lat, lat[0])
+            # Rings that cross 0E (or 180E) are kept in one piece
+            lon = _unwrap(lon)
+            # Land to the left: exterior rings anticlockwise, holes
+            # clockwise
+            if (_signedArea(lon, lat) > 0) != exterior:
+                lon, lat = lon[::-1], lat[::-1]
+            lon, lat = _densify(lon, lat, segmentLength)
+            length, _ = distanceBearing(lon[:-1], lat[:-1], lon[1:], lat[1:])
+            ids = (np.cumsum(length) - length) // segmentLength
+            x0.append(lon[:-1])
+            y0.append(lat[:-1])
+            x1.append(lon[1:])
+            y1.append(lat[1:])
+            segment.append(nsegments + ids.astype(int))
+            nsegments += int(ids.max()) + 1 if len(ids) else 0
+        self.x0, self.y0, self.x1, self.y1, self.segment = (
+            np.concatenate(a) if a else np.array([])
+            for a in (x0, y0, x1, y1, segment))
+        # Number the segments that have edges consecutively
+        _, self.segment = np.unique(self.segment.astype(int),
+                                    return_inverse=True)
+        mid = np.column_stack([(self.x0 + self.x1) / 2.,
+                               (self.y0 + self.y1) / 2.])
+        self.tree = cKDTree(mid)
+        self.lonRange = (np.min(mid[:, 0]), np.max(mid[:, 0])) \
+            if len(mid) else (0., 0.)
+        self.halfLength = 0.5 * np.max(np.hypot(self.x1 - self.x0,
+                                                self.y1 - self.y0))
+        # Centre of each coastal segment, for reporting:
+        count = np.bincount(self.segment)
+        self.segmentLon = np.mod(np.bincount(self.segment, mid[:, 0]) /
+                                 count, 360.)
+        self.segmentLat = np.bincount(self.segment, mid[:, 1]) / count
+        log.debug("Coastline of %d edges in %d segments", len(self.x0),
+                  len(count))
+
+    @classmethod
+    def fromGeoJSON(cls, path, segmentLength=SEGMENT_LENGTH):
+        """
+        Read land polygons from a GeoJSON file (a FeatureCollection,
+        Feature or geometry of Polygons and MultiPolygons).
+        """
+        with open(path) as fh:
+            obj = json.load(fh)
+        geometries = [f['geometry'] for f in obj['features']] \
+            if obj['type'] == 'FeatureCollection' else \
+            [obj['geometry'] if obj['type'] == 'Feature' else obj]
+        rings = []
+        for geom in geometries:
+            polygons = [geom['coordinates']] if geom['type'] == 'Polygon' \
+                else geom['coordinates'] if geom['type'] == 'MultiPolygon' \
+                else []
+            for polygon in polygons:
+                for n, ring in enumerate(polygon):
+                    ring = np.asarray(ring, dtype=float)
+                    rings.append((ring[:, 0], ring[:, 1], n == 0))
+        return cls(rings, segmentLength)
+
+    def segments(self):
+        """
+        Centre of each coastal segment, as a :class:`pandas.DataFrame`.
+        """
+        return pd.DataFrame({'segment': np.arange(len(self.segmentLon)),
+                             'latitude': self.segmentLat,
+                             'longitude': self.segmentLon})
+
+    def crossings(self, x0, y0, x1, y1):
+        """
+        Find where track steps cross the coast from sea to land.
+
+        :param x0, y0, x1, y1: arrays of the start and end longitudes and
+        latitudes of the track steps.
+
+        :returns: tuple of (index of the step, fraction of the step at
+        the crossing, longitude, latitude, coastal segment) arrays, one
+        element per crossing.
+        """
+        x0 = np.mod(x0, 360.)
+        x1 = x0 + np.mod(x1 - x0 + 180., 360.) - 180.
+        # Unwrapped rings can run past 0E or 360E, so the steps are also
+        # tested a turn to either side where they could meet them
+        lo = np.minimum(x0, x1).min() if len(x0) else 0.
+        hi = np.maximum(x0, x1).max() if len(x0) else 0.
+        pad = 2. * self.halfLength
+        found = [self._crossings(x0 + shift, y0, x1 + shift, y1)
+                 for shift in (-360., 0., 360.)
+                 if lo + shift <= self.lonRange[1] + pad and
+                 hi + shift >= self.lonRange[0] - pad]
+        if not found:
+            empty = np.array([])
+            return (empty.astype(int), empty, empty, empty,
+                    empty.astype(int))
+        step, t, lon, lat, segment = (np.concatenate(a) for a in zip(*found))
+        order = np.argsort(step, kind='stable')
+        return (step[order], t[order], np.mod(lon[order], 360.), lat[order],
+                segment[order])
+
+    def _crossings(self, x0, y0, x1, y1):
+        mid = np.column_stack([(x0 + x1) / 2., (y0 + y1) / 2.])
+        radius = 0.5 * np.hypot(x1 - x0, y1 - y0) + self.halfLength
+        near = self.tree.query_ball_point(mid, radius)
+        counts = np.array([len(n) for n in near], dtype=int)
+        step = np.repeat(np.arange(len(x0)), counts)
+        edge = np.concatenate([np.asarray(n, dtype=int) for n in near]) \
+            if len(near) else np.array([], dtype=int)
+
+        px, py = x0[step], y0[step]
+        rx, ry = x1[step] - px, y1[step] - py
+        qx, qy = self.x0[edge], self.y0[edge]
+        sx, sy = self.x1[edge] - qx, self.y1[edge] - qy
+        denom = rx * sy - ry * sx
+        with np.errstate(invalid='ignore', divide='ignore'):
+            t = ((qx - px) * sy - (qy - py) * sx) / denom
+            u = ((qx - px) * ry - (qy - py) * rx) / denom
+        # Crossing the edge, and moving to its left (onto land):
+        hit = (denom < 0) & (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1)
+        step, edge, t = step[hit], edge[hit], t[hit]
+        return (step, t, px[hit] + t * rx[hit], py[hit] + t * ry[hit],
+                self.segment[edge])
+
+
+class LandMask:
+    """
+    Gridded land mask.
+
+    :param lon: longitudes of the grid columns (degrees, increasing).
+    :param lat: latitudes of the grid rows (degrees, increasing or
+    decreasing).
+    :param mask: array of shape (lat, lon), true over land.
+    """
+
+    def __init__(self, lon, lat, mask):
+        lon = np.asarray(lon, dtype=float)
+        # Shift the axis as a whole, so it stays increasing across 0E
+        self.lon = lon - 360. * np.floor(lon[0] / 360.) if len(lon) else lon
+        self.lat = np.asarray(lat, dtype=float)
+        self.mask = np.asarray(mask, dtype=bool)
+        if len(self.lat) > 1 and self.lat[0] > self.lat[-1]:
+            self.lat, self.mask = self.lat[::-1], self.mask[::-1]
+        self.lonEdges = _cellEdges(self.lon)
+        self.latEdges = _cellEdges(self.lat)
+
+    @classmethod
+    def fromFile(cls, path):
+        """
+        Read a land mask from an `.npz` file holding `lon`, `lat` and `mask`
+        arrays.
+        """
+        with np.load(path) as data:
+            return cls(data['lon'], data['lat'], data['mask'])
+
+    def _cell(self, lon, lat):
+        """
+        Row and column of the cells holding each point, and whether the
+        point lies on the grid at all.
+        """
+        i, inside = _cellIndex(self.latEdges, lat)
+        lon = np.mod(lon, 360.)
+        j, onGrid = _cellIndex(self.lonEdges, lon)
+        # The axis may run on past 360E
+        jj, ok = _cellIndex(self.lonEdges, lon + 360.)
+        j, onGrid = np.where(onGrid, j, jj), onGrid | ok
+        return i, j, inside & onGrid
+
+    def segments(self):
+        """
+        Centre of each cell of the grid, as a :class:`pandas.DataFrame`
+        indexed by the cell's (flat) segment number.
+        """
+        lat, lon = np.meshgrid(self.lat, self.lon, indexing='ij')
+        return pd.DataFrame({'segment': np.arange(lat.size),
+                             'latitude': lat.ravel(),
+                             'longitude': np.mod(lon.ravel(), 360.)})
+
+    def crossings(self, x0, y0, x1, y1):
+        """
+        Find track steps that go from a sea cell to a land cell. The
+        crossing is placed at the end of the step.
+
+        :returns: as for `Coastline.crossings`; the coastal segment is the
+        flat index of the land cell.
+        """
+        i0, j0, on0 = self._cell(x0, y0)
+        i1, j1, on1 = self._cell(x1, y1)
+        # Points off the grid are not land
+        land0 = on0 & self.mask[i0, j0]
+        land1 = on1 & self.mask[i1, j1]
+        step = np.flatnonzero(~land0 & land1)
+        return (step, np.ones(len(step)), x1[step], y1[step],
+                np.ravel_multi_index((i1[step], j1[step]), self.mask.shape))
+
+
+def loadCoast(path, segmentLength=SEGMENT_LENGTH):
+    """
+    Read a coastline from land polygons (`.json` or `.geojson`) or a land
+    mask (`.npz`).
+    """
+    if path.endswith('.npz'):
+        return LandMask.fromFile(path)
+    return Coastline.fromGeoJSON(path, segmentLength)
+
+
+def landfalls(tracks, coast, freq="1h"):
+    """
+    Every landfall of every track in a `pycxml.loadfile` result.
+
+    :param tracks: :class:`pandas.DataFrame`, or a list of DataFrames (one
+    per ensemble member), as returned by `pycxml.loadfile`.
+    :param coast: :class:`Coastline` or :class:`LandMask` (see
+    `loadCoast`).
+    :param freq: time step the tracks are resampled to before crossings are
+    found.
+
+    :returns: :class:`pandas.DataFrame` with a row for each landfall,
+    sorted by disturbance, member and time. `landfall` numbers the
+    landfalls of each track from 0. The time, central pressure and wind
+    speed are interpolated to the crossing.
+    """
+    frames = list(tracks) if isinstance(tracks, (list, tuple)) \
+        else [tracks]
+    frames = [f for f in frames if len(f)]
+    if not frames:
+        return pd.DataFrame(columns=LANDFALL_COLUMNS)
+    df = pd.concat([f.assign(_frame=i) for i, f in
+                    enumerate(interpolateTracks(frames, freq))],
+                   ignore_index=True)
+    for key in TRACK_KEYS:
+        if key not in df.columns:
+            df[key] = np.nan
+    track = df.groupby(['_frame'] + TRACK_KEYS, sort=False,
+                       dropna=False).ngroup().to_numpy()
+    lon = df['longitude'].to_numpy(float)
+    lat = df['latitude'].to_numpy(float)
+    # Steps between consecutive fixes of the same track
+    start = np.flatnonzero(track[:-1] == track[1:])
+    end = start + 1
+    step, t, xlon, xlat, segment = coast.crossings(lon[start], lat[start],
+                                                   lon[end], lat[end])
+    start, end = start[step], end[step]
+
+    times = pd.to_datetime(df['validtime']).to_numpy(dtype='datetime64[s]')
+    dt = (times[end] - times[start]).astype(float)
+    result = pd.DataFrame({
+        'disturbance': df['disturbance'].to_numpy()[start],
+        'member': df['member'].to_numpy()[start],
+        'validtime': times[start] + np.round(t * dt).astype('timedelta64[s]'),
+        'latitude': xlat, 'longitude': xlon})
+    for field in ("pcentre", "windspeed"):
+        if field in df.columns:
+            values = df[field].to_numpy(float)
+            result[field] = values[start] + t * (values[end] - values[start])
+        else:
+            result[field] = np.nan
+    result['segment'] = segment
+    result['_track'] = track[start]
+    result = result.sort_values(['_track', 'validtime'], kind='stable')
+    result['landfall'] = result.groupby('_track').cumcount()
+    log.debug("%d landfalls of %d tracks", len(result), track.max() + 1)
+    return result[LANDFALL_COLUMNS].reset_index(drop=True)
+
+
+def landfallProbability(landfall, nmembers, coast=None, weights=None):
+    """
+    Chance of first landfall on each coastal segment.
+
+    :param landfall: :class:`pandas.DataFrame` from `landfalls`.
+    :param int nmembers: number of members in the ensemble (including
+    those that make no landfall).
+    :param coast: if given, the centre of each segment is included.
+    :param weights: optional :class:`pandas.Series` of member weights,
+    indexed by member number; the weights of all members should sum to 1.
+
+    :returns: :class:`pandas.DataFrame` with a row for each segment where
+    a first landfall occurs, holding the number of members and the
+    probability, sorted by decreasing probability.
+    """
+    first = landfall[landfall['landfall'] == 0]
+    if weights is None:
+        weight = np.full(len(first), 1. / nmembers)
+    else:
+        weight = weights.reindex(first['member']).to_numpy(float)
+    result = first.assign(_weight=weight).groupby('segment').agg(
+        members=('member', 'size'), probability=('_weight', 'sum'))
+    result = result.reset_index()
+    if coast is not None:
+        centres = coast.segments().set_index('segment')
+        result['latitude'] = centres['latitude'].reindex(
+            result['segment']).to_numpy()
+        result['longitude'] = centres['longitude'].reindex(
+            result['segment']).to_numpy()
+    result = result.reindex(columns=PROBABILITY_COLUMNS)
+    return result.sort_values('probability', ascending=False,
+                              kind='stable').reset_index(drop=True)
@@ -0,0 +1,151 @@
+"""
+merge - Deduplicate and merge fixes from many CXML bulletins
+
+Archives hold bulletins that are reissued or amended (the same forecast,
+with a later creation time), as well as consecutive forecasts whose tracks
+overlap in validtime. `mergeResults` stacks the results of many
+`pycxml.loadfile` calls into one frame and keeps, for each fix, only the
+copy from the latest issue of the bulletin. `stormHistory` then collapses
+overlapping forecasts into a single track per disturbance and member, taking
+each fix from the most recent forecast.
+
+Duplicates are found by sorting rather than by comparing bulletins with each
+other: each key column is factorised to integer codes (a hash lookup), the
+rows are ordered with a single `numpy.lexsort` on those codes, and the last
+row of each run of equal keys is retained. This is O(n log n) in the number
+of fixes.
+
+"""
+
+import logging as log
+
+import numpy as np
+import pandas as pd
+
+from compact import CompactEnsemble
+
+MERGE_KEYS = ["centre", "disturbance", "basetime", "member", "validtime"]
+HISTORY_KEYS = ["centre", "disturbance", "member", "validtime"]
+HEADER_COLUMNS = ["centre", "basetime", "creationtime"]
+
+
+def _frames(result):
+    """
+    The track frames of a `pycxml.loadfile` result, each with the header
+    information from its `attrs` added as columns.
+    """
+    if result is None:
+        return []
+    if isinstance(result, CompactEnsemble):
+        ntimes = len(result.validtime)
+        df = result.to_dataframe().reset_index()
+        if result.disturbance is not None:
+            df.insert(0, 'disturbance', np.repeat(result.disturbance,
+                                                  ntimes))
+        df.attrs = result.attrs
+        frames = [df]
+    elif isinstance(result, (list, tuple)):
+        frames = list(result)
+    else:
+        frames = [result]
+    return [f.assign(**{col: f.attrs.get(col) for col in HEADER_COLUMNS})
+            for f in frames if len(f)]
+
+
+def stackResults(results):
+    """
+    Stack the results of many `pycxml.loadfile` calls into a single frame.
+
+    :param results: iterable of `pycxml.loadfile` results, or a
+    :class:`dict` of them (e.g. from `pycxml.loadfiles`).
+
+    :returns: :class:`pandas.DataFrame` of all fixes, with the `centre`,
+    `basetime` and `creationtime` of each fix's bulletin as columns, and a
+    `member` column (NaN for deterministic forecasts).
+    """
+    if isinstance(results, dict):
+        results = results.values()
+    frames = [f for result in results for f in _frames(result)]
+    if not frames:
+        return pd.DataFrame(columns=MERGE_KEYS + ["creationtime"])
+    df = pd.concat(frames, ignore_index=True)
+    if 'member' not in df.columns:
+        df['member'] = np.nan
+    for col in ('validtime', 'basetime', 'creationtime'):
+        df[col] = pd.to_datetime(df[col])
+    return df
+
+
+def _codes(series):
+    """
+    Integer codes of a key column, ordered as the values are. Missing values
+    have the lowest code.
+    """
+    return pd.factorize(series, sort=True)[0]
+
+
+def _orderValues(series):
+    """
+    Integer values of an ordering column (e.g. creation time), with missing
+    values lowest, so the latest non-missing value sorts last.
+    """
+    values = pd.to_datetime(series).to_numpy(dtype='datetime64[s]')
+    return values.view(np.int64)
+
+
+def deduplicate(df, keys=MERGE_KEYS, order=("creationtime",)):
+    """
+    Keep one row for each distinct combination of `keys`: the row with the
+    largest values of the `order` columns (compared in turn).
+
+    :param df: :class:`pandas.DataFrame` of fixes.
+    :param list keys: columns identifying a fix.
+    :param list order: time columns that decide which duplicate is kept.
+
+    :returns: :class:`pandas.DataFrame` of the retained rows, sorted by
+    `keys`, with a new index.
+    """
+    if len(df) == 0:
+        return df.reset_index(drop=True)
+    keys = [k for k in keys if k in df.columns]
+    order = [o for o in order if o in df.columns]
+    codes = np.stack([_codes(df[k]) for k in keys])
+    # lexsort sorts by the last array first
+    idx = np.lexsort([_orderValues(df[o]) for o in reversed(order)] +
+                     list(codes[::-1]))
+    codes = codes[:, idx]
+    # The last row of each run of equal keys is kept
+    last = np.ones(len(idx), dtype=bool)
+    last[:-1] = (codes[:, 1:] != codes[:, :-1]).any(axis=0)
+    log.debug("Retaining %d of %d fixes", last.sum(), len(df))
+    return df.iloc[idx[last]].reset_index(drop=True)
+
+
+def mergeResults(results):
+    """
+    Merge the results of many `pycxml.loadfile` calls, removing duplicate
+    fixes from reissued or amended bulletins. For each (centre, disturbance,
+    basetime, member, validtime), the fix from the bulletin with the latest
+    creation time is kept.
+
+    :param results: iterable of `pycxml.loadfile` results, or a
+    :class:`dict` of them (e.g. from `pycxml.loadfiles`).
+
+    :returns: :class:`pandas.DataFrame` of unique fixes, sorted by
+    `MERGE_KEYS`.
+    """
+    return deduplicate(stackResults(results), MERGE_KEYS, ["creationtime"])
+
+
+def stormHistory(fixes):
+    """
+    Collapse overlapping forecasts into a single track for each disturbance
+    and member, taking each validtime from the most recent forecast (the
+    latest base time, then the latest creation time).
+
+    :param fixes: :class:`pandas.DataFrame` from `mergeResults` or
+    `stackResults`.
+
+    :returns: :class:`pandas.DataFrame` sorted by `HISTORY_KEYS`.
+    """
+    return deduplicate(fixes, HISTORY_KEYS, ["basetime", "creationtime"])
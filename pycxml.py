@@ -5,17 +5,18 @@ pycxml - A python translator for Cyclone XML (cxml)
 """
 
 import os
-import sys
-from itertools import product
+import random
 from datetime import datetime
+from functools import partial
 
-import numpy as np
-import pandas as pd
 import xml.etree.ElementTree as ET
 
 import logging as log
 
-from validator import Validator, CXML_SCHEMA
+# Heavy dependencies (pandas, and numpy via `converter`; lxml via
+# `validator`) are imported on first use, so that header-only and
+# validation-only calls do not pay for importing them.
+from validator import getValidator, getStructureChecker, CXML_SCHEMA
 from converter import convert
 
 
@@ -29,6 +30,14 @@ RADII_COLUMNS = ['R34NEQ', 'R34SEQ', 'R34SWQ', 'R34NWQ',
                  'R48NEQ', 'R48SEQ', 'R48SWQ', 'R48NWQ',
                  'R64NEQ', 'R64SEQ', 'R64SWQ', 'R64NWQ']
 
+# Optional fix fields that are tallied in the missing-field summary, and the
+# number of sample fix identifiers retained for each field:
+OPTIONAL_FIELDS = ["pcentre", "windspeed", "rmax", "poci"]
+MISSING_SAMPLES = 5
+
+# Columns of the error table built by `loadfiles` in lenient mode:
+ERROR_COLUMNS = ["file", "level", "location", "error"]
+
 
 def validate(xmlfile):
     """
@@ -40,11 +49,35 @@ def validate(xmlfile):
               default CXML XSD definition
 
     """
-    validator = Validator(CXML_SCHEMA)
+    validator = getValidator(CXML_SCHEMA)
     validator.validate(xmlfile)
     return
 
 
+def checkfile(xmlfile, sample=0.):
+    """
+    Check a CXML file with the fast structural checker (see
+    `validator.StructureChecker`), and validate it against the XSD schema
+    only if the structural check fails, or for a random `sample` of files.
+    Schema validation gives the definitive result and error message when it
+    is run.
+
+    :param xmlfile: path of (or file object holding) the XML file to check.
+    :param float sample: fraction of files that pass the structural check
+    which are also validated against the schema.
+
+    :raises AssertionError: if the file is not a valid CXML file.
+    """
+    problems = getStructureChecker().check(ET.parse(xmlfile).getroot())
+    if problems or random.random() < sample:
+        if hasattr(xmlfile, 'seek'):
+            xmlfile.seek(0)
+        validate(xmlfile)
+    if problems:
+        raise AssertionError("; ".join(f"{loc}: {msg}"
+                                       for loc, msg in problems))
+
+
 def parsePosition(lonelem, latelem):
     """
     Parse the positional elements to ensure correct geographical coordinates
@@ -71,7 +104,7 @@ def parsePosition(lonelem, latelem):
     lonvalue = float(lonelem.text)
     lonunits = lonelem.attrib['units']
     lonvalue = -lonvalue if lonunits == 'deg W' else lonvalue
-    lonvalue = np.mod(lonvalue, 360)
+    lonvalue = lonvalue % 360
 
     return (lonvalue, latvalue)
 
@@ -109,6 +142,9 @@ def getWindSpeed(fix, units='km/h'):
     :param str units: Units to convert maximum wind speed value to.
 
     :returns: maximum wind speed, in given units, if it exists. None otherwise.
+
+    :note: Missing elements are not logged here; `parseFix` tallies them in
+    the per-file missing-field summary instead.
     """
     windelem = fix.find('./cycloneData/maximumWind/speed')
     if windelem is not None:
@@ -116,7 +152,6 @@ def getWindSpeed(fix, units='km/h'):
         inunits = windelem.attrib['units']
         return convert(wind, inunits, units)
     else:
-        log.warning("No maximum wind speed data in this fix")
         return None
 
 
@@ -149,7 +184,10 @@ def getRmax(fix):
     :param fix: :class:`xml.etree.ElementTree.element` containing details of a
     disturbance fix
 
-    :returns: Radius to maximum winds, in km
+    :returns: Radius to maximum winds, in km. None if it doesn't exist.
+
+    :note: Missing elements are not logged here; `parseFix` tallies them in
+    the per-file missing-field summary instead.
     """
 
     rmwelem = fix.find('./cycloneData/maximumWind/radius')
@@ -158,20 +196,60 @@ def getRmax(fix):
         units = rmwelem.attrib['units']
         return convert(rmw, units, 'km')
     else:
-        log.warning("No rmw data in this fix")
         return None
 
 
-def parseFix(fix):
+def recordMissing(missing, field, fixid):
+    """
+    Record a missing field in a missing-field summary. The summary is a
+    :class:`dict` keyed by field name, where each value holds the number of
+    fixes lacking that field (`count`) and up to `MISSING_SAMPLES` identifiers
+    of those fixes (`fixes`).
+
+    :param dict missing: missing-field summary to update in place.
+    :param str field: name of the missing field.
+    :param fixid: identifier of the fix that lacks the field, or a function
+    of no arguments returning it, called only if the identifier is kept.
+    """
+    entry = missing.setdefault(field, {'count': 0, 'fixes': []})
+    entry['count'] += 1
+    if len(entry['fixes']) < MISSING_SAMPLES:
+        entry['fixes'].append(fixid() if callable(fixid) else fixid)
+
+
+def fixIdentifier(distId, fix, member=None):
+    """
+    Build a short identifier for a fix, used to report sample fixes in the
+    missing-field summary.
+
+    :param str distId: disturbance ID the fix belongs to.
+    :param fix: :class:`xml.etree.ElementTree.element` containing details of a
+    disturbance fix.
+    :param member: ensemble member number, if any.
+
+    :returns: :class:`str` of the form "<distId>[/<member>]@<validTime>"
+    """
+    validtime = fix.findtext('validTime')
+    if member is None:
+        return f"{distId}@{validtime}"
+    return f"{distId}/{member}@{validtime}"
+
+
+def parseFix(fix, missing=None, fixid=None):
     """
     `fix` is a single CXML fix element that describes the position of a
     disturbance at a particular time.
 
     :param fix: :class:`xml.etree.ElementTree.element` containing details of a
     disturbance fix.
+    :param dict missing: optional missing-field summary, updated in place
+    with any of `OPTIONAL_FIELDS` that are absent from this fix.
+    :param fixid: identifier of the fix, recorded in `missing` (see
+    `recordMissing`).
 
     :returns: :class:`dict`
     """
+    import pandas as pd
 
     # This is strictly not a mandatory atttribute
     # hour = int(fix.attrib['hour'])
@@ -188,8 +266,13 @@ def parseFix(fix):
     fixdata['windspeed'] = getWindSpeed(fix)
     fixdata['rmax'] = getRmax(fix)
     fixdata['poci'] = getPoci(fix)
+    if missing is not None:
+        for field in OPTIONAL_FIELDS:
+            if fixdata[field] is None:
+                recordMissing(missing, field, fixid)
     series = pd.Series(fixdata, index=FORECAST_COLUMNS)
-    if fix.find('./cycloneData/windContours'):
+    contours = fix.find('./cycloneData/windContours')
+    if contours is not None and len(contours):
         windradii = getWindContours(fix)
         fixdata = pd.concat([series, windradii])
         series = pd.Series(fixdata, index=FORECAST_COLUMNS+RADII_COLUMNS)
@@ -199,17 +282,18 @@ def parseFix(fix):
 
 def getWindContours(fix):
     """
+    Extract the wind radii of a fix, converted to km. See
+    `windradii.extractRadii` for extracting the radii of many fixes at once.
+
     :param fix: :class:`xml.etree.ElementTree.element` containing
     details of the wind contours element of a disturbance fix.
+
+    :returns: :class:`pandas.Series` of wind radii (km), indexed by
+    `RADII_COLUMNS`. Radii that are not given are NaN.
     """
-    data = {}
-    for elem in fix.findall('cycloneData/windContours/windSpeed'):
-        mag = int(float(elem.text))
-        for r in elem.findall('radius'):
-            quadrant = r.attrib['sector']
-            distance = float(r.text)
-            data[f"R{mag:d}{quadrant}"] = distance
-    return pd.Series(data, index=RADII_COLUMNS)
+    import pandas as pd
+    from windradii import extractRadii
+    return pd.Series(extractRadii([fix])[0].ravel(), index=RADII_COLUMNS)
 
 
 def getHeaderTime(header, field="baseTime"):
@@ -232,7 +316,7 @@ def getHeaderTime(header, field="baseTime"):
     try:
         dtstr = header.find(field).text
     except AttributeError:
-        log.warning(f"Header information does not contain {field} element")
+        log.warning("Header information does not contain %s element", field)
         return None
 
     try:
@@ -276,6 +360,38 @@ def parseHeader(header):
     return basetime, creationtime, centre
 
 
+def headerAttributes(header, errors=None):
+    """
+    Header information of a CXML file, for the `attrs` of the parsed frames.
+    Unlike `parseHeader`, a time that cannot be parsed does not stop the
+    file being loaded: it is reported (or recorded in `errors`, in lenient
+    mode) and returned as None.
+
+    :param header: :class:`xml.etree.ElementTree.Element` containing header
+    information for the CXML file being processed.
+    :param list errors: optional list of error records to append to.
+
+    :returns: :class:`dict` with keys `centre`, `basetime` and
+    `creationtime`. These are all None if `header` is None.
+    """
+    attrs = {}
+    if header is None:
+        return dict.fromkeys(('basetime', 'creationtime', 'centre'))
+    for key, field in (('basetime', 'baseTime'),
+                       ('creationtime', 'creationTime')):
+        try:
+            attrs[key] = getHeaderTime(header, field)
+        except ValueError as e:
+            if errors is None:
+                log.warning("Unable to parse %s: %s", field, e)
+            else:
+                recordError(errors, 'file', field, e)
+            attrs[key] = None
+    elem = header.find("productionCenter")
+    attrs['centre'] = getHeaderCenter(header) if elem is not None else None
+    return attrs
+
+
 def isEnsemble(header):
     """
     Determine if a file represents an ensemble forecast product.
@@ -306,52 +422,153 @@ def ensembleCount(ensembleElem):
     return int(nmembers.text)
 
 
-def parseEnsemble(data: list) -> list:
+def recordError(errors, level, location, error):
+    """
+    Record an error in a lenient-mode error table, rather than raising it.
+
+    :param list errors: list of error records to append to.
+    :param str level: the level the error occurred at: "file", "xml"
+    (recovered XML syntax errors), "data" or "fix".
+    :param str location: where the error occurred, e.g. a fix identifier.
+    :param error: the exception raised, or an error message.
+    """
+    if isinstance(error, Exception):
+        error = f"{type(error).__name__}: {error}"
+    log.debug("Recovered from error at %s: %s", location, error)
+    errors.append({'level': level, 'location': location, 'error': error})
+
+
+def parseFixes(df, fixes, distId, missing=None, errors=None, member=None,
+               fields=None):
+    """
+    Parse a list of fix elements, appending a row to `df` for each.
+
+    :param df: :class:`pandas.DataFrame` to append the fixes to.
+    :param list fixes: fix elements of a disturbance.
+    :param str distId: disturbance ID the fixes belong to.
+    :param dict missing: optional missing-field summary, updated in place.
+    :param list errors: if given, a fix that cannot be parsed is recorded
+    here (see `recordError`) and skipped, rather than raising an exception.
+    :param member: ensemble member number, if any.
+    :param list fields: additional fix fields to extract (see
+    `extractor.extractFixes`).
+
+    :returns: `df`, or if `fields` are given a new
+    :class:`pandas.DataFrame` with the fields added as columns.
+    """
+    parsed = []
+    for f in fixes:
+        # The identifier is only built if the fix is reported
+        fixid = partial(fixIdentifier, distId, f, member)
+        try:
+            fixdata = parseFix(f, missing, fixid)
+        except Exception as e:
+            if errors is None:
+                raise
+            recordError(errors, 'fix', fixid(), e)
+            continue
+        df.loc[len(df), :] = fixdata
+        parsed.append(f)
+    if fields:
+        import pandas as pd
+        from extractor import extractFixes, selectFields
+        # Fields already parsed (the fix's position) are not repeated
+        names = [f.name for f in selectFields(fields)
+                 if f.name not in df.columns]
+        extra = extractFixes(parsed, names).set_index(df.index)
+        df = pd.concat([df, extra], axis=1)
+    return df
+
+
+def parseEnsemble(data: list, missing=None, errors=None,
+                  fields=None) -> list:
     """
 
     :param list data: List of data elements
+    :param dict missing: optional missing-field summary, updated in place.
+    :param list errors: if given, errors in a member or fix are recorded
+    here (see `recordError`) and the member or fix is skipped.
+    :param list fields: additional fix fields to extract (see `loadfile`).
     :returns: a list of `pd.DataFrames` that each contain an ensemble member
     """
+    import pandas as pd
     forecasts = []
     for d in data:
-        log.debug(f"Ensemble member: {d.attrib['member']}")
-        member = d.attrib['member']
-        disturbance = d.find('disturbance')
-        distId, tcId, tcName = parseDisturbance(disturbance)
+        try:
+            member = d.attrib['member']
+            log.debug("Ensemble member: %s", member)
+            disturbance = d.find('disturbance')
+            distId, tcId, tcName = parseDisturbance(disturbance)
+        except Exception as e:
+            if errors is None:
+                raise
+            recordError(errors, 'data',
+                        f"member {d.attrib.get('member')}", e)
+            continue
         df = pd.DataFrame(columns=ENSEMBLE_COLUMNS+RADII_COLUMNS)
         fixes = disturbance.findall("./fix")
-        log.debug(f"Disturbance {distId}: number of fixes: {len(fixes)}")
-        for f in fixes:
-            fixdata = parseFix(f)
-            df.loc[len(df), :] = fixdata
+        log.debug("Disturbance %s: number of fixes: %d", distId, len(fixes))
+        df = parseFixes(df, fixes, distId, missing, errors, member, fields)
+        df['disturbance'] = distId
+        df['member'] = int(member)
         forecasts.append(df)
     return forecasts
 
 
-def parseForecast(data) -> pd.DataFrame:
+def parseForecast(data, missing=None, errors=None,
+                  fields=None) -> "pd.DataFrame":
     """
     Parse a data element to extract forecast information into a DataFrame.
 
     :param data: :class:`xml.etree.ElementTree.Element` containing forecas
     data.
+    :param dict missing: optional missing-field summary, updated in place.
+    :param list errors: if given, errors in a fix are recorded here (see
+    `recordError`) and the fix is skipped.
+    :param list fields: additional fix fields to extract (see `loadfile`).
 
     :returns: `pd.DataFrame` of the forecast data.
     """
+    import pandas as pd
     disturbance = data.find('disturbance')
     distId, tcId, tcName = parseDisturbance(disturbance)
     df = pd.DataFrame(columns=FORECAST_COLUMNS+RADII_COLUMNS)
     fixes = disturbance.findall("./fix")
-    log.debug(f"Disturbance {distId}: number of fixes: {len(fixes)}")
+    log.debug("Disturbance %s: number of fixes: %d", distId, len(fixes))
 
-    for f in fixes:
-        fixdata = parseFix(f)
-        df.loc[len(df), :] = fixdata
-    df['disturbance'] = disturbance
+    df = parseFixes(df, fixes, distId, missing, errors, fields=fields)
+    df['disturbance'] = distId
     return df
 
 
-def parseAnalysis(data):
-    pass
+def parseAnalysis(data, missing=None, errors=None,
+                  fields=None) -> "pd.DataFrame":
+    """
+    Parse a data element to extract analysis fixes into a DataFrame.
+
+    :param data: :class:`xml.etree.ElementTree.Element` containing analysis
+    data.
+    :param dict missing: optional missing-field summary, updated in place.
+    :param list errors: if given, errors in a fix are recorded here (see
+    `recordError`) and the fix is skipped.
+    :param list fields: additional fix fields to extract (see `loadfile`).
+
+    :returns: `pd.DataFrame` of the fixes of every disturbance in the
+    analysis.
+    """
+    import pandas as pd
+    frames = []
+    for disturbance in data.findall('disturbance'):
+        distId, tcId, tcName = parseDisturbance(disturbance)
+        df = pd.DataFrame(columns=FORECAST_COLUMNS+RADII_COLUMNS)
+        fixes = disturbance.findall("./fix")
+        log.debug("Disturbance %s: number of fixes: %d", distId, len(fixes))
+        df = parseFixes(df, fixes, distId, missing, errors, fields=fields)
+        df['disturbance'] = distId
+        frames.append(df)
+    if not frames:
+        return pd.DataFrame(columns=FORECAST_COLUMNS+RADII_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
 
 
 def parseDisturbance(dist):
@@ -381,22 +598,60 @@ def parseDisturbance(dist):
     return distId, tcId, tcName
 
 
-def loadfile(xmlfile):
+def reportMissing(xmlfile, missing):
+    """
+    Log a single summary line for the fields missing from a file, rather than
+    one record per fix.
+
+    :param str xmlfile: name of the file the summary refers to.
+    :param dict missing: missing-field summary built by `parseFix`.
+    """
+    if missing and log.getLogger().isEnabledFor(log.INFO):
+        counts = ", ".join(f"{field}={entry['count']}"
+                           for field, entry in missing.items())
+        log.info("%s: fixes with missing fields: %s", xmlfile, counts)
+
+
+def loadfile(xmlfile, compact=False, lenient=False, check=False,
+             fields=None):
     """
     Load a CXML file and validate it
 
     :param str xmlfile: Path to the CXML file to load
+    :param bool compact: If True, ensemble forecasts are returned as a
+    :class:`compact.CompactEnsemble` holding all members in a single float32
+    array, rather than a list of DataFrames.
+    :param bool lenient: If True, the file is parsed with lxml's recovering
+    parser, and fixes or ensemble members that cannot be parsed are skipped
+    rather than raising an exception. The errors are recorded in the
+    `errors` entry of each frame's `attrs` (see `recordError`). Requires
+    `lxml`.
+    :param bool check: If True, check the structure of the parsed document
+    before its data are read, in one walk over the element tree (see
+    `validator.StructureChecker`). Problems raise an AssertionError, or are
+    recorded as "xml" errors in lenient mode.
+    :param list fields: names of additional fix fields to extract, e.g.
+    ["Dvorak.finalTnumber", "eye.diameter"], or "all" for every field
+    described by the schema (see `extractor.extractFixes`). The fields are
+    added as typed columns after the standard ones; fields that are already
+    standard columns (the fix's `latitude` and `longitude`) are not
+    repeated. Not used for compact ensembles.
 
     :returns: :class:`pandas.DataFrame` containing the data in all disturbances
-    included in the file.
+    included in the file. For ensemble forecasts, a list of
+    :class:`pandas.DataFrame`, one per member. A summary of the optional
+    fields missing from the file's fixes is stored in the `missing` entry of
+    each frame's `attrs` (see `recordMissing`), and the production centre,
+    base time and creation time of the file in the `centre`, `basetime` and
+    `creationtime` entries (see `headerAttributes`).
 
     """
 
     if not os.path.isfile(xmlfile):
-        log.exception(f"{xmlfile} is not a file")
+        log.exception("%s is not a file", xmlfile)
         raise IOError
 
-    log.info(f"Parsing {xmlfile}")
+    log.info("Parsing %s", xmlfile)
 
     # try:
     #     validate(xmlfile)
@@ -404,23 +659,258 @@ def loadfile(xmlfile):
     #    log.error(f"{xmlfile} is not a valid CXML file: {e}")
     #     raise
 
+    if lenient:
+        errors = []
+        with open(xmlfile, 'rb') as fh:
+            xroot = recoverParse(fh.read(), errors)
+        return parseRoot(xroot, xmlfile, compact, errors, check, fields)
     tree = ET.parse(xmlfile)
-    xroot = tree.getroot()
-    header = xroot.find('header')
+    return parseRoot(tree.getroot(), xmlfile, compact, check=check,
+                     fields=fields)
+
+
+def recoverParse(xmlstring, errors):
+    """
+    Parse a CXML document with lxml's recovering parser, which repairs
+    malformed XML where it can. Syntax errors it recovered from are recorded
+    in `errors` at the "xml" level.
+
+    :param xmlstring: :class:`bytes` or :class:`str` containing a CXML
+    document.
+    :param list errors: list of error records to append to.
+
+    :returns: the root element of the document.
+    :raises ValueError: if nothing could be recovered from the document.
+    """
+    from lxml import etree
+    parser = etree.XMLParser(recover=True)
+    if isinstance(xmlstring, str):
+        xmlstring = xmlstring.encode()
+    xroot = etree.fromstring(xmlstring, parser)
+    for entry in parser.error_log:
+        recordError(errors, 'xml', f"line {entry.line}", entry.message)
+    if xroot is None:
+        raise ValueError("No CXML data could be recovered from the document")
+    return xroot
+
+
+def loadfiles(xmlfiles, compact=False, lenient=True, workers=1,
+              check=False, threads=False):
+    """
+    Load a batch of CXML files. In lenient mode (the default), a file that
+    cannot be read or parsed at all is skipped, and fixes that cannot be
+    parsed are skipped within each file, so a few malformed bulletins do not
+    stop the batch.
+
+    :param list xmlfiles: paths of the CXML files to load.
+    :param bool compact: see `loadfile`.
+    :param bool lenient: see `loadfile`.
+    :param bool check: see `loadfile`.
+    :param int workers: number of worker processes. If greater than 1, the
+    files are loaded in parallel and the results handed back in shared
+    memory (see `sharedframes.loadShared`). Numeric columns of the returned
+    frames are then float64 (or datetime64 for validtime) rather than
+    objects.
+    :param bool threads: If True, the files are loaded in a pool of
+    `workers` threads rather than processes (see
+    `threadload.loadThreaded`), which share one copy of the interpreter and
+    its modules. The frames are then as for a single worker.
+
+    :returns: tuple of (results, errors). `results` is a :class:`dict`
+    mapping each file that could be loaded to its `loadfile` result.
+    `errors` is a :class:`pandas.DataFrame` with one row per error, and
+    columns `ERROR_COLUMNS`.
+    """
+    if workers > 1 and len(xmlfiles) > 1:
+        if threads:
+            from threadload import loadThreaded
+            return loadThreaded(xmlfiles, compact, lenient, workers, check)
+        from sharedframes import loadShared
+        return loadShared(xmlfiles, compact, lenient, workers, check)
+
+    import pandas as pd
+    results = {}
+    errors = []
+    for xmlfile in xmlfiles:
+        fileErrors = []
+        try:
+            if not os.path.isfile(xmlfile):
+                raise IOError(f"{xmlfile} is not a file")
+            if lenient:
+                with open(xmlfile, 'rb') as fh:
+                    xroot = recoverParse(fh.read(), fileErrors)
+                results[xmlfile] = parseRoot(xroot, xmlfile, compact,
+                                             fileErrors, check)
+            else:
+                results[xmlfile] = loadfile(xmlfile, compact, check=check)
+        except Exception as e:
+            if not lenient:
+                raise
+            log.error("Unable to load %s: %s", xmlfile, e)
+            recordError(fileErrors, 'file', None, e)
+        errors.extend(dict(file=xmlfile, **err) for err in fileErrors)
+    return results, pd.DataFrame(errors, columns=ERROR_COLUMNS)
+
+
+def loadheader(xmlfile):
+    """
+    Read only the header of a CXML file. Parsing stops at the end of the
+    header element, so the (possibly very large) data elements are never
+    read, and pandas is not imported.
+
+    :param xmlfile: Path to the CXML file, or a binary file object
+    containing CXML data.
+
+    :returns: :class:`dict` with the base time, creation time, production
+    centre and, for ensemble forecasts, the number of members.
+    """
+    if hasattr(xmlfile, 'read'):
+        header = _readHeader(xmlfile)
+        xmlfile = getattr(xmlfile, 'name', "<stream>")
+    elif not os.path.isfile(xmlfile):
+        log.exception("%s is not a file", xmlfile)
+        raise IOError
+    else:
+        with open(xmlfile, 'rb') as fh:
+            header = _readHeader(fh)
+    if header is None:
+        raise ValueError(f"{xmlfile} does not contain a header element")
 
+    basetime, creationtime, centre = parseHeader(header)
+    nmembers = None
     if isEnsemble(header):
+        nmembers = ensembleCount(
+            header.find('generatingApplication/ensemble'))
+    return {'file': xmlfile,
+            'basetime': basetime,
+            'creationtime': creationtime,
+            'centre': centre,
+            'members': nmembers}
+
+
+def _readHeader(fh):
+    """
+    Incrementally parse a file object up to the end of the header element.
+
+    :returns: the header element, or None if there is no header.
+    """
+    for event, elem in ET.iterparse(fh, events=('end',)):
+        if elem.tag == 'header':
+            return elem
+    return None
+
+
+def loadstring(xmlstring, compact=False, name="<string>", lenient=False,
+               check=False, fields=None):
+    """
+    Load CXML data held in memory, e.g. a bulletin received over a socket.
+
+    :param xmlstring: :class:`str` or :class:`bytes` containing a CXML
+    document.
+    :param bool compact: see `loadfile`.
+    :param str name: name used to identify the document in log messages.
+    :param bool lenient: see `loadfile`.
+    :param bool check: see `loadfile`.
+    :param list fields: see `loadfile`.
+
+    :returns: as for `loadfile`.
+    """
+    log.info("Parsing %s", name)
+    if lenient:
+        errors = []
+        return parseRoot(recoverParse(xmlstring, errors), name, compact,
+                         errors, check, fields)
+    return parseRoot(ET.fromstring(xmlstring), name, compact, check=check,
+                     fields=fields)
+
+
+def parseRoot(xroot, name, compact=False, errors=None, check=False,
+              fields=None):
+    """
+    Parse the root element of a CXML document.
+
+    :param xroot: :class:`xml.etree.ElementTree.Element` of the `cxml`
+    document root.
+    :param str name: name of the source document, used in log messages.
+    :param bool compact: see `loadfile`.
+    :param list errors: if given, parse in lenient mode, recording errors
+    here (see `recordError`) rather than raising them.
+    :param bool check: see `loadfile`.
+    :param list fields: see `loadfile`.
+
+    :returns: as for `loadfile`.
+    """
+    if check:
+        # The check walks the tree once more, rather than being folded into
+        # parseHeader and parseFix: those read only the elements they need,
+        # while the check covers every element. The walk costs well under
+        # 1% of parsing the document and building its frames.
+        problems = getStructureChecker().check(xroot)
+        if problems and errors is None:
+            raise AssertionError(f"{name} is not a valid CXML file: " +
+                                 "; ".join(f"{loc}: {msg}"
+                                           for loc, msg in problems))
+        for location, message in problems:
+            recordError(errors, 'xml', location, message)
+    header = xroot.find('header')
+    if header is None:
+        if errors is None:
+            raise ValueError(f"{name} does not contain a header element")
+        recordError(errors, 'file', 'header', "No header element")
+    missing = {}
+    attrs = {'missing': missing}
+    if errors is not None:
+        attrs['errors'] = errors
+    attrs.update(headerAttributes(header, errors))
+
+    if header is not None and isEnsemble(header):
         ensembleElem = header.find('generatingApplication/ensemble')
         nmembers = ensembleCount(ensembleElem)
-        log.info(f"This is an ensemble forecast with {nmembers} members")
-        data = xroot.findall("./data")
-        forecasts = parseEnsemble(data)
+        log.info("This is an ensemble forecast with %d members", nmembers)
+        data = xroot.findall("./data[@type='ensembleForecast']")
+        if compact:
+            from compact import parseEnsembleCompact
+            try:
+                basetime = getHeaderTime(header, "baseTime")
+            except ValueError as e:
+                if errors is None:
+                    raise
+                recordError(errors, 'file', 'baseTime', e)
+                basetime = None
+            forecasts = parseEnsembleCompact(data, missing, basetime, errors)
+            forecasts.attrs.update(attrs)
+            reportMissing(name, missing)
+            return forecasts
+        forecasts = parseEnsemble(data, missing, errors, fields)
+        for df in forecasts:
+            df.attrs.update(attrs)
+        reportMissing(name, missing)
         return forecasts
     else:
         data = xroot.findall("./data")
         for d in data:
-            if d.attrib['type'] == 'forecast':
-                forecast = parseForecast(d)
+            try:
+                dtype = d.attrib['type']
+            except KeyError:
+                if errors is None:
+                    raise
+                line = getattr(d, 'sourceline', None)
+                recordError(errors, 'data', f"line {line}" if line else
+                            'data', "data has no type attribute")
+                continue
+            if dtype == 'forecast':
+                forecast = parseForecast(d, missing, errors, fields)
+                forecast.attrs.update(attrs)
+                reportMissing(name, missing)
                 return forecast
-            elif d.attrib['type'] == 'analysis':
-                analysis = parseAnalysis(d)
+            elif dtype == 'analysis':
+                analysis = parseAnalysis(d, missing, errors, fields)
+                analysis.attrs.update(attrs)
+                reportMissing(name, missing)
                 return analysis
+
+
+if __name__ == "__main__":
+    import sys
+    from cli import main
+    sys.exit(main())
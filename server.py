@@ -0,0 +1,501 @@
+"""
+server - Local, read-only HTTP query service over an archive of CXML files
+
+Tools that each re-parse the same bulletins with `pycxml.loadfile` can
+instead query one long-running server:
+
+    python -m pycxml serve FILES... [--port 8000]
+
+The headers of the archive, and the disturbances and range of validtimes of
+each file, are read when the server starts. Files are parsed only when a
+query first needs them (and only those that may hold matching fixes), and
+the parsed frames (with the columns and types of `archive.ARCHIVE_COLUMNS`)
+are kept in memory, the least recently used being evicted once `maxfiles`
+are held. Encoded responses are cached in the same way, keyed on the query
+and the modification times of the files it draws on, so a repeated query is
+answered without touching the frames. The archive is checked for modified
+and removed files at most every few seconds. Requests are handled in threads;
+cached frames are never modified, so any number of requests can read them
+at once.
+
+Endpoints (GET only):
+
+    /index    the header of each file in the archive, as JSON
+    /fixes    fixes matching the query parameters:
+                disturbance  comma-separated disturbance identifiers
+                basetime     base time of the bulletins (ISO 8601)
+                member       comma-separated ensemble member numbers
+                bbox         lonmin,latmin,lonmax,latmax (degrees); lonmin may
+                             exceed lonmax for a box across 0E
+                start, end   validtime window (ISO 8601, inclusive)
+                format       json (default), arrow or parquet
+    /stats    cache statistics, as JSON
+
+The arrow and parquet formats require `pyarrow`.
+
+"""
+
+import io
+import os
+import json
+import time
+import threading
+import logging as log
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+import pandas as pd
+
+import pycxml
+import archive
+import merge
+from sources import (loadSource, readSource, loadHeader, sourceName,
+                     closeArchives)
+
+CONTENT_TYPES = {'json': 'application/json',
+                 'arrow': 'application/vnd.apache.arrow.stream',
+                 'parquet': 'application/vnd.apache.parquet'}
+QUERY_PARAMETERS = ("disturbance", "basetime", "member", "bbox", "start",
+                    "end", "format")
+
+
+class LRUCache:
+    """
+    Thread-safe least recently used cache.
+
+    :param int maxsize: number of items held before the least recently used
+    is evicted.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        self.loading = {}
+        self.hits = self.misses = 0
+
+    def get(self, key, load):
+        """
+        The item for `key`, calling `load()` to create it if it is not held.
+        Concurrent requests for the same missing item wait for a single
+        call of `load`.
+        """
+        while True:
+            with self.lock:
+                if key in self.items:
+                    self.items.move_to_end(key)
+                    self.hits += 1
+                    return self.items[key]
+                event = self.loading.get(key)
+                if event is None:
+                    event = self.loading[key] = threading.Event()
+                    self.misses += 1
+                    break
+            # Another thread is loading this item
+            event.wait()
+        try:
+            value = load()
+            with self.lock:
+                self.items[key] = value
+                while len(self.items) > self.maxsize:
+                    self.items.popitem(last=False)
+            return value
+        finally:
+            with self.lock:
+                del self.loading[key]
+            event.set()
+
+    def stats(self):
+        with self.lock:
+            return {'size': len(self.items), 'maxsize': self.maxsize,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+def _modified(source):
+    """
+    Modification time of a source, or None if it no longer exists.
+    """
+    path = source[0] if isinstance(source, tuple) else source
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def _timestamp(value, name):
+    try:
+        ts = pd.Timestamp(value)
+    except ValueError:
+        raise ValueError(f"Invalid {name}: {value!r}")
+    # Times in the archive are naive UTC
+    return ts.tz_convert(None) if ts.tzinfo is not None else ts
+
+
+def parseQuery(query):
+    """
+    Parse the parameters of a `/fixes` query string.
+
+    :param str query: URL query string.
+
+    :returns: :class:`dict` of parameters, with disturbances and members as
+    tuples, times as :class:`pandas.Timestamp` and the bounding box as a
+    tuple of floats. Raises `ValueError` for unknown or invalid parameters.
+    """
+    params = {k: v[-1] for k, v in parse_qs(query).items()}
+    unknown = set(params) - set(QUERY_PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown query parameters: {sorted(unknown)}")
+    result = {'format': params.get('format', 'json')}
+    if result['format'] not in CONTENT_TYPES:
+        raise ValueError(f"Unknown format {result['format']!r}")
+    if 'disturbance' in params:
+        result['disturbance'] = tuple(sorted(
+            params['disturbance'].split(',')))
+    if 'member' in params:
+        try:
+            result['member'] = tuple(sorted(
+                int(m) for m in params['member'].split(',')))
+        except ValueError:
+            raise ValueError(f"Invalid member: {params['member']!r}")
+    if 'bbox' in params:
+        try:
+            bbox = tuple(float(v) for v in params['bbox'].split(','))
+        except ValueError:
+            bbox = ()
+        if len(bbox) != 4:
+            raise ValueError(f"Invalid bbox: {params['bbox']!r}")
+        result['bbox'] = bbox
+    for name in ('basetime', 'start', 'end'):
+        if name in params:
+            result[name] = _timestamp(params[name], name)
+    return result
+
+
+def selectFixes(df, disturbance=None, member=None, bbox=None, start=None,
+                end=None):
+    """
+    Rows of a frame of fixes that match a query.
+    """
+    keep = np.ones(len(df), dtype=bool)
+    if disturbance is not None:
+        keep &= df['disturbance'].isin(disturbance).to_numpy()
+    if member is not None:
+        keep &= df['member'].isin(member).to_numpy()
+    if bbox is not None:
+        lonmin, latmin, lonmax, latmax = bbox
+        lon = np.mod(df['longitude'].to_numpy(float), 360.)
+        lonmin, lonmax = lonmin % 360., lonmax % 360.
+        inlon = (lon >= lonmin) & (lon <= lonmax) if lonmin <= lonmax \
+            else (lon >= lonmin) | (lon <= lonmax)
+        lat = df['latitude'].to_numpy(float)
+        keep &= inlon & (lat >= latmin) & (lat <= latmax)
+    validtime = df['validtime'].to_numpy()
+    if start is not None:
+        keep &= validtime >= start.to_datetime64()
+    if end is not None:
+        keep &= validtime <= end.to_datetime64()
+    return df[keep]
+
+
+def encode(df, fmt):
+    """
+    Encode a frame of fixes as JSON (a list of records), an Arrow IPC
+    stream or Parquet.
+    """
+    if fmt == 'json':
+        return df.to_json(orient='records', date_format='iso',
+                          date_unit='s').encode()
+    buf = io.BytesIO()
+    if fmt == 'parquet':
+        df.to_parquet(buf, index=False)
+    else:
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        with pa.ipc.new_stream(buf, table.schema) as writer:
+            writer.write_table(table)
+    return buf.getvalue()
+
+
+def scanExtent(fh):
+    """
+    Disturbances and range of validtimes of a CXML document, read in a
+    streaming pass that builds no frames.
+
+    :param fh: binary file object holding the document.
+
+    :returns: tuple of (:class:`frozenset` of disturbance identifiers, first
+    validtime, last validtime); the times are None if the document holds no
+    valid times.
+    """
+    disturbances, times = set(), []
+    for event, elem in ET.iterparse(fh, events=('start', 'end')):
+        if event == 'start':
+            if elem.tag == 'disturbance':
+                disturbances.add(elem.get('ID'))
+        elif elem.tag == 'validTime':
+            try:
+                times.append(datetime.strptime(elem.text.strip(),
+                                               pycxml.DATEFMT))
+            except (AttributeError, ValueError):
+                pass
+        elif elem.tag == 'fix':
+            elem.clear()
+    return (frozenset(disturbances), min(times, default=None),
+            max(times, default=None))
+
+
+def indexEntry(source):
+    """
+    Index entry of a source: its header (see `pycxml.loadheader`), its
+    modification time, and its disturbances and range of validtimes (see
+    `scanExtent`). These are None if the document cannot be scanned, so the
+    source is never excluded from a query.
+    """
+    entry = dict(loadHeader(source, shared=True), source=source,
+                 modified=_modified(source))
+    fh = io.BytesIO(readSource(source, shared=True)) \
+        if isinstance(source, tuple) \
+        else open(source, 'rb')
+    try:
+        with fh:
+            disturbances, first, last = scanExtent(fh)
+    except ET.ParseError as e:
+        log.debug("%s: %s", sourceName(source), e)
+        disturbances = first = last = None
+    return dict(entry, disturbances=disturbances, first=first, last=last)
+
+
+class Archive:
+    """
+    Parsed frames of an archive of CXML files, held in an LRU cache.
+
+    :param list sources: paths of CXML files, or (archive, member) tuples
+    (see `sources.expandSources`).
+    :param int maxfiles: number of parsed files held in memory.
+    :param int maxqueries: number of encoded responses held in memory.
+    :param bool lenient: see `pycxml.loadfile`.
+    :param float interval: least time (seconds) between checks of the
+    archive for modified or removed files.
+    """
+
+    def __init__(self, sources, maxfiles=64, maxqueries=256, lenient=True,
+                 interval=5.):
+        self.lenient = lenient
+        self.interval = interval
+        index = []
+        for source in sources:
+            try:
+                index.append(indexEntry(source))
+            except Exception as e:
+                log.warning("%s: %s", sourceName(source), e)
+        # The index is replaced as a whole when it is refreshed, so it can
+        # be read without the lock
+        self.index = index
+        self.lock = threading.Lock()
+        self.refreshed = time.monotonic()
+        self.frames = LRUCache(maxfiles)
+        self.responses = LRUCache(maxqueries)
+        log.info("Serving %d files", len(self.index))
+
+    def frame(self, source, modified=None):
+        """
+        Parsed fixes of a source, from the cache if it is held and has not
+        been modified since it was parsed.
+
+        :param modified: modification time of the source, if known.
+        """
+        def load():
+            result = loadSource(source, self.lenient, shared=True)
+            return archive.conform(merge.stackResults([result]))
+
+        if modified is None:
+            modified = _modified(source)
+        return self.frames.get((source, modified), load)
+
+    def refresh(self):
+        """
+        Index the files again that have been modified since they were
+        indexed, at most once every `interval` seconds. Files that have
+        been removed are marked as gone (their `modified` time is None),
+        and are indexed again if they reappear.
+
+        :returns: the index.
+        """
+        if time.monotonic() - self.refreshed < self.interval:
+            return self.index
+        with self.lock:
+            if time.monotonic() - self.refreshed < self.interval:
+                return self.index
+            index = []
+            modified = [_modified(e['source']) for e in self.index]
+            # Archives that have changed are opened again
+            closeArchives({e['source'][0] for e, m in
+                           zip(self.index, modified)
+                           if isinstance(e['source'], tuple) and
+                           m != e['modified']})
+            for entry, modified in zip(self.index, modified):
+                source = entry['source']
+                if modified is not None and modified != entry['modified']:
+                    try:
+                        entry = indexEntry(source)
+                    except Exception as e:
+                        log.warning("%s: %s", sourceName(source), e)
+                        entry = dict(entry, modified=modified,
+                                     disturbances=None, first=None,
+                                     last=None)
+                elif modified is None and entry['modified'] is not None:
+                    log.info("%s has been removed", sourceName(source))
+                    entry = dict(entry, modified=None)
+                index.append(entry)
+            self.index = index
+            self.refreshed = time.monotonic()
+            return index
+
+    def select(self, disturbance=None, basetime=None, start=None, end=None):
+        """
+        Index entries of the files that may hold fixes matching a query,
+        chosen from the disturbances and the range of validtimes of each
+        file so that other files are not parsed.
+        """
+        def match(e):
+            if e['modified'] is None:
+                return False
+            if basetime is not None and (
+                    e['basetime'] is None or
+                    pd.Timestamp(e['basetime']) != basetime):
+                return False
+            if disturbance is not None and e['disturbances'] is not None \
+                    and e['disturbances'].isdisjoint(disturbance):
+                return False
+            if start is not None and e['last'] is not None and \
+                    e['last'] < start:
+                return False
+            return end is None or e['first'] is None or e['first'] <= end
+
+        return [e for e in self.refresh() if match(e)]
+
+    def query(self, disturbance=None, basetime=None, member=None, bbox=None,
+              start=None, end=None, entries=None):
+        """
+        Fixes matching a query (see `parseQuery`), with the columns
+        `archive.ARCHIVE_COLUMNS`.
+
+        :param list entries: index entries to search, if already selected.
+        """
+        if entries is None:
+            entries = self.select(disturbance, basetime, start, end)
+        frames = []
+        for e in entries:
+            try:
+                df = self.frame(e['source'], e['modified'])
+            except OSError as err:
+                # Removed since the index was last refreshed
+                log.warning("%s: %s", sourceName(e['source']), err)
+                continue
+            frames.append(selectFixes(df, disturbance, member, bbox, start,
+                                      end))
+        frames = [f for f in frames if len(f)]
+        if not frames:
+            return archive.archiveMeta()
+        return pd.concat(frames, ignore_index=True)
+
+    def respond(self, params):
+        """
+        Encoded response to a parsed query, from the cache if the same query
+        has been answered before and none of the files it draws on have
+        been modified since.
+        """
+        params = dict(params)
+        fmt = params.pop('format', 'json')
+        entries = self.select(params.get('disturbance'),
+                              params.get('basetime'), params.get('start'),
+                              params.get('end'))
+        modified = tuple(e['modified'] for e in entries)
+        key = (fmt, modified) + tuple(sorted(params.items()))
+        return self.responses.get(
+            key, lambda: encode(self.query(entries=entries, **params), fmt))
+
+    def headers(self):
+        return [{'source': sourceName(e['source']),
+                 'basetime': e['basetime'], 'creationtime': e['creationtime'],
+                 'centre': e['centre'], 'members': e['members']}
+                for e in self.refresh() if e['modified'] is not None]
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """
+    Request handler; the archive is the `archive` attribute of the server.
+    """
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        try:
+            if url.path == '/fixes':
+                params = parseQuery(url.query)
+                body = self.server.archive.respond(params)
+                self.reply(200, body, CONTENT_TYPES[params['format']])
+            elif url.path == '/index':
+                self.replyJSON(200, self.server.archive.headers())
+            elif url.path == '/stats':
+                store = self.server.archive
+                self.replyJSON(200, {'files': store.frames.stats(),
+                                     'queries': store.responses.stats()})
+            else:
+                self.replyJSON(404, {'error': f"Unknown path {url.path}"})
+        except ValueError as e:
+            self.replyJSON(400, {'error': str(e)})
+        except ImportError as e:
+            self.replyJSON(501, {'error': str(e)})
+        except Exception as e:
+            log.exception("Error answering %s", self.path)
+            self.replyJSON(500, {'error': f"{type(e).__name__}: {e}"})
+
+    def reply(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def replyJSON(self, status, obj):
+        self.reply(status, json.dumps(obj, default=str).encode(),
+                   CONTENT_TYPES['json'])
+
+    def log_message(self, format, *args):
+        log.debug("%s - %s", self.address_string(), format % args)
+
+
+def makeServer(store, host="127.0.0.1", port=8000):
+    """
+    Create (but do not start) a threaded HTTP server for an archive.
+
+    :param store: :class:`Archive` to serve.
+    :param str host: address to listen on (default localhost only).
+    :param int port: port to listen on; 0 picks a free port.
+    """
+    httpd = ThreadingHTTPServer((host, port), QueryHandler)
+    httpd.daemon_threads = True
+    httpd.archive = store
+    return httpd
+
+
+def serve(sources, host="127.0.0.1", port=8000, maxfiles=64,
+          maxqueries=256, lenient=True):
+    """
+    Serve queries over an archive until interrupted.
+    """
+    httpd = makeServer(Archive(sources, maxfiles, maxqueries, lenient),
+                       host, port)
+    log.info("Listening on http://%s:%d/", *httpd.server_address[:2])
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        closeArchives()
@@ -0,0 +1,263 @@
+"""
+sharedframes - Hand parsed results between processes in shared memory
+
+When files are parsed in a pool of worker processes, returning the
+resulting DataFrames to the parent pickles every value, which for large
+ensembles costs as much as the parse itself. Here a worker instead writes
+the columns of its result into a single `multiprocessing.shared_memory`
+block, and returns only a small descriptor of the block. The parent maps
+the block and builds its DataFrames (or `CompactEnsemble`) as views of the
+shared memory, without copying the data.
+
+The block is unlinked as soon as the parent has mapped it, and stays mapped
+for as long as any frame or array built from it is alive.
+
+"""
+
+import logging as log
+from multiprocessing import shared_memory, resource_tracker
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import pycxml
+from compact import CompactEnsemble
+
+ALIGNMENT = 8
+
+
+class SharedArray(np.ndarray):
+    """
+    Array backed by a shared memory block. The block is held open by the
+    array, and by every view of it, so it cannot be closed while the data
+    are still in use.
+    """
+
+    def __array_finalize__(self, obj):
+        self.shm = getattr(obj, 'shm', None)
+
+
+def _columnArray(series):
+    """
+    Typed array of a column of a `pycxml` frame, ready to be written to
+    shared memory.
+
+    :returns: tuple of (array, categories). For text columns, `array` holds
+    int32 codes into the list `categories` (-1 for a missing value);
+    otherwise `categories` is None.
+    """
+    if series.name == 'validtime':
+        return pd.to_datetime(series).to_numpy(dtype='datetime64[s]'), None
+    if series.name == 'member':
+        return series.to_numpy(dtype=np.int64), None
+    try:
+        return series.astype(float).to_numpy(), None
+    except (TypeError, ValueError):
+        codes, categories = pd.factorize(series)
+        return codes.astype(np.int32), list(categories)
+
+
+def _pack(arrays):
+    """
+    Copy a list of arrays into a new shared memory block.
+
+    :returns: tuple of (block name, list of (dtype, shape, offset)).
+    """
+    layout, size = [], 0
+    for arr in arrays:
+        layout.append((arr.dtype.str, arr.shape, size))
+        size += -(-arr.nbytes // ALIGNMENT) * ALIGNMENT
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    try:
+        for arr, (dtype, shape, offset) in zip(arrays, layout):
+            view = np.ndarray(shape, dtype, buffer=shm.buf, offset=offset)
+            view[...] = arr
+            del view
+    except Exception:
+        shm.close()
+        shm.unlink()
+        raise
+    shm.close()
+    return shm.name, layout
+
+
+def _attach(name, layout):
+    """
+    Map a shared memory block written by `_pack` and unlink it.
+
+    :returns: list of :class:`SharedArray` views of the arrays in the block.
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    shm.unlink()
+    arrays = []
+    for dtype, shape, offset in layout:
+        arr = np.ndarray(shape, dtype, buffer=shm.buf,
+                         offset=offset).view(SharedArray)
+        arr.shm = shm
+        arrays.append(arr)
+    return arrays
+
+
+def toShared(result):
+    """
+    Write a `pycxml.loadfile` result to shared memory.
+
+    :param result: :class:`pandas.DataFrame`, list of DataFrames (one per
+    ensemble member) or :class:`compact.CompactEnsemble`.
+
+    :returns: :class:`dict` describing the shared memory block, to be passed
+    to `fromShared` in another process. None if `result` is None.
+    """
+    if result is None:
+        return None
+    if isinstance(result, CompactEnsemble):
+        name, layout = _pack([result.data, result.validtime,
+                              result.members])
+        return {'kind': 'compact', 'name': name, 'layout': layout,
+                'fields': result.fields, 'disturbance': result.disturbance,
+                'basetime': result.basetime, 'attrs': result.attrs}
+
+    frames = result if isinstance(result, list) else [result]
+    columns = list(frames[0].columns) if frames else []
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    arrays, categories = [], []
+    for col in columns:
+        arr, cats = _columnArray(df[col])
+        arrays.append(arr)
+        categories.append(cats)
+    name, layout = _pack(arrays)
+    return {'kind': 'frames' if isinstance(result, list) else 'frame',
+            'name': name, 'layout': layout, 'columns': columns,
+            'categories': categories,
+            'lengths': [len(f) for f in frames],
+            'attrs': [f.attrs for f in frames]}
+
+
+def fromShared(desc):
+    """
+    Rebuild a `pycxml.loadfile` result from a shared memory block written by
+    `toShared`. Numeric columns are views of the shared memory; text columns
+    are decoded into object arrays.
+
+    :param dict desc: descriptor returned by `toShared`.
+
+    :returns: :class:`pandas.DataFrame`, list of DataFrames or
+    :class:`compact.CompactEnsemble`, as passed to `toShared`.
+    """
+    if desc is None:
+        return None
+    arrays = _attach(desc['name'], desc['layout'])
+    if desc['kind'] == 'compact':
+        data, validtime, members = arrays
+        result = CompactEnsemble(data, validtime, members, desc['fields'],
+                                 desc['disturbance'], desc['basetime'])
+        result.attrs = desc['attrs']
+        return result
+
+    for i, cats in enumerate(desc['categories']):
+        if cats is not None:
+            # Missing values are coded -1, which picks the trailing None
+            arrays[i] = np.asarray(list(cats) + [None],
+                                   dtype=object)[arrays[i]]
+    frames, start = [], 0
+    for length, attrs in zip(desc['lengths'], desc['attrs']):
+        sl = slice(start, start + length)
+        frame = pd.DataFrame({col: arr[sl] for col, arr in
+                              zip(desc['columns'], arrays)}, copy=False)
+        frame.attrs = attrs
+        frames.append(frame)
+        start += length
+    return frames if desc['kind'] == 'frames' else frames[0]
+
+
+def _discard(desc):
+    """
+    Unlink a shared memory block that will not be used.
+    """
+    if desc is not None:
+        shm = shared_memory.SharedMemory(name=desc['name'])
+        shm.close()
+        shm.unlink()
+
+
+def _loadTask(xmlfile, compact, lenient, check):
+    """
+    Load a file in a worker process, and return its result in shared memory
+    along with any errors.
+    """
+    results, errors = pycxml.loadfiles([xmlfile], compact, lenient,
+                                       check=check)
+    return toShared(results.get(xmlfile)), errors.to_dict('records')
+
+
+def sharedPool(workers):
+    """
+    A process pool for tasks that return their results with `toShared`.
+
+    :param int workers: number of worker processes.
+    """
+    # Start the resource tracker before the workers, so that they share it
+    # with this process. Blocks are then registered by the workers and
+    # unregistered here when they are unlinked, and any blocks left behind
+    # if this process dies are removed by the tracker.
+    resource_tracker.ensure_running()
+    return ProcessPoolExecutor(max_workers=workers)
+
+
+def collectShared(futures, pool):
+    """
+    Collect, in order, the results of tasks that return a `toShared`
+    descriptor followed by other values. If a task fails, the blocks of
+    the tasks that completed but have not been collected are unlinked before
+    the exception is raised.
+
+    :param list futures: :class:`concurrent.futures.Future` objects of the
+    tasks.
+    :param pool: the executor running the tasks.
+
+    :returns: generator of tuples of (`fromShared` result, other values...).
+    """
+    for n, future in enumerate(futures):
+        try:
+            desc, *values = future.result()
+        except BaseException:
+            remaining = futures[n + 1:]
+            for f in remaining:
+                f.cancel()
+            pool.shutdown(wait=True)
+            for f in remaining:
+                if not f.cancelled() and f.exception() is None:
+                    _discard(f.result()[0])
+            raise
+        yield (fromShared(desc), *values)
+
+
+def loadShared(xmlfiles, compact=False, lenient=True, workers=4,
+               check=False):
+    """
+    Load a batch of CXML files in a pool of worker processes, with the
+    results handed back in shared memory. See `pycxml.loadfiles`.
+
+    :param list xmlfiles: paths of the CXML files to load.
+    :param bool compact: see `pycxml.loadfile`.
+    :param bool lenient: see `pycxml.loadfiles`.
+    :param int workers: number of worker processes.
+    :param bool check: see `pycxml.loadfile`.
+
+    :returns: tuple of (results, errors), as for `pycxml.loadfiles`.
+    """
+    results, errors = {}, []
+    with sharedPool(workers) as pool:
+        futures = [pool.submit(_loadTask, xmlfile, compact, lenient,
+                               check)
+                   for xmlfile in xmlfiles]
+        for xmlfile, (result, fileErrors) in zip(xmlfiles,
+                                                 collectShared(futures,
+                                                               pool)):
+            if result is not None:
+                results[xmlfile] = result
+            errors.extend(fileErrors)
+    log.debug("Loaded %d files in %d worker processes", len(results),
+              workers)
+    return results, pd.DataFrame(errors, columns=pycxml.ERROR_COLUMNS)
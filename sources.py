@@ -0,0 +1,183 @@
+"""
+sources - Read CXML files given as paths or as members of zip/tar archives
+
+A source is either the path to a CXML file, or an (archive, member) tuple
+naming a file held in a zip or tar archive. These helpers are shared by the
+command line interface (`cli`) and the query server (`server`).
+
+"""
+
+import io
+import glob
+import contextlib
+import tarfile
+import zipfile
+import threading
+
+import pycxml
+
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+
+# Archives opened by each thread (see `openArchive`), the caches of every
+# thread, and the archives shared by all threads (see `sharedArchive`):
+_openArchives = threading.local()
+_threadArchives = []
+_sharedArchives = {}
+_archivesLock = threading.Lock()
+
+
+def isArchive(path):
+    return path.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def archiveMembers(path, suffix='.xml'):
+    """
+    Names of the CXML files held in a zip or tar archive.
+    """
+    if path.lower().endswith('.zip'):
+        with zipfile.ZipFile(path) as zf:
+            return [n for n in zf.namelist() if n.lower().endswith(suffix)]
+    with tarfile.open(path) as tf:
+        return [m.name for m in tf.getmembers()
+                if m.isfile() and m.name.lower().endswith(suffix)]
+
+
+def expandSources(patterns, suffix='.xml'):
+    """
+    Expand command line arguments into a list of sources. A source is either
+    the path to a CXML file, or an (archive, member) tuple.
+
+    :param list patterns: paths, glob patterns or archives.
+    :param str suffix: suffix of the CXML files to take from archives.
+    """
+    sources = []
+    for pattern in patterns:
+        paths = sorted(glob.glob(pattern, recursive=True)) or [pattern]
+        for path in paths:
+            if isArchive(path):
+                sources.extend((path, member)
+                               for member in archiveMembers(path, suffix))
+            else:
+                sources.append(path)
+    return sources
+
+
+def sourceName(source):
+    if isinstance(source, tuple):
+        return f"{source[0]}:{source[1]}"
+    return source
+
+
+def openArchive(path):
+    """
+    An open zip or tar archive, kept open by each thread (or worker
+    process) that reads it until `closeArchives` is called. The index of
+    the archive is read once, and since sources are handed to each worker
+    in order, the members of a compressed tar are read in a single pass
+    through it rather than by decompressing from the start of the stream
+    for every member.
+    """
+    archives = getattr(_openArchives, 'archives', None)
+    if archives is None:
+        archives = _openArchives.archives = {}
+        with _archivesLock:
+            _threadArchives.append(archives)
+    if path not in archives:
+        archives[path] = _open(path)
+    return archives[path]
+
+
+def sharedArchive(path):
+    """
+    An open zip or tar archive shared by every thread of the process, for
+    servers whose requests are each handled in a new thread. Hold the
+    returned lock while reading from the archive.
+
+    :returns: tuple of (archive, lock).
+    """
+    with _archivesLock:
+        if path not in _sharedArchives:
+            _sharedArchives[path] = (_open(path), threading.Lock())
+        return _sharedArchives[path]
+
+
+def closeArchives(paths=None):
+    """
+    Close the archives opened by `openArchive` (in every thread) and
+    `sharedArchive`. They are opened again if they are read later.
+
+    :param paths: paths of the archives to close (default all of them).
+    """
+    def chosen(cache):
+        return [p for p in cache if paths is None or p in paths]
+
+    opened = []
+    with _archivesLock:
+        for archives in _threadArchives:
+            opened.extend(archives.pop(p) for p in chosen(archives))
+        opened.extend(_sharedArchives.pop(p)[0]
+                      for p in chosen(_sharedArchives))
+    for archive in opened:
+        archive.close()
+
+
+def _open(path):
+    return zipfile.ZipFile(path) if path.lower().endswith('.zip') \
+        else tarfile.open(path)
+
+
+def readSource(source, shared=False):
+    """
+    Contents of a source, as bytes.
+
+    :param bool shared: read archive members through `sharedArchive`
+    rather than `openArchive`.
+    """
+    if not isinstance(source, tuple):
+        with open(source, 'rb') as fh:
+            return fh.read()
+    archive, member = source
+    if shared:
+        opened, lock = sharedArchive(archive)
+    else:
+        opened, lock = openArchive(archive), contextlib.nullcontext()
+    with lock:
+        if isinstance(opened, zipfile.ZipFile):
+            return opened.read(member)
+        return opened.extractfile(member).read()
+
+
+def loadSource(source, lenient=False, lxml=False, shared=False):
+    """
+    Parse a source with `pycxml.loadfile` (or `pycxml.loadstring` for
+    archive members).
+
+    :param bool lenient: see `pycxml.loadfile`.
+    :param bool lxml: if True, parse with lxml instead (see
+    `threadload.parseBytes`), which releases the GIL while it parses.
+    :param bool shared: see `readSource`.
+    """
+    if lxml:
+        from threadload import parseBytes
+        result, _ = parseBytes(readSource(source, shared), sourceName(source),
+                               lenient=lenient)
+        return result
+    if isinstance(source, tuple):
+        return pycxml.loadstring(readSource(source, shared),
+                                 name=sourceName(source), lenient=lenient)
+    return pycxml.loadfile(source, lenient=lenient)
+
+
+def loadHeader(source, shared=False):
+    """
+    Header of a source, read with `pycxml.loadheader`, without the file
+    name.
+
+    :param bool shared: see `readSource`.
+    """
+    if isinstance(source, tuple):
+        header = pycxml.loadheader(io.BytesIO(readSource(source, shared)))
+    else:
+        header = pycxml.loadheader(source)
+    del header['file']
+    return header
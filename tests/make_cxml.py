@@ -0,0 +1,127 @@
+"""
+Generate synthetic CXML documents for tests that need more data than the
+example file provides.
+"""
+
+from datetime import datetime, timedelta
+
+BASETIME = datetime(2021, 1, 1, 0)
+DATEFMT = "%Y-%m-%dT%H:%M:%SZ"
+DISTID = "2021010100_120S_1200E"
+
+
+def fixXML(hour, lat, lon, mslp=990., wind=30., rmax=None, poci=1005.,
+           basetime=BASETIME):
+    """
+    A single fix element. `lat` is degrees south, `lon` degrees east.
+    """
+    validtime = (basetime + timedelta(hours=hour)).strftime(DATEFMT)
+    rmaxelem = (f'<radius units="km">{rmax}</radius>'
+                if rmax is not None else "")
+    return f"""
+            <fix hour="{hour}">
+                <validTime>{validtime}</validTime>
+                <latitude units="deg S">{lat}</latitude>
+                <longitude units="deg E">{lon}</longitude>
+                <cycloneData>
+                    <minimumPressure>
+                        <pressure units="hPa">{mslp}</pressure>
+                    </minimumPressure>
+                    <lastClosedIsobar>
+                        <pressure units="hPa">{poci}</pressure>
+                    </lastClosedIsobar>
+                    <maximumWind>
+                        <speed units="m/s">{wind}</speed>
+                        {rmaxelem}
+                    </maximumWind>
+                    <windContours>
+                        <windSpeed units="kt">34
+                            <radius sector="NEQ" units="km">200.</radius>
+                            <radius sector="SEQ" units="km">150.</radius>
+                            <radius sector="SWQ" units="km">100.</radius>
+                            <radius sector="NWQ" units="km">150.</radius>
+                        </windSpeed>
+                    </windContours>
+                </cycloneData>
+            </fix>"""
+
+
+def headerXML(nmembers=None, basetime=BASETIME, creationtime=None,
+              centre="TEST CENTRE"):
+    """
+    A header element, for an ensemble forecast if `nmembers` is given.
+    """
+    creationtime = creationtime or basetime + timedelta(hours=3)
+    ensemble = (f"""<ensemble><numMembers>{nmembers}</numMembers>
+                <perturbationMethod>SVD</perturbationMethod></ensemble>"""
+                if nmembers else "")
+    return f"""
+    <header>
+        <product>Cyclone Forecast</product>
+        <generatingApplication>
+            <applicationType>Synthetic test data</applicationType>
+            {ensemble}
+        </generatingApplication>
+        <productionCenter>{centre}</productionCenter>
+        <baseTime>{basetime.strftime(DATEFMT)}</baseTime>
+        <creationTime>{creationtime.strftime(DATEFMT)}</creationTime>
+    </header>"""
+
+
+def trackFixes(member=0, hours=range(0, 126, 6), lat0=12., lon0=120.,
+               basetime=BASETIME, rmax=30.):
+    """
+    Fixes of a simple straight-line track, perturbed by member number.
+    """
+    return "".join(fixXML(h, round(lat0 + 0.1 * h + 0.01 * member, 3),
+                          round(lon0 + 0.05 * h - 0.01 * member, 3),
+                          mslp=990. - 0.1 * h, wind=30. + 0.1 * h,
+                          rmax=rmax, basetime=basetime)
+                   for h in hours)
+
+
+def ensembleXML(nmembers=51, hours=range(0, 126, 6), distId=DISTID,
+                basetime=BASETIME, creationtime=None, rmax=30.):
+    """
+    A complete ensemble forecast document with `nmembers` members.
+    """
+    data = "".join(f"""
+    <data type="ensembleForecast" member="{m}">
+        <disturbance ID="{distId}">
+            {trackFixes(m, hours, basetime=basetime, rmax=rmax)}
+        </disturbance>
+    </data>""" for m in range(nmembers))
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<cxml>{headerXML(nmembers, basetime, creationtime)}{data}
+</cxml>"""
+
+
+def forecastXML(hours=range(0, 126, 6), distId=DISTID, basetime=BASETIME,
+                creationtime=None, lat0=12., lon0=120., rmax=30.):
+    """
+    A complete deterministic forecast document.
+    """
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<cxml>{headerXML(None, basetime, creationtime)}
+    <data type="forecast">
+        <disturbance ID="{distId}">
+            {trackFixes(0, hours, lat0, lon0, basetime, rmax)}
+        </disturbance>
+    </data>
+</cxml>"""
+
+
+def analysisXML(hours=range(0, 126, 6), distId=DISTID, basetime=BASETIME,
+                creationtime=None, lat0=12., lon0=120.):
+    """
+    A complete analysis document, with the fixes of a straight-line track
+    at the given hours after `basetime`.
+    """
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<cxml>{headerXML(None, basetime, creationtime)}
+    <data type="analysis">
+        <disturbance ID="{distId}">
+            {trackFixes(0, hours, lat0, lon0, basetime)}
+        </disturbance>
+    </data>
+</cxml>"""
@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+import importlib.util
+
+import numpy as np
+import pandas as pd
+
+import pycxml
+import archive
+from make_cxml import ensembleXML, forecastXML
+
+HAVE_DASK = importlib.util.find_spec("dask") is not None
+
+
+class TestArchive(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        cls.ensemble = cls.write("ensemble.xml", ensembleXML(nmembers=3))
+        cls.forecast = cls.write("forecast.xml", forecastXML())
+        cls.paths = [cls.ensemble, cls.forecast]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmpdir.cleanup()
+
+    @classmethod
+    def write(cls, name, text):
+        path = os.path.join(cls.tmpdir.name, name)
+        with open(path, 'w') as fh:
+            fh.write(text)
+        return path
+
+    def testPartitions(self):
+        self.assertEqual(archive.partitions(self.paths),
+                         [(self.ensemble, None, None),
+                          (self.forecast, None, None)])
+        parts = archive.partitions(self.paths, by="member")
+        self.assertEqual(len(parts), 4)
+        self.assertEqual(parts[-1], (self.forecast, None, None))
+        self.assertRaises(ValueError, archive.partitions, self.paths,
+                          "disturbance")
+
+    def testTruncated(self):
+        text = ensembleXML(nmembers=4)
+        path = self.write("truncated.xml", text[:text.rindex("</data>")])
+        self.assertRaises(ValueError, archive.partitions, [path], "member",
+                          False)
+        parts = archive.partitions([path], by="member")
+        self.assertEqual(parts, [(path, None, None)])
+        self.assertEqual(len(archive.loadPartition(parts[0])), 84)
+
+    def testLoadPartition(self):
+        meta = archive.archiveMeta()
+        self.assertEqual(list(meta.columns), archive.ARCHIVE_COLUMNS)
+        for part in archive.partitions(self.paths, by="member"):
+            df = archive.loadPartition(part)
+            pd.testing.assert_series_equal(df.dtypes, meta.dtypes)
+            self.assertEqual(len(df), 21)
+            self.assertTrue((df['centre'] == "TEST CENTRE").all())
+        member = archive.loadPartition(
+            archive.partitions(self.paths, by="member")[1])
+        self.assertTrue((member['member'] == 1).all())
+        expected = pycxml.loadfile(self.ensemble)[1]
+        np.testing.assert_allclose(member['latitude'],
+                                   expected['latitude'].astype(float))
+        whole = archive.loadPartition((self.ensemble, None, None))
+        self.assertEqual(len(whole), 63)
+
+    @unittest.skipUnless(HAVE_DASK, "dask is not installed")
+    def testOpenArchive(self):
+        ddf = archive.openArchive(self.paths, by="member")
+        self.assertEqual(ddf.npartitions, 4)
+        self.assertEqual(list(ddf.columns), archive.ARCHIVE_COLUMNS)
+        counts = ddf.groupby('disturbance')['validtime'].count().compute()
+        self.assertEqual(counts.iloc[0], 84)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import os
+import asyncio
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+import asyncload
+from make_cxml import forecastXML
+
+
+class TestAsyncLoad(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.files = []
+        for n in range(5):
+            path = os.path.join(self.tmpdir.name, f"bulletin{n}.xml")
+            with open(path, 'w') as fh:
+                fh.write(forecastXML(distId=f"TEST0{n}"))
+            self.files.append(path)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def testLoadFile(self):
+        df = asyncio.run(asyncload.aload(self.files[0]))
+        self.assertEqual(df['disturbance'][0], "TEST00")
+        self.assertEqual(len(df), 21)
+
+    def testLoadBytes(self):
+        data = forecastXML(distId="BYTES").encode()
+        df = asyncio.run(asyncload.aload(data))
+        self.assertEqual(df['disturbance'][0], "BYTES")
+
+    def testLoadStream(self):
+        async def run():
+            reader = asyncio.StreamReader()
+            reader.feed_data(forecastXML(distId="STREAM").encode())
+            reader.feed_eof()
+            return await asyncload.aload(reader)
+
+        df = asyncio.run(run())
+        self.assertEqual(df['disturbance'][0], "STREAM")
+
+    def testLoadManyOrdered(self):
+        with ProcessPoolExecutor(max_workers=2) as pool:
+            results = asyncio.run(asyncload.aload_many(self.files, pool,
+                                                       limit=2))
+        self.assertEqual([df['disturbance'][0] for df in results],
+                         [f"TEST0{n}" for n in range(5)])
+
+    def testLoadManyExceptions(self):
+        sources = self.files[:2] + ["missing.xml"]
+        results = asyncio.run(asyncload.aload_many(
+            sources, return_exceptions=True))
+        self.assertIsInstance(results[2], IOError)
+        self.assertRaises(IOError, asyncio.run,
+                          asyncload.aload_many(sources))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import pycxml
+import chunkload
+from make_cxml import ensembleXML, forecastXML
+
+
+class TestChunkLoad(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        text = ensembleXML(nmembers=10).replace(
+            "<cxml>", '<cxml xmlns:xsi='
+            '"http://www.w3.org/2001/XMLSchema-instance">')
+        cls.ensemble = cls.write("ensemble.xml", text)
+        cls.forecast = cls.write("forecast.xml", forecastXML())
+        cls.expected = pycxml.loadfile(cls.ensemble)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmpdir.cleanup()
+
+    @classmethod
+    def write(cls, name, text):
+        path = os.path.join(cls.tmpdir.name, name)
+        with open(path, 'w') as fh:
+            fh.write(text)
+        return path
+
+    def testDataRanges(self):
+        with open(self.ensemble, 'rb') as fh:
+            text = fh.read()
+        ranges = chunkload.dataRanges(text)
+        self.assertEqual(len(ranges), 10)
+        self.assertTrue(all(text[s:e].startswith(b"<data ") and
+                            text[s:e].endswith(b"</data>")
+                            for s, e in ranges))
+        self.assertEqual(chunkload.ROOT_START.search(
+            b"<cxml>\n<header>").group(0), b"<cxml>")
+        chunks = chunkload.splitRanges(ranges, 3)
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(chunks[0][0], ranges[0][0])
+        self.assertEqual(chunks[-1][1], ranges[-1][1])
+
+    def testLoadParallel(self):
+        members = chunkload.loadParallel(self.ensemble, workers=2)
+        self.assertEqual(len(members), len(self.expected))
+        for df, expected in zip(members, self.expected):
+            self.assertEqual(df['member'][0], expected['member'][0])
+            np.testing.assert_allclose(df['latitude'],
+                                       expected['latitude'].astype(float))
+        attrs = members[0].attrs
+        self.assertEqual(attrs['centre'], "TEST CENTRE")
+        self.assertEqual(attrs['missing'], self.expected[0].attrs['missing'])
+
+    def testLenient(self):
+        with open(self.ensemble) as fh:
+            text = fh.read().replace("2021-01-01T06:00:00Z", "bad", 1)
+        path = self.write("bad.xml", text)
+        self.assertRaises(ValueError, chunkload.loadParallel, path,
+                          workers=2)
+        members = chunkload.loadParallel(path, workers=2, lenient=True)
+        self.assertEqual(len(members[0]), 20)
+        self.assertEqual(len(members[0].attrs['errors']), 1)
+
+    def testTruncated(self):
+        text = ensembleXML(nmembers=4)
+        path = self.write("truncated.xml", text[:text.rindex("</data>")])
+        self.assertRaises(ValueError, chunkload.loadParallel, path)
+        members = chunkload.loadParallel(path, workers=2, lenient=True)
+        self.assertEqual(len(members), 4)
+        levels = [e['level'] for e in members[0].attrs['errors']]
+        self.assertIn('file', levels)
+
+    def testNotEnsemble(self):
+        df = chunkload.loadParallel(self.forecast)
+        self.assertEqual(len(df), 21)
+
+
+if __name__ == '__main__':
+    unittest.main()
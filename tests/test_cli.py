@@ -0,0 +1,163 @@
+import io
+import os
+import csv
+import tarfile
+import zipfile
+import tempfile
+import unittest
+from contextlib import redirect_stdout, redirect_stderr
+
+import pandas as pd
+
+import cli
+from make_cxml import forecastXML, ensembleXML
+
+
+class TestCommandLine(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.dir = self.tmpdir.name
+        self.forecast = self.write("forecast.xml", forecastXML())
+        self.ensemble = self.write("ensemble.xml", ensembleXML(nmembers=3))
+        self.archive = os.path.join(self.dir, "archive.zip")
+        with zipfile.ZipFile(self.archive, 'w') as zf:
+            zf.write(self.forecast, "bulletins/forecast.xml")
+            zf.write(self.ensemble, "bulletins/ensemble.xml")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.dir, name)
+        with open(path, 'w') as fh:
+            fh.write(text)
+        return path
+
+    def run_cli(self, *argv):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            rc = cli.main(list(argv))
+        return rc, stdout.getvalue(), stderr.getvalue()
+
+    def testExpandSources(self):
+        sources = cli.expandSources([os.path.join(self.dir, "*.xml"),
+                                     self.archive])
+        self.assertEqual(sources, [
+            self.ensemble, self.forecast,
+            (self.archive, "bulletins/forecast.xml"),
+            (self.archive, "bulletins/ensemble.xml")])
+
+    def testValidate(self):
+        rc, out, err = self.run_cli("validate", self.forecast, self.archive)
+        self.assertEqual(rc, 0)
+        self.assertEqual(out.count(": valid"), 3)
+        self.assertIn("files/s", err)
+
+        bad = self.write("bad.xml", "<cxml><header/></cxml>")
+        rc, out, err = self.run_cli("validate", bad)
+        self.assertEqual(rc, 1)
+        self.assertIn("INVALID", out)
+
+    def testValidateThreads(self):
+        bad = self.write("bad.xml", "<cxml><header/></cxml>")
+        rc, out, err = self.run_cli("validate", self.forecast, bad,
+                                    self.archive, "--workers", "2",
+                                    "--threads")
+        self.assertEqual(rc, 1)
+        lines = out.splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertIn("INVALID", lines[1])
+        self.assertEqual(out.count(": valid"), 3)
+
+    def testValidateSample(self):
+        rc, out, err = self.run_cli("validate", self.forecast, self.archive,
+                                    "--sample", "0")
+        self.assertEqual(rc, 0)
+        self.assertEqual(out.count(": valid"), 3)
+        bad = self.write("bad.xml", "<cxml><header/></cxml>")
+        rc, out, err = self.run_cli("validate", bad, "--sample", "0")
+        self.assertEqual(rc, 1)
+        self.assertIn("INVALID", out)
+
+    def testConvert(self):
+        outdir = os.path.join(self.dir, "out")
+        rc, out, err = self.run_cli("convert", self.archive, "-o", outdir,
+                                    "-c", "member,validtime,pcentre",
+                                    "--workers", "2")
+        self.assertEqual(rc, 0)
+        self.assertIn("84 fixes", err)
+        df = pd.read_csv(os.path.join(outdir, "archive_bulletins_"
+                                              "ensemble.csv"))
+        self.assertEqual(list(df.columns), ["member", "validtime",
+                                            "pcentre"])
+        self.assertEqual(sorted(df['member'].unique()), [0, 1, 2])
+
+    def testUnknownColumns(self):
+        stderr = io.StringIO()
+        with redirect_stderr(stderr), self.assertRaises(SystemExit):
+            cli.main(["convert", self.forecast, "-o", self.dir, "-c",
+                      "validtime,pressure"])
+        self.assertIn("unknown columns: pressure", stderr.getvalue())
+
+    def testConvertSameNames(self):
+        for sub in ("a", "b"):
+            os.makedirs(os.path.join(self.dir, sub))
+            self.write(os.path.join(sub, "x.xml"), forecastXML())
+        outdir = os.path.join(self.dir, "out")
+        rc, out, err = self.run_cli("convert",
+                                    os.path.join(self.dir, "*", "x.xml"),
+                                    "-o", outdir)
+        self.assertEqual(rc, 0)
+        self.assertEqual(sorted(os.listdir(outdir)), ["a_x.csv", "b_x.csv"])
+
+        # Sources that would still share an output are refused
+        os.makedirs(os.path.join(self.dir, "a_b"))
+        self.write(os.path.join("a_b", "x.xml"), forecastXML())
+        self.write(os.path.join("a", "b_x.xml"), forecastXML())
+        with redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+            self.run_cli("convert", os.path.join(self.dir, "a_b", "x.xml"),
+                         os.path.join(self.dir, "a", "b_x.xml"), "-o",
+                         outdir)
+
+    def testScan(self):
+        rc, out, err = self.run_cli("scan", self.forecast, self.ensemble)
+        rows = list(csv.DictReader(io.StringIO(out)))
+        self.assertEqual(rc, 0)
+        self.assertEqual([r['members'] for r in rows], ["", "3"])
+        self.assertEqual(rows[0]['centre'], "TEST CENTRE")
+
+    def testTarArchive(self):
+        archive = os.path.join(self.dir, "archive.tar.gz")
+        with tarfile.open(archive, 'w:gz') as tf:
+            tf.add(self.forecast, "bulletins/forecast.xml")
+            tf.add(self.ensemble, "bulletins/ensemble.xml")
+        rc, out, err = self.run_cli("stats", archive, "--workers", "2",
+                                    "--threads")
+        rows = list(csv.DictReader(io.StringIO(out)))
+        self.assertEqual(rc, 0)
+        self.assertEqual([r['fixes'] for r in rows], ["21", "63"])
+
+    def testStatsContinuesAfterError(self):
+        missing = os.path.join(self.dir, "missing.xml")
+        rc, out, err = self.run_cli("stats", missing, self.ensemble)
+        rows = list(csv.DictReader(io.StringIO(out)))
+        self.assertEqual(rc, 1)
+        self.assertTrue(rows[0]['error'])
+        self.assertEqual(rows[1]['fixes'], "63")
+        self.assertEqual(rows[1]['members'], "3")
+
+    def testStatsLenient(self):
+        bad = self.write("bad.xml", forecastXML().replace(
+            "2021-01-01T06:00:00Z", "2021-01-01T06:00", 1))
+        rc, out, err = self.run_cli("stats", bad)
+        self.assertEqual(rc, 1)
+        rc, out, err = self.run_cli("stats", bad, "--lenient")
+        rows = list(csv.DictReader(io.StringIO(out)))
+        self.assertEqual(rc, 0)
+        self.assertEqual(rows[0]['fixes'], "20")
+        self.assertEqual(rows[0]['parse_errors'], "1")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from numpy.testing import assert_allclose
+
+import pycxml
+import climatology
+from make_cxml import ensembleXML, forecastXML
+
+# Wind speeds of the test tracks (m/s), at 0 to 120 h every 6 h
+HOURS = np.arange(0, 126, 6)
+WIND = 30. + 0.1 * HOURS
+
+
+class TestSeason(unittest.TestCase):
+
+    def testSeason(self):
+        times = pd.to_datetime(["2020-06-30", "2020-07-01", "2021-03-01"])
+        assert_allclose(climatology.season(times), [2020, 2021, 2021])
+        assert_allclose(climatology.season(times, start=1),
+                        [2020, 2020, 2021])
+
+
+class TestStormMetrics(unittest.TestCase):
+
+    def testEnsemble(self):
+        members = pycxml.loadstring(ensembleXML(nmembers=3))
+        storms = climatology.stormMetrics([members])
+        self.assertEqual(list(storms.columns), climatology.STORM_COLUMNS)
+        self.assertEqual(len(storms), 3)
+        self.assertEqual(list(storms.index.get_level_values('member')),
+                         [0, 1, 2])
+        kts = WIND * 3.6 * 0.539957
+        assert_allclose(storms['ace'], 1e-4 * np.sum(kts ** 2), rtol=1e-3)
+        assert_allclose(storms['pdi'], 21600. * np.sum(WIND ** 3),
+                        rtol=1e-3)
+        assert_allclose(storms['lmi'], kts[-1], rtol=1e-3)
+        self.assertTrue((storms['lmitime'] == datetime(2021, 1, 6)).all())
+        self.assertTrue((storms['fixes'] == len(HOURS)).all())
+        self.assertTrue((storms['season'] == 2021).all())
+
+    def testThresholdAndUnits(self):
+        df = pycxml.loadstring(forecastXML())
+        storms = climatology.stormMetrics(df, units="m/s", threshold=65.)
+        assert_allclose(storms['lmi'], WIND[-1], rtol=1e-3)
+        counted = WIND * 3.6 * 0.539957 >= 65.
+        assert_allclose(storms['ace'],
+                        1e-4 * np.sum((WIND[counted] * 1.944) ** 2),
+                        rtol=1e-3)
+
+    def testReissued(self):
+        # A reissued bulletin does not count twice
+        first = pycxml.loadstring(forecastXML())
+        second = pycxml.loadstring(forecastXML(
+            creationtime=datetime(2021, 1, 1, 3)))
+        single = climatology.stormMetrics([first])
+        both = climatology.stormMetrics([first, second])
+        self.assertEqual(len(both), 1)
+        assert_allclose(both['ace'], single['ace'])
+
+    def testSeasonMetrics(self):
+        results = [pycxml.loadstring(ensembleXML(nmembers=2)),
+                   pycxml.loadstring(forecastXML(
+                       basetime=datetime(2021, 8, 1),
+                       distId="2021080100_120S_1200E"))]
+        storms = climatology.stormMetrics(results)
+        seasons = climatology.seasonMetrics(storms)
+        self.assertEqual(list(seasons.columns), climatology.SEASON_COLUMNS)
+        self.assertEqual(list(seasons.index), [2021, 2022])
+        self.assertEqual(list(seasons['storms']), [2, 1])
+        assert_allclose(seasons['ace'].iloc[0], 2 * storms['ace'].iloc[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+from numpy.testing import assert_allclose
+
+import pycxml
+import cluster
+from make_cxml import ensembleXML
+
+
+def twoGroups(nmembers=6, ntimes=5):
+    """
+    Straight tracks in two groups, 5 degrees of longitude apart.
+    """
+    lat = np.tile(-12. - np.arange(ntimes, dtype=float), (nmembers, 1))
+    lon = np.tile(120. + np.arange(ntimes, dtype=float), (nmembers, 1))
+    lon += 0.01 * np.arange(nmembers)[:, None]
+    lon[nmembers // 2:] += 5.
+    return lon, lat
+
+
+class TestDistanceMatrix(unittest.TestCase):
+
+    def testDistances(self):
+        lon, lat = twoGroups()
+        dist = cluster.distanceMatrix(lon, lat)
+        self.assertEqual(dist.shape, (6, 6))
+        assert_allclose(np.diag(dist), 0.)
+        assert_allclose(dist, dist.T)
+        # Blocks of a single row give the same matrix
+        assert_allclose(cluster.distanceMatrix(lon, lat, maxbytes=1), dist)
+        # One degree of latitude
+        lat2 = lat + 1.
+        assert_allclose(cluster.distanceMatrix(
+            np.vstack([lon[:1], lon[:1]]),
+            np.vstack([lat[:1], lat2[:1]]))[0, 1], 111.19, atol=0.01)
+
+    def testMissing(self):
+        lon, lat = twoGroups(nmembers=2)
+        lon[0, 2:] = lat[0, 2:] = np.nan
+        lon[1, :2] = lat[1, :2] = np.nan
+        self.assertTrue(np.isnan(cluster.distanceMatrix(lon, lat)[0, 1]))
+
+
+class TestClustering(unittest.TestCase):
+
+    def setUp(self):
+        lon, lat = twoGroups()
+        self.dist = cluster.distanceMatrix(lon, lat)
+
+    def testKMedoids(self):
+        labels, medoids = cluster.kMedoids(self.dist, 2)
+        self.assertEqual(len(set(labels[:3])), 1)
+        self.assertEqual(len(set(labels[3:])), 1)
+        self.assertNotEqual(labels[0], labels[3])
+        self.assertEqual(sorted(medoids), [1, 4])
+
+    def testHierarchical(self):
+        labels, medoids = cluster.hierarchical(self.dist, 2)
+        self.assertEqual(sorted(labels[:3]) + sorted(labels[3:]),
+                         [labels[0]] * 3 + [1 - labels[0]] * 3)
+        self.assertEqual(sorted(medoids), [1, 4])
+
+    def testWeights(self):
+        weights = np.array([1., 1., 10., 1., 1., 1.])
+        labels, medoids = cluster.kMedoids(self.dist, 2, weights)
+        self.assertIn(2, medoids)
+
+
+class TestRepresentativeMembers(unittest.TestCase):
+
+    def testEnsemble(self):
+        ens = pycxml.loadstring(ensembleXML(nmembers=10))
+        reps = cluster.representativeMembers(ens, 3)
+        self.assertEqual(list(reps.columns), cluster.CLUSTER_COLUMNS)
+        self.assertEqual(len(reps), 3)
+        self.assertEqual(reps['size'].sum(), 10)
+        assert_allclose(reps['weight'].sum(), 1.)
+        self.assertTrue((np.diff(reps['weight']) <= 0).all())
+        clusters = reps.attrs['clusters']
+        self.assertEqual(list(clusters.index), list(range(10)))
+        for _, row in reps.iterrows():
+            self.assertEqual(clusters[row['member']], row['cluster'])
+
+    def testCompact(self):
+        text = ensembleXML(nmembers=10)
+        expected = cluster.representativeMembers(pycxml.loadstring(text), 3)
+        compact = cluster.representativeMembers(
+            pycxml.loadstring(text, compact=True), 3)
+        self.assertEqual(list(compact['member']), list(expected['member']))
+
+    def testEmptyMemberWeights(self):
+        ens = pycxml.loadstring(ensembleXML(nmembers=4))
+        ens[1] = ens[1].iloc[:0]
+        for weights in ([.1, .2, .3, .4],
+                        pd.Series([.4, .3, .1], index=[3, 2, 0])):
+            reps = cluster.representativeMembers(ens, 3, weights=weights)
+            self.assertEqual(list(reps['member']), [3, 2, 0])
+            assert_allclose(reps['weight'], [.5, .375, .125])
+        self.assertRaises(ValueError, cluster.representativeMembers, ens, 3,
+                          weights=[.1, .2, .3])
+
+    def testMethod(self):
+        ens = pycxml.loadstring(ensembleXML(nmembers=4))
+        self.assertRaises(ValueError, cluster.representativeMembers, ens, 2,
+                          method="spectral")
+
+
+if __name__ == '__main__':
+    unittest.main()
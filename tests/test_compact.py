@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import pycxml
+from compact import CompactEnsemble, COMPACT_FIELDS
+from make_cxml import ensembleXML
+
+
+class TestCompactEnsemble(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        cls.xmlfile = os.path.join(cls.tmpdir.name, "ensemble.xml")
+        with open(cls.xmlfile, 'w') as fh:
+            fh.write(ensembleXML(nmembers=51, rmax=None))
+        cls.frames = pycxml.loadfile(cls.xmlfile)
+        cls.ensemble = pycxml.loadfile(cls.xmlfile, compact=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmpdir.cleanup()
+
+    def testShape(self):
+        self.assertIsInstance(self.ensemble, CompactEnsemble)
+        self.assertEqual(self.ensemble.data.shape,
+                         (51, 21, len(COMPACT_FIELDS)))
+        self.assertEqual(self.ensemble.data.dtype, np.float32)
+        self.assertEqual(self.ensemble.members.dtype, np.int16)
+        np.testing.assert_array_equal(self.ensemble.leadtime,
+                                      np.arange(0, 126, 6))
+
+    def testValuesMatchFrames(self):
+        for field in ["latitude", "longitude", "pcentre", "windspeed",
+                      "R34NEQ"]:
+            expected = np.array([df[field].astype(float).values
+                                 for df in self.frames])
+            np.testing.assert_allclose(self.ensemble.field(field),
+                                       expected, rtol=1e-6)
+
+    def testMissingIsNaN(self):
+        self.assertTrue(np.isnan(self.ensemble.field('rmax')).all())
+        self.assertEqual(self.ensemble.attrs['missing']['rmax']['count'],
+                         51 * 21)
+
+    def testViewsShareMemory(self):
+        df = self.ensemble.to_dataframe()
+        self.assertEqual(len(df), 51 * 21)
+        self.assertTrue(np.shares_memory(df.to_numpy(), self.ensemble.data))
+        member = self.ensemble.member(3)
+        self.assertTrue(np.shares_memory(member.to_numpy(),
+                                         self.ensemble.data))
+
+    def testMemoryFootprint(self):
+        objbytes = sum(df.memory_usage(deep=True).sum()
+                       for df in self.frames)
+        self.assertLess(self.ensemble.nbytes, 0.1 * objbytes)
+
+
+if __name__ == '__main__':
+    unittest.main()
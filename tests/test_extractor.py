@@ -0,0 +1,132 @@
+import os
+import unittest
+import xml.etree.ElementTree as ET
+
+import numpy as np
+from numpy.testing import assert_allclose
+
+import pycxml
+import extractor
+from make_cxml import forecastXML
+
+TEST_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'test_data')
+
+NIL_FIX = """
+<fix hour="12" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+    <validTime>2021-01-01T12:00:00Z</validTime>
+    <latitude units="deg S">12.0</latitude>
+    <longitude units="deg E">120.0</longitude>
+    <cycloneData>
+        <category xsi:nil="true"/>
+        <minimumPressure>
+            <pressure units="mb">985</pressure>
+        </minimumPressure>
+    </cycloneData>
+    <cycloneData>
+        <category>3</category>
+        <minimumPressure>
+            <pressure units="hPa">970</pressure>
+        </minimumPressure>
+    </cycloneData>
+</fix>"""
+
+
+class TestExtractorTable(unittest.TestCase):
+
+    def setUp(self):
+        self.fields = {f.name: f for f in extractor.extractorTable()}
+
+    def testFields(self):
+        diameter = self.fields['eye.diameter']
+        self.assertEqual(diameter.path, ('cycloneData', 'eye', 'diameter'))
+        self.assertEqual(diameter.dtype, "float")
+        self.assertEqual(diameter.units, "lengthType")
+        self.assertTrue(diameter.nillable)
+        self.assertEqual(self.fields['category'].dtype, "int")
+        self.assertEqual(self.fields['Dvorak.finalTnumber'].dtype, "str")
+        self.assertEqual(self.fields['validTime'].dtype, "datetime")
+        self.assertEqual(self.fields['eye@source'].attribute, "source")
+        self.assertIn('Dvorak.changePeriod@units', self.fields)
+        self.assertNotIn('eye.diameter@units', self.fields)
+
+    def testContoursExcluded(self):
+        self.assertIn('windContours@source', self.fields)
+        self.assertFalse(any(name.startswith('windContours.')
+                             for name in self.fields))
+
+    def testUnknownField(self):
+        self.assertRaises(ValueError, extractor.selectFields,
+                          ['eye.diameter', 'eye.colour'])
+
+
+class TestExtractFixes(unittest.TestCase):
+
+    def setUp(self):
+        tree = ET.parse(os.path.join(TEST_DATA, 'CXML_example.xml'))
+        self.fixes = tree.getroot().findall('.//fix')
+
+    def testAllFields(self):
+        df = extractor.extractFixes(self.fixes)
+        self.assertEqual(len(df), len(self.fixes))
+        self.assertEqual(len(df.columns), len(extractor.extractorTable()))
+        first = df.iloc[0]
+        self.assertEqual(first['Dvorak.finalTnumber'], "3.0")
+        self.assertEqual(first['eye.shape'], "circular")
+        self.assertEqual(first['eye@source'], "satellite")
+        self.assertEqual(first['category'], 2)
+        self.assertEqual(first['minimumPressure.pressure@precision'], 1.)
+        self.assertEqual(first['Dvorak.changePeriod@units'], "h")
+        # m/s converted to km/h, with its precision
+        assert_allclose(first['maximumWind.speed'], 179.28)
+        assert_allclose(first['maximumWind.speed@precision'], 0.72)
+        self.assertEqual(df['systemDepth'].iloc[1], "medium")
+        self.assertTrue(df['biasCorrected'].iloc[1])
+
+    def testSelectedFields(self):
+        fields = ['eye.diameter', 'development']
+        df = extractor.extractFixes(self.fixes, fields)
+        self.assertEqual(list(df.columns), fields)
+        self.assertEqual(df['eye.diameter'].iloc[0], 35.)
+        self.assertTrue(np.isnan(df['eye.diameter'].iloc[1]))
+
+    def testNilAndRepeated(self):
+        df = extractor.extractFixes([ET.fromstring(NIL_FIX)],
+                                    ['category', 'minimumPressure.pressure'])
+        # The first cycloneData is used, and "mb" is read as hPa
+        self.assertEqual(df['minimumPressure.pressure'].iloc[0], 985.)
+        self.assertEqual(df['category'].iloc[0], 3)
+
+    def testUnitAliases(self):
+        fix = ET.fromstring(
+            '<fix><cycloneData><eye><diameter units="ft">32808.4</diameter>'
+            '</eye><maximumWind><speed units="km h-1">100</speed>'
+            '</maximumWind></cycloneData></fix>')
+        df = extractor.extractFixes([fix], ['eye.diameter',
+                                            'maximumWind.speed'])
+        assert_allclose(df['eye.diameter'].iloc[0], 10., rtol=1e-5)
+        self.assertEqual(df['maximumWind.speed'].iloc[0], 100.)
+
+
+class TestLoadFields(unittest.TestCase):
+
+    def testLoadString(self):
+        fields = ['maximumWind.speed', 'maximumWind@source']
+        df = pycxml.loadstring(forecastXML(), fields=fields)
+        self.assertEqual(list(df.columns),
+                         pycxml.FORECAST_COLUMNS + pycxml.RADII_COLUMNS +
+                         fields)
+        assert_allclose(df['maximumWind.speed'],
+                        df['windspeed'].astype(float))
+        self.assertTrue(df['maximumWind@source'].isna().all())
+
+    def testAllFieldsUnique(self):
+        df = pycxml.loadfile(os.path.join(TEST_DATA, 'forecast.xml'),
+                             fields='all')
+        self.assertTrue(df.columns.is_unique)
+        # The parsed position keeps its hemisphere
+        self.assertTrue((df['latitude'].astype(float) < 0).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
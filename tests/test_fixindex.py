@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from fixindex import FixIndex, EARTH_RADIUS
+
+
+def haversine(lon1, lat1, lon2, lat2):
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = (np.sin((lat2 - lat1) / 2.) ** 2 +
+         np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2.) ** 2)
+    return 2. * EARTH_RADIUS * np.arcsin(np.sqrt(a))
+
+
+class TestFixIndex(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(42)
+        n = 2000
+        base = datetime(2021, 1, 1)
+        self.frames = [pd.DataFrame({
+            'disturbance': "TEST01",
+            'member': m,
+            'validtime': [base + timedelta(hours=int(h))
+                          for h in rng.integers(0, 240, n // 10)],
+            'latitude': rng.uniform(-40, 0, n // 10),
+            'longitude': rng.uniform(-20, 20, n // 10) % 360,
+        }) for m in range(10)]
+        self.index = FixIndex(self.frames)
+        self.fixes = pd.concat(self.frames, ignore_index=True)
+
+    def testRadius(self):
+        rows = self.index.withinRadius(0., -20., 500.)
+        dist = haversine(0., -20., self.fixes['longitude'].values,
+                         self.fixes['latitude'].values)
+        np.testing.assert_array_equal(rows, np.flatnonzero(dist <= 500.))
+        self.assertGreater(len(rows), 0)
+
+    def testBoxAcrossMeridian(self):
+        start, end = datetime(2021, 1, 3), datetime(2021, 1, 6)
+        rows = self.index.withinBox(355., 5., -30., -10., start, end)
+        lon = self.fixes['longitude'].values
+        lat = self.fixes['latitude'].values
+        vt = self.fixes['validtime']
+        expected = np.flatnonzero(((lon >= 355.) | (lon <= 5.)) &
+                                  (lat >= -30.) & (lat <= -10.) &
+                                  (vt >= start).values & (vt <= end).values)
+        np.testing.assert_array_equal(rows, expected)
+        members = self.index.tracks(rows)['member']
+        self.assertEqual(sorted(members), list(range(10)))
+
+    def testTimeWindow(self):
+        start, end = datetime(2021, 1, 2), datetime(2021, 1, 2, 12)
+        rows = self.index.timeWindow(start, end)
+        vt = self.fixes['validtime']
+        expected = np.flatnonzero((vt >= start) & (vt <= end))
+        np.testing.assert_array_equal(rows, expected)
+
+    def testSaveLoad(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "fixes.idx")
+            self.index.save(path)
+            index = FixIndex.load(path)
+        np.testing.assert_array_equal(
+            index.withinRadius(0., -20., 300.),
+            self.index.withinRadius(0., -20., 300.))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+
+import ingest
+from make_cxml import forecastXML
+
+
+class TestIngest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.spool = os.path.join(self.tmpdir.name, "spool")
+        self.store = os.path.join(self.tmpdir.name, "store")
+        os.makedirs(self.spool)
+        for n in range(3):
+            self.write(f"bulletin{n}.xml", forecastXML(distId=f"TEST0{n}"))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.spool, name)
+        with open(path, 'w') as fh:
+            fh.write(text)
+        return path
+
+    def testIncremental(self):
+        first = ingest.ingest(self.spool, self.store, workers=2, settle=0)
+        self.assertEqual(len(first), 3)
+        self.assertEqual(ingest.ingest(self.spool, self.store, settle=0), [])
+
+        new = self.write("bulletin3.xml", forecastXML(distId="TEST03"))
+        self.assertEqual(ingest.ingest(self.spool, self.store, settle=0),
+                         [new])
+
+        results = dict(ingest.readStore(self.store))
+        self.assertEqual(len(results), 4)
+        self.assertEqual(results[os.path.abspath(new)]['disturbance'][0],
+                         "TEST03")
+
+    def testTouchedFileNotReparsed(self):
+        ingest.ingest(self.spool, self.store, settle=0)
+        path = os.path.join(self.spool, "bulletin0.xml")
+        stat = os.stat(path)
+        os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+        self.assertEqual(ingest.ingest(self.spool, self.store, settle=0), [])
+
+    def testChangedFileReparsed(self):
+        ingest.ingest(self.spool, self.store, settle=0)
+        path = self.write("bulletin0.xml", forecastXML(distId="TEST09"))
+        self.assertEqual(ingest.ingest(self.spool, self.store, settle=0),
+                         [path])
+
+    def testStoreDoesNotGrow(self):
+        ingest.ingest(self.spool, self.store, settle=0)
+        # A copy shares its result with the original
+        self.write("copy.xml", forecastXML(distId="TEST00"))
+        ingest.ingest(self.spool, self.store, settle=0)
+        self.assertEqual(len(self.stored()), 3)
+
+        self.write("bulletin0.xml", forecastXML(distId="TEST09"))
+        ingest.ingest(self.spool, self.store, settle=0)
+        self.assertEqual(len(self.stored()), 4)
+        os.remove(os.path.join(self.spool, "copy.xml"))
+        os.remove(os.path.join(self.spool, "bulletin1.xml"))
+        ingest.ingest(self.spool, self.store, settle=0)
+        self.assertEqual(len(self.stored()), 2)
+        results = dict(ingest.readStore(self.store))
+        self.assertEqual(sorted(r['disturbance'][0] for r in
+                                results.values()), ["TEST02", "TEST09"])
+
+    def stored(self):
+        return [n for n in os.listdir(self.store) if n.endswith(".pkl")]
+
+    def testBadFileRecorded(self):
+        bad = self.write("bad.xml", "<cxml><header></cxml>")
+        ingest.ingest(self.spool, self.store, settle=0)
+        manifest = ingest.Manifest(os.path.join(self.store,
+                                                ingest.MANIFEST))
+        self.assertIsNotNone(manifest.entries[os.path.abspath(bad)]['error'])
+        self.assertEqual(ingest.ingest(self.spool, self.store, settle=0), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from interpolate import interpolateTracks
+
+
+def makeTrack(hours, lons, lats, member=None, distId="TEST01"):
+    base = datetime(2021, 1, 1)
+    df = pd.DataFrame({
+        'disturbance': distId,
+        'validtime': [base + timedelta(hours=h) for h in hours],
+        'latitude': lats,
+        'longitude': lons,
+        'pcentre': [1000. - h for h in hours],
+        'windspeed': [50. + h for h in hours],
+        'rmax': np.nan,
+    })
+    if member is not None:
+        df.insert(1, 'member', member)
+    return df
+
+
+class TestInterpolateTracks(unittest.TestCase):
+
+    def setUp(self):
+        self.hours = [0, 6, 12, 24, 48]
+        self.forecast = makeTrack(self.hours, [120., 120.5, 121., 122., 124.],
+                                  [-12., -12.5, -13., -14., -16.])
+        self.ensemble = [makeTrack(self.hours[:3 + m % 3],
+                                   [120. + 0.1 * m] * (3 + m % 3),
+                                   [-12.] * (3 + m % 3), member=m)
+                         for m in range(10)]
+
+    def testHourlySteps(self):
+        result = interpolateTracks(self.forecast, "1h")
+        self.assertEqual(len(result), 49)
+        steps = np.diff(result['validtime'].values)
+        self.assertTrue((steps == np.timedelta64(1, 'h')).all())
+
+    def testFixesPreserved(self):
+        result = interpolateTracks(self.forecast, "1h").set_index(
+            'validtime')
+        for _, row in self.forecast.iterrows():
+            out = result.loc[row['validtime']]
+            self.assertAlmostEqual(out['latitude'], row['latitude'])
+            self.assertAlmostEqual(out['longitude'], row['longitude'])
+            self.assertAlmostEqual(out['pcentre'], row['pcentre'])
+
+    def testLinearFields(self):
+        result = interpolateTracks(self.forecast, "1h")
+        hours = (result['validtime'] - result['validtime'].iloc[0]) \
+            / pd.Timedelta("1h")
+        np.testing.assert_allclose(result['pcentre'], 1000. - hours)
+        self.assertTrue(result['rmax'].isna().all())
+
+    def testCubicFields(self):
+        result = interpolateTracks(self.forecast, "30min", method="cubic")
+        hours = (result['validtime'] - result['validtime'].iloc[0]) \
+            / pd.Timedelta("1h")
+        np.testing.assert_allclose(result['windspeed'], 50. + hours)
+
+    def testDateline(self):
+        track = makeTrack([0, 6], [359.5, 0.5], [-10., -10.])
+        result = interpolateTracks(track, "3h")
+        self.assertAlmostEqual(result['longitude'].iloc[1], 0., places=6)
+        self.assertTrue(((result['longitude'] >= 0) &
+                         (result['longitude'] < 360)).all())
+
+    def testEnsembleStructure(self):
+        result = interpolateTracks(self.ensemble, "1h")
+        self.assertEqual(len(result), len(self.ensemble))
+        for m, (inp, out) in enumerate(zip(self.ensemble, result)):
+            self.assertTrue((out['member'] == m).all())
+            self.assertEqual(out['validtime'].iloc[-1],
+                             inp['validtime'].iloc[-1])
+            np.testing.assert_allclose(out['longitude'], 120. + 0.1 * m)
+
+    def testBadMethod(self):
+        self.assertRaises(ValueError, interpolateTracks, self.forecast,
+                          "1h", "quadratic")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import os
+import json
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+from numpy.testing import assert_allclose
+
+import pycxml
+import landfall
+from make_cxml import ensembleXML, forecastXML
+
+# Land south of 20S, between 110E and 140E (anticlockwise when seen from
+# above, with a clockwise hole that should be reoriented)
+LAND = {"type": "FeatureCollection", "features": [
+    {"type": "Feature", "properties": {},
+     "geometry": {"type": "Polygon", "coordinates": [
+         [[110., -20.], [110., -40.], [140., -40.], [140., -20.],
+          [110., -20.]],
+         [[111., -38.], [112., -38.], [112., -39.], [111., -39.],
+          [111., -38.]]]}}]}
+
+
+class TestLandfall(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmpdir.name, "land.geojson")
+        with open(path, 'w') as fh:
+            json.dump(LAND, fh)
+        self.coast = landfall.loadCoast(path)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def testCoastline(self):
+        # Edges are split to at most 50 km, and every segment has edges
+        length, _ = landfall.distanceBearing(self.coast.x0, self.coast.y0,
+                                             self.coast.x1, self.coast.y1)
+        self.assertLess(length.max(), 1.01 * landfall.SEGMENT_LENGTH)
+        segments = self.coast.segments()
+        self.assertEqual(list(np.unique(self.coast.segment)),
+                         list(segments['segment']))
+        self.assertFalse(segments['latitude'].isna().any())
+
+    def testEnsemble(self):
+        tracks = pycxml.loadstring(ensembleXML(nmembers=4))
+        df = landfall.landfalls(tracks, self.coast)
+        self.assertEqual(list(df.columns), landfall.LANDFALL_COLUMNS)
+        self.assertEqual(list(df['member']), [0, 1, 2, 3])
+        self.assertTrue((df['landfall'] == 0).all())
+        assert_allclose(df['latitude'], -20.)
+        # Member m reaches 20S at 80 - 0.1 m hours
+        hours = (df['validtime'] - pd.Timestamp(2021, 1, 1)) / \
+            pd.Timedelta(hours=1)
+        assert_allclose(hours, 80. - 0.1 * np.arange(4), atol=0.01)
+        assert_allclose(df['longitude'],
+                        124. - 0.015 * np.arange(4), atol=1e-3)
+        assert_allclose(df['windspeed'], 3.6 * (30. + 0.1 * hours),
+                        rtol=1e-3)
+
+        prob = landfall.landfallProbability(df, 8, self.coast)
+        self.assertEqual(list(prob.columns), landfall.PROBABILITY_COLUMNS)
+        assert_allclose(prob['probability'].sum(), 0.5)
+        assert_allclose(prob['latitude'], -20.)
+
+    def testNoLandfall(self):
+        # A track that leaves land (northwards) makes no landfall
+        df = pycxml.loadstring(forecastXML(lat0=30.))
+        self.assertEqual(len(landfall.landfalls(df, self.coast)), 0)
+
+    def testAcrossZero(self):
+        # Land from 10W to 10E, and a track crossing 0E on its way to it
+        rings = [(np.array([-10., -10., 10., 10.]),
+                  np.array([-20., -40., -40., -20.]), True)]
+        coast = landfall.Coastline(rings)
+        self.assertLess(coast.halfLength, 0.5)
+        df = pycxml.loadstring(forecastXML(lon0=-2.))
+        self.assertGreater(df['longitude'].iloc[0], 300.)
+        result = landfall.landfalls(df, coast)
+        self.assertEqual(len(result), 1)
+        assert_allclose(result['latitude'], -20.)
+        assert_allclose(result['longitude'], 2., atol=1e-3)
+        segments = coast.segments()
+        self.assertTrue(((segments['longitude'] >= 0.) &
+                         (segments['longitude'] < 360.)).all())
+
+    def testLandMask(self):
+        lon = np.arange(100., 150.5, 0.5)
+        lat = np.arange(-40., 0.5, 0.5)
+        mask = np.broadcast_to(lat[:, None] < -20.1, (len(lat), len(lon)))
+        path = os.path.join(self.tmpdir.name, "mask.npz")
+        np.savez(path, lon=lon, lat=lat, mask=mask)
+        coast = landfall.loadCoast(path)
+        tracks = pycxml.loadstring(ensembleXML(nmembers=3))
+        df = landfall.landfalls(tracks, coast)
+        self.assertEqual(list(df['member']), [0, 1, 2])
+        assert_allclose(df['latitude'], -20.4, atol=0.11)
+        prob = landfall.landfallProbability(df, 3, coast)
+        assert_allclose(prob['probability'].sum(), 1.)
+
+    def testLandMaskOffGrid(self):
+        # The tracks pass west of the grid, so never reach its land
+        lon = np.arange(130., 150.5, 0.5)
+        lat = np.arange(-40., 0.5, 0.5)
+        mask = np.broadcast_to(lat[:, None] < -20.1, (len(lat), len(lon)))
+        coast = landfall.LandMask(lon, lat, mask)
+        tracks = pycxml.loadstring(ensembleXML(nmembers=3))
+        self.assertEqual(len(landfall.landfalls(tracks, coast)), 0)
+
+        # A grid across 0E, given in -180..180
+        lon = np.arange(-10., 10.5, 0.5)
+        coast = landfall.LandMask(lon, lat, np.ones((len(lat), len(lon))))
+        i, j, inside = coast._cell(np.array([359.9, 0.1, 9.9, 11., 20.]),
+                                   np.array([-1., -1., -40.2, -1., -1.]))
+        assert_allclose(np.mod(coast.lon[j[:3]], 360.), [0., 0., 10.])
+        self.assertEqual(list(inside), [True, True, True, False, False])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+import pycxml
+import merge
+from make_cxml import forecastXML, ensembleXML, BASETIME
+
+
+class TestMerge(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # A forecast, an amended reissue of it with a different track, and
+        # the next forecast 12 hours later, overlapping in validtime
+        cls.first = pycxml.loadstring(forecastXML())
+        cls.amended = pycxml.loadstring(forecastXML(
+            lat0=13., creationtime=BASETIME + timedelta(hours=5)))
+        cls.next = pycxml.loadstring(forecastXML(
+            basetime=BASETIME + timedelta(hours=12), lat0=14.))
+        cls.ensemble = pycxml.loadstring(ensembleXML(nmembers=2))
+
+    def testHeaderAttributes(self):
+        self.assertEqual(self.first.attrs['centre'], "TEST CENTRE")
+        self.assertEqual(self.first.attrs['basetime'], BASETIME)
+        self.assertEqual(self.amended.attrs['creationtime'],
+                         datetime(2021, 1, 1, 5))
+
+    def testMergeReissued(self):
+        fixes = merge.mergeResults([self.next, self.amended, self.first])
+        self.assertEqual(len(fixes), 42)
+        first = fixes[fixes['basetime'] == BASETIME]
+        self.assertTrue((first['creationtime'] ==
+                         datetime(2021, 1, 1, 5)).all())
+        self.assertAlmostEqual(first['latitude'].iloc[0], -13.)
+        self.assertTrue(first['validtime'].is_monotonic_increasing)
+
+    def testEnsembleMembers(self):
+        fixes = merge.mergeResults({'a': self.ensemble, 'b': self.ensemble,
+                                    'c': self.first})
+        self.assertEqual(len(fixes), 3 * 21)
+        self.assertEqual(fixes['member'].isna().sum(), 21)
+
+    def testStormHistory(self):
+        fixes = merge.mergeResults([self.first, self.next])
+        history = merge.stormHistory(fixes)
+        self.assertEqual(len(history), 23)
+        self.assertTrue(history['validtime'].is_unique)
+        latest = history['basetime'] == BASETIME + timedelta(hours=12)
+        self.assertEqual(latest.sum(), 21)
+        self.assertEqual(history['validtime'].iloc[0], BASETIME)
+
+    def testDeduplicateLargeFrame(self):
+        n = 200000
+        rng = np.random.default_rng(1)
+        df = pd.DataFrame({'disturbance': rng.integers(0, 50, n),
+                           'validtime': rng.integers(0, 100, n),
+                           'creationtime': pd.to_datetime(
+                               rng.integers(0, 10 ** 9, n), unit='s')})
+        result = merge.deduplicate(df, ['disturbance', 'validtime'])
+        expected = df.loc[df.groupby(['disturbance', 'validtime'])
+                          ['creationtime'].idxmax()]
+        self.assertEqual(len(result), len(expected))
+        self.assertEqual(sorted(result['creationtime']),
+                         sorted(expected['creationtime']))
+
+
+if __name__ == '__main__':
+    unittest.main()
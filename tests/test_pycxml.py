@@ -1,5 +1,8 @@
 
 import os
+import sys
+import tempfile
+import subprocess
 import unittest
 from datetime import datetime, timedelta
 import pycxml
@@ -7,6 +10,8 @@ import pandas as pd
 from pandas.testing import assert_series_equal
 import xml.etree.ElementTree as ET
 
+from make_cxml import forecastXML
+
 """
 With most of these tests, we do *not* test malformed XML elements, as they
 should be captured by the validation steps.
@@ -199,13 +204,14 @@ class TestWindContours(unittest.TestCase):
             </windContours>
             </cycloneData>
             </fix>""")
+        # Radii are converted from nautical miles to km
         windradii = {
-            'R34NEQ': 70.,
-            'R34SEQ': 70.,
-            'R34SWQ': 60.,
-            'R34NWQ': 50.,
-            'R48NEQ': 20.,
-            'R48SEQ': 20,
+            'R34NEQ': 129.64,
+            'R34SEQ': 129.64,
+            'R34SWQ': 111.12,
+            'R34NWQ': 92.6,
+            'R48NEQ': 37.04,
+            'R48SEQ': 37.04,
         }
         self.windradii = pd.Series(windradii,
                                    index=pycxml.RADII_COLUMNS)
@@ -314,6 +320,177 @@ class TestLoadfile(unittest.TestCase):
         self.assertRaises(IOError, pycxml.loadfile, "badxml.xml")
 
 
+class TestMissingFields(unittest.TestCase):
+
+    def setUp(self):
+        fixes = "".join(f"""
+            <fix hour="{h}">
+                <validTime>2021-01-01T{h:02d}:00:00Z</validTime>
+                <latitude units="deg S">15.0</latitude>
+                <longitude units="deg E">120.0</longitude>
+                <cycloneData>
+                    <minimumPressure>
+                        <pressure units="hPa">990</pressure>
+                    </minimumPressure>
+                </cycloneData>
+            </fix>""" for h in range(0, 24, 6))
+        self.forecast = ET.fromstring(f"""<?xml version="1.0"?>
+        <data type="forecast">
+            <disturbance ID="TEST01">{fixes}</disturbance>
+        </data>""")
+
+    def testMissingSummary(self):
+        missing = {}
+        pycxml.parseForecast(self.forecast, missing)
+        self.assertEqual(set(missing.keys()), {'windspeed', 'rmax', 'poci'})
+        self.assertEqual(missing['rmax']['count'], 4)
+        self.assertEqual(missing['rmax']['fixes'][0],
+                         "TEST01@2021-01-01T00:00:00Z")
+
+    def testSampleLimit(self):
+        missing = {}
+        for n in range(2 * pycxml.MISSING_SAMPLES):
+            pycxml.recordMissing(missing, 'rmax', str(n))
+        self.assertEqual(missing['rmax']['count'],
+                         2 * pycxml.MISSING_SAMPLES)
+        self.assertEqual(len(missing['rmax']['fixes']),
+                         pycxml.MISSING_SAMPLES)
+
+    def testLazyIdentifier(self):
+        # Identifiers given as functions are only built if they are kept
+        missing, calls = {}, []
+        for n in range(2 * pycxml.MISSING_SAMPLES):
+            pycxml.recordMissing(missing, 'rmax',
+                                 lambda n=n: calls.append(n) or str(n))
+        self.assertEqual(calls, list(range(pycxml.MISSING_SAMPLES)))
+        self.assertEqual(missing['rmax']['fixes'][-1],
+                         str(pycxml.MISSING_SAMPLES - 1))
+
+    def testNoWarnings(self):
+        with self.assertNoLogs(level='WARNING'):
+            pycxml.parseForecast(self.forecast, {})
+
+
+class TestLenient(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        text = forecastXML()
+        # Corrupt the validTime of one fix and drop the units of another
+        text = text.replace("2021-01-01T06:00:00Z", "2021-01-01T06:00",
+                            1).replace('<pressure units="hPa">988.8',
+                                       '<pressure>988.8', 1)
+        self.bad = self.write("bad.xml", text)
+        self.good = self.write("good.xml", forecastXML())
+        self.broken = self.write("broken.xml",
+                                 forecastXML()[:1000] + "<fix></data>")
+        self.garbage = self.write("garbage.xml", "not a CXML file")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, 'w') as fh:
+            fh.write(text)
+        return path
+
+    def testStrict(self):
+        self.assertRaises(ValueError, pycxml.loadfile, self.bad)
+
+    def testSkipsBadFixes(self):
+        df = pycxml.loadfile(self.bad, lenient=True)
+        self.assertEqual(len(df), 19)
+        errors = df.attrs['errors']
+        self.assertEqual([e['level'] for e in errors], ['fix', 'fix'])
+        self.assertTrue(errors[0]['location'].endswith("2021-01-01T06:00"))
+
+    def testStructuralErrors(self):
+        notype = self.write("notype.xml", forecastXML().replace(
+            '<data type="forecast">', '<data>'))
+        noheader = self.write("noheader.xml", "<cxml><data/></cxml>")
+        self.assertRaises(KeyError, pycxml.loadfile, notype)
+        self.assertRaises(ValueError, pycxml.loadfile, noheader)
+        for check in (False, True):
+            results, errors = pycxml.loadfiles([notype, noheader],
+                                               check=check)
+            self.assertEqual(list(results), [notype, noheader])
+            self.assertIsNone(results[notype])
+            levels = errors.groupby('file')['level'].apply(set)
+            self.assertIn('data', levels[notype])
+            self.assertIn('file', levels[noheader])
+
+    def testLoadFiles(self):
+        missing = os.path.join(self.tmpdir.name, "missing.xml")
+        results, errors = pycxml.loadfiles([missing, self.garbage,
+                                            self.broken, self.bad,
+                                            self.good])
+        self.assertEqual(list(results), [self.broken, self.bad, self.good])
+        self.assertEqual(list(errors.columns), pycxml.ERROR_COLUMNS)
+        levels = errors.groupby('file')['level'].agg(set)
+        self.assertEqual(levels[missing], {'file'})
+        self.assertIn('file', levels[self.garbage])
+        self.assertIn('xml', levels[self.broken])
+        self.assertEqual(levels[self.bad], {'fix'})
+        self.assertNotIn(self.good, levels)
+        self.assertRaises(IOError, pycxml.loadfiles, [missing],
+                          lenient=False)
+
+
+class TestLoadHeader(unittest.TestCase):
+
+    def setUp(self):
+        self.xmlfile = "./tests/test_data/forecast.xml"
+
+    def testLoadHeader(self):
+        header = pycxml.loadheader(self.xmlfile)
+        self.assertEqual(header['basetime'], datetime(2021, 1, 1))
+        self.assertEqual(header['centre'], "TEST CENTRE")
+        self.assertIsNone(header['members'])
+
+    def test_missingfile(self):
+        self.assertRaises(IOError, pycxml.loadheader, "badxml.xml")
+
+
+class TestImportTime(unittest.TestCase):
+    """
+    Header-only and validation-only calls must not import pandas or numpy.
+    """
+
+    def importedModules(self, script):
+        root = os.path.dirname(os.path.abspath(pycxml.__file__))
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c",
+                               script], cwd=root, capture_output=True,
+                              text=True, check=True)
+        return {line.split("|")[-1].strip()
+                for line in proc.stderr.splitlines()
+                if line.startswith("import time:")}
+
+    def testImport(self):
+        modules = self.importedModules("import pycxml")
+        self.assertIn("pycxml", modules)
+        for heavy in ("numpy", "pandas", "lxml"):
+            self.assertNotIn(heavy, modules)
+
+    def testHeaderOnly(self):
+        modules = self.importedModules(
+            "import pycxml; "
+            "pycxml.loadheader('tests/test_data/forecast.xml')")
+        for heavy in ("numpy", "pandas", "lxml"):
+            self.assertNotIn(heavy, modules)
+
+    def testValidationOnly(self):
+        modules = self.importedModules(
+            "import pycxml\n"
+            "try:\n"
+            "    pycxml.validate('tests/test_data/forecast.xml')\n"
+            "except AssertionError:\n"
+            "    pass")
+        self.assertIn("lxml", modules)
+        self.assertNotIn("pandas", modules)
+        self.assertNotIn("numpy", modules)
+
+
 class TestGetHeaderCenter(unittest.TestCase):
 
     def setUp(self):
@@ -0,0 +1,184 @@
+import os
+import json
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import server
+from make_cxml import ensembleXML, forecastXML
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def testEviction(self):
+        cache = server.LRUCache(2)
+        calls = []
+
+        def load(key):
+            return lambda: calls.append(key) or key
+
+        for key in ('a', 'b', 'a', 'c', 'b'):
+            cache.get(key, load(key))
+        # 'b' was evicted when 'c' was added, as 'a' had been used since
+        self.assertEqual(calls, ['a', 'b', 'c', 'b'])
+        self.assertEqual(list(cache.items), ['c', 'b'])
+        self.assertEqual(cache.stats()['hits'], 1)
+
+    def testConcurrentLoad(self):
+        cache = server.LRUCache(4)
+        calls = []
+        release = threading.Event()
+
+        def load():
+            calls.append(1)
+            release.wait()
+            return 42
+
+        threads = [threading.Thread(target=cache.get, args=('k', load))
+                   for _ in range(4)]
+        for t in threads:
+            t.start()
+        release.set()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(calls), 1)
+
+
+class TestParseQuery(unittest.TestCase):
+
+    def testParse(self):
+        params = server.parseQuery("member=3,1&bbox=350,-30,10,0"
+                                   "&start=2021-01-02T00:00:00Z")
+        self.assertEqual(params['member'], (1, 3))
+        self.assertEqual(params['bbox'], (350., -30., 10., 0.))
+        self.assertEqual(params['start'], pd.Timestamp(2021, 1, 2))
+        self.assertEqual(params['format'], 'json')
+
+    def testInvalid(self):
+        for query in ("colour=red", "member=a", "bbox=1,2,3",
+                      "start=yesterday", "format=xml"):
+            self.assertRaises(ValueError, server.parseQuery, query)
+
+
+class TestArchive(unittest.TestCase):
+
+    def testModified(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "forecast.xml")
+            with open(path, 'w') as fh:
+                fh.write(forecastXML())
+            store = server.Archive([path], interval=0)
+            self.assertEqual(len(json.loads(store.respond({}))), 21)
+            with open(path, 'w') as fh:
+                fh.write(forecastXML(hours=range(0, 66, 6)))
+            mtime = os.path.getmtime(path) + 10
+            os.utime(path, (mtime, mtime))
+            # The cached response is not used once the file has changed
+            self.assertEqual(len(json.loads(store.respond({}))), 11)
+
+    def testRemoved(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            paths = []
+            for name in ("a.xml", "b.xml"):
+                paths.append(os.path.join(tmpdir, name))
+                with open(paths[-1], 'w') as fh:
+                    fh.write(forecastXML())
+            store = server.Archive(paths, interval=0)
+            self.assertEqual(len(json.loads(store.respond({}))), 42)
+            os.remove(paths[1])
+            self.assertEqual(len(json.loads(store.respond({}))), 21)
+            self.assertEqual(len(store.headers()), 1)
+            # Removed before the index is next refreshed
+            store = server.Archive(paths[:1], interval=60.)
+            os.remove(paths[0])
+            self.assertEqual(json.loads(store.respond({})), [])
+
+
+class TestServer(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        paths = []
+        for name, text in (("ensemble.xml", ensembleXML(nmembers=3)),
+                           ("forecast.xml", forecastXML(
+                               basetime=datetime(2021, 1, 2),
+                               distId="2021010200_150S_1300E"))):
+            paths.append(os.path.join(cls.tmpdir.name, name))
+            with open(paths[-1], 'w') as fh:
+                fh.write(text)
+        cls.httpd = server.makeServer(server.Archive(paths), port=0)
+        cls.url = "http://%s:%d" % cls.httpd.server_address[:2]
+        cls.thread = threading.Thread(target=cls.httpd.serve_forever,
+                                      daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.httpd.shutdown()
+        cls.httpd.server_close()
+        cls.tmpdir.cleanup()
+
+    def get(self, path):
+        with urllib.request.urlopen(self.url + path) as response:
+            return json.loads(response.read())
+
+    def testIndex(self):
+        index = self.get("/index")
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index[0]['members'], 3)
+
+    def testQueries(self):
+        fixes = self.get("/fixes")
+        self.assertEqual(len(fixes), 4 * 21)
+        fixes = self.get("/fixes?basetime=2021-01-01&member=1,2")
+        self.assertEqual(sorted({f['member'] for f in fixes}), [1, 2])
+        self.assertEqual(len(fixes), 2 * 21)
+        fixes = self.get("/fixes?disturbance=2021010200_150S_1300E"
+                         "&start=2021-01-02T12:00:00&end=2021-01-03")
+        self.assertEqual([f['validtime'] for f in fixes],
+                         ["2021-01-02T12:00:00", "2021-01-02T18:00:00",
+                          "2021-01-03T00:00:00"])
+        self.assertTrue(all(f['member'] is None for f in fixes))
+        fixes = self.get("/fixes?bbox=121,-20,122,-10&member=0")
+        lon = np.array([f['longitude'] for f in fixes])
+        self.assertTrue(len(lon) and (lon >= 121).all() and
+                        (lon <= 122).all())
+
+    def testSelect(self):
+        store = self.httpd.archive
+        entries = store.select(disturbance=("2021010200_150S_1300E",))
+        self.assertEqual([os.path.basename(e['source']) for e in entries],
+                         ["forecast.xml"])
+        entries = store.select(start=pd.Timestamp(2021, 1, 6, 6))
+        self.assertEqual([os.path.basename(e['source']) for e in entries],
+                         ["forecast.xml"])
+        self.assertEqual(len(store.select(end=pd.Timestamp(2021, 1, 1))), 1)
+        self.assertEqual(store.index[0]['last'], datetime(2021, 1, 6))
+
+    def testCache(self):
+        before = self.get("/stats")['queries']
+        first = self.get("/fixes?member=2")
+        second = self.get("/fixes?member=2")
+        self.assertEqual(first, second)
+        after = self.get("/stats")['queries']
+        self.assertEqual(after['hits'] - before['hits'], 1)
+        self.assertLessEqual(self.get("/stats")['files']['misses'], 2)
+
+    def testErrors(self):
+        with self.assertRaises(urllib.error.HTTPError) as cm:
+            self.get("/fixes?member=x")
+        self.assertEqual(cm.exception.code, 400)
+        with self.assertRaises(urllib.error.HTTPError) as cm:
+            self.get("/tracks")
+        self.assertEqual(cm.exception.code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import tempfile
+import unittest
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+from numpy.testing import assert_allclose
+
+import pycxml
+import sharedframes
+from make_cxml import forecastXML, ensembleXML
+
+
+def isShared(arr):
+    while arr is not None:
+        if isinstance(arr, sharedframes.SharedArray):
+            return True
+        arr = arr.base
+    return False
+
+
+class TestSharedFrames(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.forecast = self.write("forecast.xml", forecastXML())
+        self.ensemble = self.write("ensemble.xml", ensembleXML(nmembers=4))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, 'w') as fh:
+            fh.write(text)
+        return path
+
+    def testRoundTrip(self):
+        df = pycxml.loadfile(self.forecast)
+        desc = sharedframes.toShared(df)
+        shared = sharedframes.fromShared(desc)
+        # The block is unlinked once it has been mapped
+        self.assertRaises(FileNotFoundError, shared_memory.SharedMemory,
+                          name=desc['name'])
+        self.assertTrue(isShared(shared['pcentre'].to_numpy()))
+        assert_allclose(shared['pcentre'], df['pcentre'].astype(float))
+        self.assertEqual(list(shared['disturbance']),
+                         list(df['disturbance']))
+        self.assertEqual(shared['validtime'][0], pd.Timestamp(2021, 1, 1))
+        self.assertEqual(shared.attrs, df.attrs)
+
+    def testMissingText(self):
+        df = pd.DataFrame({'disturbance': ["A", None, "B"]})
+        shared = sharedframes.fromShared(sharedframes.toShared(df))
+        self.assertEqual(list(shared['disturbance'].isna()),
+                         [False, True, False])
+        self.assertEqual(list(shared['disturbance'].dropna()), ["A", "B"])
+
+    def testLoadFiles(self):
+        files = [self.forecast, self.ensemble, "missing.xml"]
+        results, errors = pycxml.loadfiles(files, workers=2)
+        self.assertEqual(list(results), files[:2])
+        self.assertEqual(list(errors['file']), ["missing.xml"])
+        members = results[self.ensemble]
+        self.assertEqual(len(members), 4)
+        self.assertEqual([m['member'][0] for m in members], [0, 1, 2, 3])
+        self.assertTrue(all(isShared(m['latitude'].to_numpy())
+                            for m in members))
+
+    def testCompact(self):
+        results, errors = pycxml.loadfiles([self.forecast, self.ensemble],
+                                           compact=True, workers=2)
+        ens = results[self.ensemble]
+        self.assertTrue(isShared(ens.data))
+        expected = pycxml.loadfile(self.ensemble, compact=True)
+        np.testing.assert_array_equal(ens.data, expected.data)
+        np.testing.assert_array_equal(ens.validtime, expected.validtime)
+
+    def testStrict(self):
+        self.assertRaises(IOError, pycxml.loadfiles,
+                          [self.forecast, "missing.xml"], lenient=False,
+                          workers=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import tarfile
+import zipfile
+import tempfile
+import unittest
+
+import pandas as pd
+
+import sources
+from make_cxml import forecastXML, ensembleXML
+
+
+class TestSources(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.dir = self.tmpdir.name
+        self.texts = {"forecast.xml": forecastXML(),
+                      "ensemble.xml": ensembleXML(nmembers=2)}
+        for name, text in self.texts.items():
+            with open(os.path.join(self.dir, name), 'w') as fh:
+                fh.write(text)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def testArchives(self):
+        zpath = os.path.join(self.dir, "bulletins.zip")
+        tpath = os.path.join(self.dir, "bulletins.tar.gz")
+        with zipfile.ZipFile(zpath, 'w') as zf, \
+                tarfile.open(tpath, 'w:gz') as tf:
+            for name in self.texts:
+                zf.write(os.path.join(self.dir, name), name)
+                tf.add(os.path.join(self.dir, name), name)
+        for path in (zpath, tpath):
+            found = sources.expandSources([path])
+            self.assertEqual(found, [(path, "forecast.xml"),
+                                     (path, "ensemble.xml")])
+            for source in found:
+                self.assertEqual(sources.readSource(source).decode(),
+                                 self.texts[source[1]])
+            self.assertEqual(sources.sourceName(found[0]),
+                             f"{path}:forecast.xml")
+            self.assertEqual(sources.loadHeader(found[1])['members'], 2)
+
+    def testCloseArchives(self):
+        zpath = os.path.join(self.dir, "bulletins.zip")
+        tpath = os.path.join(self.dir, "bulletins.tar")
+        with zipfile.ZipFile(zpath, 'w') as zf, \
+                tarfile.open(tpath, 'w') as tf:
+            for name in self.texts:
+                zf.write(os.path.join(self.dir, name), name)
+                tf.add(os.path.join(self.dir, name), name)
+        for path in (zpath, tpath):
+            source = (path, "forecast.xml")
+            text = self.texts["forecast.xml"]
+            self.assertEqual(sources.readSource(source).decode(), text)
+            self.assertEqual(sources.readSource(source, shared=True)
+                             .decode(), text)
+            opened = [sources.openArchive(path),
+                      sources.sharedArchive(path)[0]]
+            sources.closeArchives([path])
+            for archive in opened:
+                if isinstance(archive, zipfile.ZipFile):
+                    self.assertIsNone(archive.fp)
+                else:
+                    self.assertTrue(archive.closed)
+            # Closed archives are opened again when they are next read
+            self.assertEqual(sources.readSource(source, shared=True)
+                             .decode(), text)
+            self.assertIsNot(sources.sharedArchive(path)[0], opened[1])
+        sources.closeArchives()
+        self.assertFalse(sources._sharedArchives)
+        self.assertFalse(any(sources._threadArchives))
+
+    def testLoadSource(self):
+        path = os.path.join(self.dir, "forecast.xml")
+        self.assertEqual(len(sources.loadSource(path)), 21)
+        self.assertNotIn('file', sources.loadHeader(path))
+        # lxml gives the same frame as ElementTree
+        pd.testing.assert_frame_equal(sources.loadSource(path, lxml=True),
+                                      sources.loadSource(path))
+        bad = os.path.join(self.dir, "bad.xml")
+        with open(bad, 'w') as fh:
+            fh.write(forecastXML().replace("</fix>", "", 1))
+        result = sources.loadSource(bad, lenient=True, lxml=True)
+        self.assertTrue(result.attrs['errors'])
+
+
+if __name__ == '__main__':
+    unittest.main()
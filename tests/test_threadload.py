@@ -0,0 +1,84 @@
+import os
+import tempfile
+import threading
+import unittest
+
+import pycxml
+import threadload
+from make_cxml import forecastXML, ensembleXML
+
+
+class TestThreadMap(unittest.TestCase):
+
+    def testOrderAndBound(self):
+        lock = threading.Lock()
+        state = {'taken': 0, 'done': 0, 'ahead': 0}
+
+        def items():
+            for i in range(20):
+                with lock:
+                    state['taken'] += 1
+                    state['ahead'] = max(state['ahead'],
+                                         state['taken'] - state['done'])
+                yield i
+
+        def square(i):
+            with lock:
+                state['done'] += 1
+            return i * i
+
+        results = list(threadload.threadMap(square, items(), workers=2,
+                                            queuesize=3))
+        self.assertEqual(results, [i * i for i in range(20)])
+        # No more than `queuesize` items are taken ahead of the results
+        self.assertLessEqual(state['ahead'], 3)
+
+
+class TestThreadLoad(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.forecast = self.write("forecast.xml", forecastXML())
+        self.ensemble = self.write("ensemble.xml", ensembleXML(nmembers=4))
+        self.broken = self.write("broken.xml", forecastXML()[:-200])
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, 'w') as fh:
+            fh.write(text)
+        return path
+
+    def testLoadFiles(self):
+        files = [self.forecast, self.ensemble, "missing.xml"]
+        results, errors = pycxml.loadfiles(files, workers=2, threads=True)
+        serial, _ = pycxml.loadfiles(files)
+        self.assertEqual(list(results), files[:2])
+        self.assertEqual(list(errors['file']), ["missing.xml"])
+        self.assertTrue(results[self.forecast].equals(serial[self.forecast]))
+        members = results[self.ensemble]
+        self.assertEqual(len(members), 4)
+        for member, expected in zip(members, serial[self.ensemble]):
+            self.assertTrue(member.equals(expected))
+
+    def testStrict(self):
+        self.assertRaises(Exception, threadload.loadThreaded,
+                          [self.forecast, self.broken], lenient=False,
+                          workers=2)
+        results, errors = threadload.loadThreaded(
+            [self.forecast, self.broken], workers=2)
+        self.assertIn(self.broken, list(errors['file']))
+
+    def testValidate(self):
+        files = [self.forecast, self.broken, self.ensemble]
+        errors = dict(threadload.validateThreaded(files, workers=2))
+        self.assertEqual(list(errors), files)
+        self.assertIsNone(errors[self.forecast])
+        self.assertIsNone(errors[self.ensemble])
+        self.assertIsNotNone(errors[self.broken])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,13 @@
 import os
+import io
 import unittest
+from unittest import mock
 import pycxml
+import validator
 import xml.etree.ElementTree as ET
 
+from make_cxml import forecastXML, ensembleXML
+
 
 class TestValidation(unittest.TestCase):
 
@@ -18,5 +23,69 @@ class TestValidation(unittest.TestCase):
         self.assertRaises(IOError, pycxml.validate, self.missing_file)
 
 
+class TestStructureChecker(unittest.TestCase):
+
+    def setUp(self):
+        self.checker = validator.getStructureChecker()
+
+    def check(self, text):
+        return self.checker.check(ET.fromstring(text))
+
+    def testValid(self):
+        self.assertEqual(self.check(forecastXML()), [])
+        self.assertEqual(self.check(ensembleXML(nmembers=2)), [])
+
+    def testUnitsFromSchema(self):
+        self.assertIn("deg S", self.checker.units['latitude'])
+        self.assertIn("kt", self.checker.units['windSpeed'])
+        self.assertIn("pressure", self.checker.unitsRequired)
+
+    def testProblems(self):
+        text = forecastXML().replace('<pressure units="hPa">',
+                                     '<pressure units="psi">', 1)
+        text = text.replace('<longitude units="deg E">', '<longitude>', 1)
+        text = text.replace('<creationTime>', '<!-- -->', 1).replace(
+            '</creationTime>', '', 1)
+        text = text.replace('type="forecast"', 'type="outlook"')
+        messages = [msg for loc, msg in self.check(text)]
+        self.assertEqual(messages, [
+            "header has no creationTime element",
+            "data has invalid type 'outlook'",
+            "longitude has no units attribute",
+            "pressure has invalid units 'psi'"])
+
+    def testMissingMember(self):
+        text = ensembleXML(nmembers=2).replace(' member="1"', '')
+        self.assertEqual(len(self.check(text)), 1)
+
+
+class TestCheckfile(unittest.TestCase):
+
+    def testSample(self):
+        data = forecastXML().encode()
+        with mock.patch('pycxml.validate') as validate:
+            pycxml.checkfile(io.BytesIO(data), sample=0.)
+            validate.assert_not_called()
+            pycxml.checkfile(io.BytesIO(data), sample=1.)
+            validate.assert_called_once()
+
+    def testFailure(self):
+        text = forecastXML().replace('<latitude units="deg S">',
+                                     '<latitude units="deg">', 1)
+        pycxml.checkfile(io.BytesIO(text.encode()))
+        text = forecastXML().replace('<validTime>', '<!--', 1).replace(
+            '</validTime>', '-->', 1)
+        self.assertRaises(AssertionError, pycxml.checkfile,
+                          io.BytesIO(text.encode()))
+
+    def testLoadWithCheck(self):
+        text = forecastXML().replace('<pressure units="hPa">',
+                                     '<pressure units="psi">', 1)
+        self.assertRaises(AssertionError, pycxml.loadstring, text,
+                          check=True)
+        df = pycxml.loadstring(text, check=True, lenient=True)
+        self.assertEqual(df.attrs['errors'][0]['level'], 'xml')
+
+
 if __name__ == '__main__':
     unittest.main()
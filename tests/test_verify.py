@@ -0,0 +1,89 @@
+import unittest
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from numpy.testing import assert_allclose
+
+import pycxml
+import verify
+from make_cxml import (forecastXML, ensembleXML, analysisXML, BASETIME,
+                       DISTID)
+
+
+class TestTrackErrors(unittest.TestCase):
+
+    def setUp(self):
+        # The analysed track is 0.1 degrees south of the forecast tracks
+        self.analysis = pycxml.loadstring(analysisXML(lat0=12.1))
+        self.forecast = pycxml.loadstring(forecastXML())
+        self.ensemble = pycxml.loadstring(ensembleXML(nmembers=3))
+
+    def testLoadAnalysis(self):
+        self.assertEqual(len(self.analysis), 21)
+        self.assertEqual(self.analysis['latitude'][0], -12.1)
+        self.assertEqual(self.analysis.attrs['centre'], "TEST CENTRE")
+
+    def testDeterministic(self):
+        errors = verify.trackErrors([self.forecast], [self.analysis])
+        self.assertEqual(len(errors), 21)
+        assert_allclose(errors['leadtime'], np.arange(0, 126, 6))
+        assert_allclose(errors['trackerror'], 11.12, atol=0.01)
+        # The track moves to the south-southeast, so a forecast to the north
+        # is behind and to the left of the analysed position
+        self.assertTrue((errors['alongtrackerror'] < 0).all())
+        self.assertTrue((errors['crosstrackerror'] < 0).all())
+        assert_allclose(np.hypot(errors['alongtrackerror'],
+                                 errors['crosstrackerror']),
+                        errors['trackerror'])
+        assert_allclose(errors['pcentreerror'], 0.)
+
+    def testEnsembleMembers(self):
+        errors = verify.trackErrors({"f": self.forecast, "e": self.ensemble},
+                                    [self.analysis])
+        self.assertEqual(len(errors), 4 * 21)
+        self.assertEqual(sorted(errors['member'].dropna().unique()),
+                         [0, 1, 2])
+
+    def testUnmatched(self):
+        # Analyses of another disturbance, and at other times, do not match
+        other = pycxml.loadstring(analysisXML(distId="2021010100_150S_1500E"))
+        late = pycxml.loadstring(analysisXML(
+            hours=[3, 9], basetime=BASETIME + timedelta(hours=200)))
+        errors = verify.trackErrors([self.forecast], [other, late])
+        self.assertEqual(len(errors), 0)
+        self.assertIn('trackerror', errors.columns)
+
+    def testLatestAnalysis(self):
+        amended = pycxml.loadstring(analysisXML(
+            hours=[12], lat0=12., creationtime=BASETIME + timedelta(days=1)))
+        errors = verify.trackErrors([self.forecast],
+                                    [self.analysis, amended])
+        self.assertEqual(len(errors), 21)
+        self.assertEqual(errors['trackerror'][2], 0.)
+
+    def testBestTrack(self):
+        best = pd.DataFrame({'disturbance': DISTID,
+                             'validtime': [BASETIME],
+                             'latitude': [-12.], 'longitude': [121.],
+                             'pcentre': [980.], 'windspeed': [np.nan]})
+        errors = verify.trackErrors(self.forecast, best)
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors['pcentreerror'][0], 10.)
+        self.assertTrue(np.isnan(errors['alongtrackerror'][0]))
+
+    def testStatistics(self):
+        errors = verify.trackErrors([self.forecast, self.ensemble],
+                                    [self.analysis])
+        stats = verify.errorStatistics(errors)
+        self.assertEqual(len(stats), 21)
+        self.assertEqual(stats['count'][24.], 4)
+        lead24 = errors[errors['leadtime'] == 24.]
+        assert_allclose(stats['trackerror'][24.],
+                        lead24['trackerror'].mean())
+        assert_allclose(stats['crosstrackbias'][24.],
+                        lead24['crosstrackerror'].mean())
+
+
+if __name__ == '__main__':
+    unittest.main()
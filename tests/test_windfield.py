@@ -0,0 +1,80 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+from numpy.testing import assert_allclose
+
+import pycxml
+import windfield
+from make_cxml import forecastXML, ensembleXML
+
+
+class TestHollandProfile(unittest.TestCase):
+
+    def testMaximumWind(self):
+        dp, vmax = 4000., 50.
+        b = windfield.hollandB(vmax, dp)
+        r = np.linspace(1., 200., 400)
+        v = windfield.hollandProfile(r, 30., dp, b, 0.)
+        self.assertAlmostEqual(r[v.argmax()], 30., delta=1.)
+        self.assertAlmostEqual(v.max(), vmax, places=1)
+
+    def testDefaults(self):
+        assert_allclose(windfield.hollandB([np.nan, 50., 10.],
+                                           [4000., 0., 4000.]),
+                        [windfield.DEFAULT_B, windfield.DEFAULT_B, 1.])
+        assert_allclose(windfield.hollandProfile(50., 30., -100., 1.5, 0.),
+                        0.)
+
+
+class TestFootprint(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.track = pycxml.loadstring(forecastXML(lat0=15., lon0=120.))
+        cls.lon = np.arange(118., 128., 0.25)
+        cls.lat = np.arange(-30., -13., 0.25)
+
+    def testFootprint(self):
+        fp = windfield.footprints(self.track, self.lon, self.lat)
+        self.assertEqual(fp.shape, (1, len(self.lat), len(self.lon)))
+        # Strongest gusts along the track, weak winds far from it
+        track = windfield.trackParameters(self.track)
+        i = np.abs(self.lat - track['lat'][10]).argmin()
+        j = np.abs(self.lon - track['lon'][10]).argmin()
+        self.assertGreater(fp[0, i, j], 30.)
+        self.assertLess(fp[0, i, -1], 0.5 * fp[0].max())
+
+    def testChunks(self):
+        track = windfield.interpolateTracks(self.track, "1h")
+        full = windfield.footprint(track, self.lon, self.lat)
+        chunked = windfield.footprint(track, self.lon, self.lat,
+                                      maxbytes=1)
+        assert_allclose(full, chunked)
+
+    def testAsymmetry(self):
+        # A track moving due west in the southern hemisphere has its
+        # strongest winds to the south of the centre
+        track = pd.DataFrame({
+            'validtime': pd.date_range("2021-01-01", periods=2, freq="6h"),
+            'latitude': [-20., -20.], 'longitude': [150., 147.],
+            'pcentre': 960., 'windspeed': 150., 'rmax': 30.,
+            'poci': 1005.})
+        params = windfield.trackParameters(track)
+        self.assertLess(params['u'][0], 0.)
+        gust = windfield.gustField(params, np.array([150., 150.]),
+                                   np.array([-20.5, -19.5]))
+        self.assertGreater(gust[0, 0], gust[0, 1])
+
+    def testEnsembleWorkers(self):
+        tracks = pycxml.loadstring(ensembleXML(nmembers=3,
+                                               hours=range(0, 30, 6)))
+        serial = windfield.footprints(tracks, self.lon, self.lat)
+        parallel = windfield.footprints(tracks, self.lon, self.lat,
+                                        workers=2)
+        self.assertEqual(serial.shape[0], 3)
+        assert_allclose(serial, parallel)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+import xml.etree.ElementTree as ET
+
+import numpy as np
+from numpy.testing import assert_allclose
+
+import pycxml
+import windradii
+from make_cxml import forecastXML
+
+
+class TestExtractRadii(unittest.TestCase):
+
+    def setUp(self):
+        self.fix = ET.fromstring("""
+            <fix>
+            <cycloneData>
+            <windContours>
+                <windSpeed units="kt">34
+                    <radius units="nm" sector="NEQ">100.0</radius>
+                    <radius units="km" sector="SEQ">150.0</radius>
+                    <radius units="nm" sector="SWQ">50.0</radius>
+                    <radius units="nm" sector="NWQ">50.0</radius>
+                </windSpeed>
+                <windSpeed units="m/s">25
+                    <radius units="km">60.0</radius>
+                </windSpeed>
+                <windSpeed units="kt">50
+                    <radius units="km" sector="NEQ">40.0</radius>
+                </windSpeed>
+            </windContours>
+            </cycloneData>
+            </fix>""")
+        self.empty = ET.fromstring("<fix><cycloneData/></fix>")
+
+    def testExtract(self):
+        radii = windradii.extractRadii([self.empty, self.fix])
+        self.assertEqual(radii.shape, (2, 3, 4))
+        self.assertTrue(np.isnan(radii[0]).all())
+        assert_allclose(radii[1, 0], [185.2, 150., 92.6, 92.6])
+        # 25 m/s is the 48 kt threshold, given for the full circle
+        assert_allclose(radii[1, 1], [60.] * 4)
+        # 50 kt is not one of the thresholds
+        self.assertTrue(np.isnan(radii[1, 2]).all())
+
+    def testUnits(self):
+        radii = windradii.extractRadii([self.fix], units="nm")
+        assert_allclose(radii[0, 0, 0], 100., rtol=1e-4)
+
+    def testStatistics(self):
+        radii = np.array([[[100., 100., 100., 100.],
+                           [80., 40., np.nan, np.nan],
+                           [np.nan] * 4]])
+        assert_allclose(windradii.meanRadii(radii), [[100., 60., np.nan]])
+        assert_allclose(windradii.asymmetry(radii), [[0., np.nan, np.nan]])
+        assert_allclose(windradii.radiiArea(radii),
+                        [[np.pi * 100. ** 2, np.pi / 4 * 8000., np.nan]])
+
+    def testFrame(self):
+        df = pycxml.loadstring(forecastXML())
+        stats = windradii.radiiStatistics(df)
+        self.assertEqual(len(stats), len(df))
+        assert_allclose(stats['R34'], 150.)
+        assert_allclose(stats['R34asym'], 100. / 150.)
+        self.assertTrue(stats['R64area'].isna().all())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+"""
+threadload - Parse and validate CXML files in a pool of threads
+
+A pool of worker processes (`sharedframes.loadShared`, `cli --workers`)
+holds a copy of the interpreter, pandas and the compiled schema in every
+worker. Threads share all of these: one compiled schema (from
+`validator.getValidator`) and one set of conversion tables (those of
+`converter`) serve every thread. lxml releases the GIL while it parses and
+validates a document, so threads still parse files in parallel; building
+the frames from the parsed tree holds the GIL, so the speedup of threads is
+less than that of processes when that step dominates.
+
+Files are parsed with lxml (not `xml.etree.ElementTree`, which holds the GIL
+throughout). Work is handed to the threads through a bounded queue of
+pending files, so only a few parsed documents are held in memory at once,
+and results are returned in the order of the files.
+
+`python benchmarks/threadload.py` compares the throughput and memory use
+of thread and process pools.
+
+Requires `lxml`.
+
+"""
+
+import os
+import logging as log
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+
+import pycxml
+from validator import getValidator, CXML_SCHEMA
+
+
+def threadMap(func, items, workers, queuesize=None):
+    """
+    Apply a function to every item in a pool of threads.
+
+    :param func: function of one argument.
+    :param items: iterable of items; it is consumed as the threads take
+    work, not in advance.
+    :param int workers: number of threads.
+    :param int queuesize: most items waiting or in progress at once
+    (default twice `workers`).
+
+    :returns: generator of the results, in the order of `items`.
+    """
+    queuesize = max(queuesize or 2 * workers, 1)
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque(pool.submit(func, item)
+                        for item in islice(items, queuesize))
+        while pending:
+            result = pending.popleft().result()
+            # Take the next item only once there is room for it
+            pending.extend(pool.submit(func, item)
+                           for item in islice(items, 1))
+            yield result
+
+
+def parseFile(xmlfile, compact=False, lenient=False, check=False,
+              fields=None):
+    """
+    Load a CXML file as `pycxml.loadfile` does, parsing it with lxml.
+
+    :returns: tuple of (result, errors), where `errors` lists the errors
+    recovered from in lenient mode (see `pycxml.recordError`).
+    """
+    if not os.path.isfile(xmlfile):
+        raise IOError(f"{xmlfile} is not a file")
+    with open(xmlfile, 'rb') as fh:
+        data = fh.read()
+    return parseBytes(data, xmlfile, compact, lenient, check, fields)
+
+
+def parseBytes(data, name, compact=False, lenient=False, check=False,
+               fields=None):
+    """
+    Load a CXML document held in memory as `pycxml.loadstring` does,
+    parsing it with lxml.
+
+    :param bytes data: the document.
+    :param str name: name used to identify the document in log messages.
+
+    :returns: as for `parseFile`.
+    """
+    errors = []
+    if lenient:
+        xroot = pycxml.recoverParse(data, errors)
+    else:
+        from lxml import etree
+        xroot = etree.fromstring(data)
+    result = pycxml.parseRoot(xroot, name, compact,
+                              errors if lenient else None, check, fields)
+    return result, errors
+
+
+def loadThreaded(xmlfiles, compact=False, lenient=True, workers=4,
+                 check=False, queuesize=None):
+    """
+    Load a batch of CXML files in a pool of threads.
+
+    :param list xmlfiles: paths of the CXML files to load.
+    :param bool compact: see `pycxml.loadfile`.
+    :param bool lenient: see `pycxml.loadfiles`.
+    :param int workers: number of threads.
+    :param bool check: see `pycxml.loadfile`.
+    :param int queuesize: see `threadMap`.
+
+    :returns: tuple of (results, errors), as for `pycxml.loadfiles`.
+    """
+    import pandas as pd
+
+    def load(xmlfile):
+        try:
+            result, errors = parseFile(xmlfile, compact, lenient, check)
+            return xmlfile, result, errors
+        except Exception as e:
+            if not lenient:
+                raise
+            log.error("Unable to load %s: %s", xmlfile, e)
+            errors = []
+            pycxml.recordError(errors, 'file', None, e)
+            return xmlfile, None, errors
+
+    results = {}
+    errors = []
+    for xmlfile, result, fileErrors in threadMap(load, xmlfiles, workers,
+                                                 queuesize):
+        if result is not None:
+            results[xmlfile] = result
+        errors.extend(dict(file=xmlfile, **err) for err in fileErrors)
+    return results, pd.DataFrame(errors, columns=pycxml.ERROR_COLUMNS)
+
+
+def validateThreaded(xmlfiles, workers=4, xsd_file=CXML_SCHEMA,
+                     queuesize=None):
+    """
+    Validate a batch of CXML files against the schema in a pool of threads,
+    sharing a single compiled schema.
+
+    :param list xmlfiles: paths of the CXML files.
+    :param int workers: number of threads.
+    :param str xsd_file: see `validator.getValidator`.
+    :param int queuesize: see `threadMap`.
+
+    :returns: generator of (file, error) tuples in the order of `xmlfiles`,
+    where `error` is None for a valid file and otherwise describes why it
+    is not valid.
+    """
+    # Compile the schema before the threads start, so it is compiled once
+    validator = getValidator(xsd_file)
+
+    def validate(xmlfile):
+        try:
+            validator.validate(xmlfile)
+        except Exception as e:
+            return xmlfile, f"{type(e).__name__}: {e}"
+        return xmlfile, None
+
+    yield from threadMap(validate, xmlfiles, workers, queuesize)
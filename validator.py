@@ -1,11 +1,12 @@
+import os
 import logging
-
-from lxml import etree
-from pathlib import Path
+import xml.etree.ElementTree as ET
+from functools import lru_cache
 
 LOGGER = logging.getLogger(__name__)
 
-CXML_SCHEMA = str(Path(__file__).parent / 'cxml.1.3.xsd')
+CXML_SCHEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'cxml.1.3.xsd')
 
 
 class Validator:
@@ -17,6 +18,7 @@ class Validator:
         """
         :param str xsd_file: Name of the CXML XSD file
         """
+        from lxml import etree
         self.schema = etree.XMLSchema(
             etree.parse(xsd_file)
         )
@@ -27,9 +29,130 @@ class Validator:
         :param xml_filename: name of xml file to validate
         :raises AssertionError: on schema validation error
         """
+        from lxml import etree
 
         LOGGER.debug('Validating XML file')
 
         return self.schema.assert_(
             etree.parse(xml_filename)
         )
+
+
+@lru_cache(maxsize=None)
+def getValidator(xsd_file: str = CXML_SCHEMA) -> Validator:
+    """
+    Return a :class:`Validator` for a schema, compiling the schema on the
+    first request only. Compiling the CXML schema is expensive, so it is
+    deferred until validation is actually needed and then reused.
+
+    :param str xsd_file: Name of the XSD file
+    """
+    LOGGER.debug('Compiling schema %s', xsd_file)
+    return Validator(xsd_file)
+
+
+XS = "{http://www.w3.org/2001/XMLSchema}"
+
+# Children that each element must have for the file to be parsed, and the
+# attributes it must carry. These are a subset of the rules in the schema.
+REQUIRED_CHILDREN = {
+    'cxml': ['header'],
+    'header': ['productionCenter', 'creationTime'],
+    'disturbance': ['fix'],
+    'fix': ['validTime', 'latitude', 'longitude'],
+}
+REQUIRED_ATTRIBUTES = {
+    'data': ['type'],
+    'disturbance': ['ID'],
+}
+
+
+class StructureChecker:
+    """
+    Fast structural check of CXML documents. It confirms that the elements
+    and attributes needed to parse a document are present, and that `units`
+    attributes and data types take one of the values enumerated in the
+    schema. This is much cheaper than full schema validation, and is run on
+    an already parsed document, so it can be done while loading data.
+    """
+
+    def __init__(self, xsd_file: str):
+        """
+        :param str xsd_file: Name of the CXML XSD file, from which the
+        enumerated values are read.
+        """
+        xsd = ET.parse(xsd_file).getroot()
+        enums = {t.attrib['name']: frozenset(
+                     e.attrib['value'] for e in t.iter(f"{XS}enumeration"))
+                 for t in xsd.iter(f"{XS}simpleType") if 'name' in t.attrib}
+        # Allowed values of the `units` attribute of each element, and the
+        # elements for which `units` is required:
+        self.units = {}
+        self.unitsRequired = set()
+        for elem in xsd.findall(f"{XS}element"):
+            for attr in elem.iter(f"{XS}attribute"):
+                if attr.attrib.get('name') != 'units':
+                    continue
+                values = enums.get(attr.attrib.get('type'))
+                if values:
+                    self.units[elem.attrib['name']] = values
+                if attr.attrib.get('use') == 'required':
+                    self.unitsRequired.add(elem.attrib['name'])
+        self.dataTypes = enums['dataType']
+
+    def check(self, xroot) -> list:
+        """
+        Check the structure of a parsed CXML document, in a single pass over
+        its elements.
+
+        :param xroot: root element of the document (from
+        :mod:`xml.etree.ElementTree` or `lxml`).
+
+        :returns: list of (location, problem) tuples; empty if no problems
+        were found.
+        """
+        problems = []
+
+        def report(elem, message):
+            line = getattr(elem, 'sourceline', None)
+            location = f"line {line}" if line else elem.tag
+            problems.append((location, message))
+
+        if xroot.tag != 'cxml':
+            report(xroot, f"Root element is {xroot.tag}, not cxml")
+        for elem in xroot.iter():
+            tag = elem.tag
+            if not isinstance(tag, str):
+                continue  # Comments and processing instructions
+            for child in REQUIRED_CHILDREN.get(tag, ()):
+                if elem.find(child) is None:
+                    report(elem, f"{tag} has no {child} element")
+            for attr in REQUIRED_ATTRIBUTES.get(tag, ()):
+                if attr not in elem.attrib:
+                    report(elem, f"{tag} has no {attr} attribute")
+            units = elem.attrib.get('units')
+            if units is None:
+                if tag in self.unitsRequired:
+                    report(elem, f"{tag} has no units attribute")
+            elif tag in self.units and units not in self.units[tag]:
+                report(elem, f"{tag} has invalid units {units!r}")
+            if tag == 'data':
+                dtype = elem.attrib.get('type')
+                if dtype is not None and dtype not in self.dataTypes:
+                    report(elem, f"data has invalid type {dtype!r}")
+                elif dtype == 'ensembleForecast' and \
+                        'member' not in elem.attrib:
+                    report(elem, "ensemble data has no member attribute")
+        return problems
+
+
+@lru_cache(maxsize=None)
+def getStructureChecker(xsd_file: str = CXML_SCHEMA) -> StructureChecker:
+    """
+    Return a :class:`StructureChecker` for a schema, reading the schema on
+    the first request only.
+
+    :param str xsd_file: Name of the XSD file
+    """
+    LOGGER.debug('Reading enumerations from schema %s', xsd_file)
+    return StructureChecker(xsd_file)
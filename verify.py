@@ -0,0 +1,207 @@
+"""
+verify - Track and intensity errors of forecasts against analyses
+
+Each forecast fix (deterministic, or of any ensemble member) is matched to
+the analysis fix of the same disturbance at the same validtime, and its
+position, central pressure and wind speed errors are computed. The match is
+a sort-merge join on integer keys rather than a loop over bulletins: the
+disturbance of every fix is factorised to an integer code, combined with
+the validtime into a single int64 key, the analysis keys are sorted once,
+and all forecast keys are located in them with one `numpy.searchsorted`
+call. The errors are then computed for all matched fixes at once, so a
+decade of bulletins costs a few array operations once it is loaded.
+
+Along- and cross-track errors are the components of the position error
+parallel and perpendicular to the direction of motion of the analysed
+track, which is taken from the analysis fixes either side of the validtime.
+Positive along-track errors are ahead of the analysed position, and positive
+cross-track errors to the right of the direction of motion.
+
+"""
+
+import logging as log
+
+import numpy as np
+import pandas as pd
+
+import merge
+from windfield import distanceBearing
+
+JOIN_KEYS = ["disturbance", "validtime"]
+ERROR_COLUMNS = ["leadtime", "trackerror", "alongtrackerror",
+                 "crosstrackerror", "pcentreerror", "windspeederror"]
+FORECAST_KEYS = ["centre", "disturbance", "basetime", "member", "validtime"]
+
+
+def _seconds(series):
+    """
+    Times of a column as int64 seconds, and a mask of the valid times.
+    """
+    times = pd.to_datetime(series).to_numpy(dtype='datetime64[s]')
+    return times.view(np.int64), ~np.isnat(times)
+
+
+def _fixes(results):
+    """
+    A frame of fixes with header columns, from `pycxml.loadfile` results or
+    an already stacked frame.
+    """
+    if isinstance(results, pd.DataFrame):
+        if 'basetime' in results.columns:
+            return results
+        results = [results]
+    return merge.stackResults(results)
+
+
+def analysisFixes(analyses):
+    """
+    Stack analysis results into a single frame, keeping one fix for each
+    disturbance and validtime (the one from the latest bulletin).
+
+    :param analyses: iterable of `pycxml.loadfile` results for analysis
+    bulletins, or a :class:`dict` of them (e.g. from `pycxml.loadfiles`).
+    A single :class:`pandas.DataFrame` of fixes (e.g. a best track) with
+    `disturbance` and `validtime` columns may be given instead.
+
+    :returns: :class:`pandas.DataFrame` sorted by `JOIN_KEYS`.
+    """
+    return merge.deduplicate(_fixes(analyses), JOIN_KEYS, ["creationtime"])
+
+
+def _trackHeading(codes, lon, lat):
+    """
+    Direction of motion (radians clockwise from north) at each fix of tracks
+    sorted by disturbance code and then validtime, from the fixes either
+    side. NaN for a disturbance with a single fix.
+    """
+    n = len(codes)
+    idx = np.arange(n)
+    prev = np.where(np.r_[False, codes[1:] == codes[:-1]], idx - 1, idx)
+    nxt = np.where(np.r_[codes[:-1] == codes[1:], False], idx + 1, idx)
+    _, heading = distanceBearing(lon[prev], lat[prev], lon[nxt], lat[nxt])
+    heading[prev == nxt] = np.nan
+    return heading
+
+
+def joinAnalyses(forecast, analysis):
+    """
+    Match forecast fixes to analysis fixes on (disturbance, validtime).
+
+    :param forecast: :class:`pandas.DataFrame` of forecast fixes.
+    :param analysis: :class:`pandas.DataFrame` of analysis fixes, with one
+    fix for each disturbance and validtime (see `analysisFixes`).
+
+    :returns: tuple of (forecast rows, matching analysis rows) as integer
+    arrays of positions in the two frames.
+    """
+    codes, _ = pd.factorize(pd.concat([forecast['disturbance'],
+                                       analysis['disturbance']],
+                                      ignore_index=True), sort=True)
+    fcodes, acodes = codes[:len(forecast)], codes[len(forecast):]
+    ftimes, fvalid = _seconds(forecast['validtime'])
+    atimes, avalid = _seconds(analysis['validtime'])
+    fvalid &= fcodes >= 0
+    avalid &= acodes >= 0
+    if not fvalid.any() or not avalid.any():
+        return np.array([], dtype=int), np.array([], dtype=int)
+
+    # Combine the disturbance code and the validtime into a single key
+    tmin = min(ftimes[fvalid].min(), atimes[avalid].min())
+    span = max(ftimes[fvalid].max(), atimes[avalid].max()) - tmin + 1
+    fkeys = fcodes.astype(np.int64) * span + (ftimes - tmin)
+    akeys = acodes.astype(np.int64) * span + (atimes - tmin)
+
+    arows = np.flatnonzero(avalid)
+    arows = arows[np.argsort(akeys[arows], kind='stable')]
+    sortedkeys = akeys[arows]
+    pos = np.searchsorted(sortedkeys, fkeys)
+    pos = np.minimum(pos, len(sortedkeys) - 1)
+    matched = fvalid & (sortedkeys[pos] == fkeys)
+    log.debug("Matched %d of %d forecast fixes", matched.sum(), len(forecast))
+    return np.flatnonzero(matched), arows[pos[matched]]
+
+
+def _floats(df, column, rows=slice(None)):
+    """
+    Values of a column at the given rows, as a float array.
+    """
+    if column not in df.columns:
+        return np.full(len(df.index[rows]), np.nan)
+    return df[column].iloc[rows].astype(float).to_numpy()
+
+
+def trackErrors(forecasts, analyses):
+    """
+    Position and intensity errors of forecast fixes against analyses.
+
+    :param forecasts: iterable of `pycxml.loadfile` results (deterministic
+    or ensemble forecasts), or a :class:`dict` of them (e.g. from
+    `pycxml.loadfiles`). A single result, or a frame of fixes from
+    `merge.mergeResults`, may be given instead.
+    :param analyses: analysis results or fixes (see `analysisFixes`).
+
+    :returns: :class:`pandas.DataFrame` with a row for each forecast fix
+    that has a matching analysis, holding the `FORECAST_KEYS` of the fix,
+    the lead time (hours), the great-circle, along-track and cross-track
+    errors (km), and the central pressure (hPa) and maximum wind speed
+    (km/h) errors (forecast minus analysis).
+    """
+    forecast = _fixes(forecasts)
+    analysis = analysisFixes(analyses)
+    frows, arows = joinAnalyses(forecast, analysis)
+    result = forecast.iloc[frows][[k for k in FORECAST_KEYS
+                                   if k in forecast.columns]]
+    result = result.reset_index(drop=True)
+    if len(frows) == 0:
+        return result.reindex(columns=list(result.columns) + ERROR_COLUMNS)
+
+    flon = _floats(forecast, 'longitude', frows)
+    flat = _floats(forecast, 'latitude', frows)
+    alon = _floats(analysis, 'longitude', arows)
+    alat = _floats(analysis, 'latitude', arows)
+    # Direction of motion of the analysed tracks, at each analysis fix (the
+    # analyses are sorted by disturbance and validtime)
+    acodes, _ = pd.factorize(analysis['disturbance'], sort=True)
+    heading = _trackHeading(acodes, _floats(analysis, 'longitude'),
+                            _floats(analysis, 'latitude'))
+    dist, bearing = distanceBearing(alon, alat, flon, flat)
+    angle = bearing - heading[arows]
+
+    result['leadtime'] = (pd.to_datetime(result['validtime']) -
+                          pd.to_datetime(result['basetime'])) / \
+        pd.Timedelta(hours=1)
+    result['trackerror'] = dist
+    result['alongtrackerror'] = dist * np.cos(angle)
+    result['crosstrackerror'] = dist * np.sin(angle)
+    for field in ("pcentre", "windspeed"):
+        result[f"{field}error"] = (_floats(forecast, field, frows) -
+                                   _floats(analysis, field, arows))
+    return result
+
+
+def errorStatistics(errors, by="leadtime"):
+    """
+    Summary statistics of forecast errors, e.g. by lead time.
+
+    :param errors: :class:`pandas.DataFrame` from `trackErrors`.
+    :param by: column (or list of columns) to group the errors by.
+
+    :returns: :class:`pandas.DataFrame` indexed by `by`, with the number of
+    fixes, the mean track error, the mean (bias) along- and cross-track
+    errors, and the mean (bias) and mean absolute pressure and wind speed
+    errors.
+    """
+    grouped = errors.groupby(by)
+    stats = grouped.agg(count=("trackerror", "size"),
+                        trackerror=("trackerror", "mean"),
+                        alongtrackbias=("alongtrackerror", "mean"),
+                        crosstrackbias=("crosstrackerror", "mean"),
+                        pcentrebias=("pcentreerror", "mean"),
+                        windspeedbias=("windspeederror", "mean"))
+    absolute = errors[["pcentreerror", "windspeederror"]].abs()
+    absolute = absolute.groupby([errors[b] for b in
+                                 ([by] if isinstance(by, str) else by)])
+    absolute = absolute.mean()
+    stats['pcentremae'] = absolute['pcentreerror']
+    stats['windspeedmae'] = absolute['windspeederror']
+    return stats
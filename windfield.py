@@ -0,0 +1,242 @@
+"""
+windfield - Parametric wind field footprints from forecast tracks
+
+Converts the tracks returned by `pycxml.loadfile` into maximum gust
+footprints on a regular grid, using the Holland (1980) radial profile of
+gradient wind speed. The profile is combined with the translation of the
+storm, reduced to the surface and converted to a gust, and the maximum over
+all time steps is retained at each grid point.
+
+Each footprint is computed on (time step, grid point) arrays, in chunks of
+time steps so that memory use is bounded by `maxbytes` regardless of the
+grid size. Ensemble members are processed in parallel in a pool of worker
+processes.
+
+"""
+
+import logging as log
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from converter import convert
+from interpolate import interpolateTracks
+
+EARTH_RADIUS = 6371.  # km
+OMEGA = 7.2921e-5  # rad/s
+RHO = 1.15  # Air density, kg/m^3
+
+# Reduction of gradient level winds to the surface, and ratio of the gust
+# to the mean surface wind:
+SURFACE_FACTOR = 0.8
+GUST_FACTOR = 1.23
+
+# Fraction of the storm's translation speed added to the wind field:
+TRANSLATION_FACTOR = 0.5
+
+# Values used when a fix does not provide them:
+DEFAULT_POCI = 1010.  # hPa
+DEFAULT_RMAX = 40.  # km
+DEFAULT_B = 1.5
+
+# Approximate memory used per (time step, grid point) element of a chunk,
+# and the default bound on the memory used for a chunk:
+BYTES_PER_ELEMENT = 10 * 8
+MAX_BYTES = 64 * 2 ** 20
+
+
+def hollandB(vmax, dp):
+    """
+    Holland profile parameter B consistent with the maximum wind speed and
+    pressure deficit of a storm, limited to the range [1, 2.5].
+
+    :param vmax: maximum wind speed (m/s).
+    :param dp: pressure deficit, poci - pcentre (Pa).
+
+    :returns: :class:`numpy.ndarray` of B values; `DEFAULT_B` where either
+    input is missing or the pressure deficit is not positive.
+    """
+    vmax = np.asarray(vmax, dtype=float)
+    dp = np.asarray(dp, dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        b = RHO * np.e * vmax ** 2 / dp
+    b = np.where(np.isfinite(b) & (dp > 0), b, DEFAULT_B)
+    return np.clip(b, 1., 2.5)
+
+
+def hollandProfile(r, rmax, dp, b, f):
+    """
+    Gradient wind speed at distance `r` from the centre of a storm (Holland,
+    1980). Inputs are broadcast against each other.
+
+    :param r: distance from the storm centre (km).
+    :param rmax: radius to maximum winds (km).
+    :param dp: pressure deficit (Pa).
+    :param b: Holland B parameter.
+    :param f: Coriolis parameter (1/s).
+
+    :returns: :class:`numpy.ndarray` of wind speeds (m/s).
+    """
+    r = np.maximum(r, 1e-3) * 1000.
+    rmax = rmax * 1000.
+    x = (rmax / r) ** b
+    rf = r * np.abs(f) / 2.
+    return np.sqrt(b / RHO * x * np.maximum(dp, 0.) * np.exp(-x) +
+                   rf ** 2) - rf
+
+
+def distanceBearing(lonc, latc, lon, lat):
+    """
+    Great circle distance (km) and initial bearing (radians clockwise from
+    north) from centres (lonc, latc) to points (lon, lat), all in degrees.
+    """
+    lonc, latc, lon, lat = map(np.radians, (lonc, latc, lon, lat))
+    dlon = lon - lonc
+    coslatc, coslat = np.cos(latc), np.cos(lat)
+    a = (np.sin((lat - latc) / 2.) ** 2 +
+         coslatc * coslat * np.sin(dlon / 2.) ** 2)
+    dist = 2. * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.)))
+    bearing = np.arctan2(np.sin(dlon) * coslat,
+                         coslatc * np.sin(lat) -
+                         np.sin(latc) * coslat * np.cos(dlon))
+    return dist, bearing
+
+
+def _translation(lon, lat, times):
+    """
+    Eastward and northward translation velocity (m/s) of a storm at each
+    step of a track.
+    """
+    if len(times) < 2:
+        return np.zeros(len(times)), np.zeros(len(times))
+    seconds = (times - times[0]) / np.timedelta64(1, 's')
+    dlon = np.gradient(np.unwrap(np.radians(lon)), seconds)
+    dlat = np.gradient(np.radians(lat), seconds)
+    scale = EARTH_RADIUS * 1000.
+    return dlon * np.cos(np.radians(lat)) * scale, dlat * scale
+
+
+def trackParameters(track):
+    """
+    Arrays of the storm parameters needed by the wind field, one element per
+    usable time step of a track. Time steps without a position or central
+    pressure are dropped; missing poci, rmax or maximum wind speed are
+    replaced with default values.
+
+    :param track: :class:`pandas.DataFrame` of a single track, as returned
+    by `pycxml.loadfile`.
+
+    :returns: :class:`dict` of arrays: lon, lat (degrees), dp (Pa), rmax
+    (km), b, f (1/s), u, v (translation velocity, m/s).
+    """
+    import pandas as pd
+
+    def column(name, default=np.nan):
+        if name not in track.columns:
+            return np.full(len(track), default)
+        values = track[name].to_numpy(dtype=float, na_value=np.nan)
+        return np.where(np.isnan(values), default, values)
+
+    lon, lat = column('longitude'), column('latitude')
+    pcentre = column('pcentre')
+    keep = ~(np.isnan(lon) | np.isnan(lat) | np.isnan(pcentre))
+    times = pd.to_datetime(track['validtime']).to_numpy()[keep]
+    lon, lat, pcentre = lon[keep], lat[keep], pcentre[keep]
+
+    dp = np.asarray(convert(column('poci', DEFAULT_POCI)[keep] - pcentre,
+                            'hPa', 'Pa'), dtype=float)
+    vmax = np.asarray(convert(column('windspeed')[keep], 'km/h', 'm/s'),
+                      dtype=float)
+    u, v = _translation(lon, lat, times)
+    return {'lon': lon, 'lat': lat, 'dp': dp,
+            'rmax': column('rmax', DEFAULT_RMAX)[keep],
+            'b': hollandB(vmax, dp),
+            'f': 2. * OMEGA * np.sin(np.radians(lat)),
+            'u': u, 'v': v}
+
+
+def gustField(params, lon, lat):
+    """
+    Surface gust speed at a set of points, for each time step of a track.
+
+    :param dict params: storm parameters from `trackParameters` (or a slice
+    of them).
+    :param lon: :class:`numpy.ndarray` of point longitudes (degrees).
+    :param lat: :class:`numpy.ndarray` of point latitudes (degrees).
+
+    :returns: :class:`numpy.ndarray` of gust speeds (m/s), shape (time step,
+    point).
+    """
+    p = {k: v[:, None] for k, v in params.items()}
+    r, bearing = distanceBearing(p['lon'], p['lat'], lon[None, :],
+                                 lat[None, :])
+    vg = hollandProfile(r, p['rmax'], p['dp'], p['b'], p['f'])
+    # Unit vector of the rotational flow: anticlockwise in the northern
+    # hemisphere, clockwise in the southern hemisphere
+    sign = np.where(p['lat'] < 0, -1., 1.)
+    u = -sign * np.cos(bearing) * vg + TRANSLATION_FACTOR * p['u']
+    v = sign * np.sin(bearing) * vg + TRANSLATION_FACTOR * p['v']
+    return np.hypot(u, v) * (SURFACE_FACTOR * GUST_FACTOR)
+
+
+def footprint(track, lon, lat, maxbytes=MAX_BYTES):
+    """
+    Maximum gust footprint of a single track over a regular grid.
+
+    :param track: :class:`pandas.DataFrame` of a single track. It should be
+    interpolated to time steps short enough to resolve the wind field (see
+    `interpolate.interpolateTracks`).
+    :param lon: 1-d :class:`numpy.ndarray` of grid longitudes (degrees).
+    :param lat: 1-d :class:`numpy.ndarray` of grid latitudes (degrees).
+    :param int maxbytes: approximate bound on the memory used at once. Time
+    steps are processed in chunks of this size.
+
+    :returns: :class:`numpy.ndarray` of maximum gust speeds (m/s), shape
+    (lat, lon).
+    """
+    glon, glat = np.meshgrid(np.asarray(lon, dtype=float),
+                             np.asarray(lat, dtype=float))
+    glon, glat = glon.ravel(), glat.ravel()
+    params = trackParameters(track)
+    nsteps = len(params['lon'])
+    chunk = max(1, int(maxbytes // (BYTES_PER_ELEMENT * glon.size)))
+
+    result = np.zeros(glon.size)
+    for start in range(0, nsteps, chunk):
+        sl = slice(start, start + chunk)
+        gust = gustField({k: v[sl] for k, v in params.items()}, glon, glat)
+        np.maximum(result, gust.max(axis=0), out=result)
+    return result.reshape(len(lat), len(lon))
+
+
+def footprints(tracks, lon, lat, freq="1h", workers=1, maxbytes=MAX_BYTES):
+    """
+    Maximum gust footprints of every track in a `pycxml.loadfile` result.
+
+    :param tracks: :class:`pandas.DataFrame`, or list of DataFrames (one per
+    ensemble member), as returned by `pycxml.loadfile`.
+    :param lon: 1-d :class:`numpy.ndarray` of grid longitudes (degrees).
+    :param lat: 1-d :class:`numpy.ndarray` of grid latitudes (degrees).
+    :param freq: time step the tracks are interpolated to before computing
+    the wind field, or None to use the fixes as given.
+    :param int workers: number of worker processes. Members are processed
+    in parallel if greater than 1.
+    :param int maxbytes: see `footprint`. The bound applies to each worker.
+
+    :returns: :class:`numpy.ndarray` of maximum gust speeds (m/s), shape
+    (track, lat, lon), with one track for a deterministic forecast.
+    """
+    frames = list(tracks) if isinstance(tracks, (list, tuple)) else [tracks]
+    if freq is not None:
+        frames = interpolateTracks(frames, freq)
+    func = partial(footprint, lon=lon, lat=lat, maxbytes=maxbytes)
+    log.debug("Computing footprints of %d tracks on a %d x %d grid",
+              len(frames), len(lat), len(lon))
+    if workers <= 1 or len(frames) <= 1:
+        results = list(map(func, frames))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(func, frames))
+    return np.stack(results) if results else \
+        np.zeros((0, len(lat), len(lon)))
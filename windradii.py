@@ -0,0 +1,178 @@
+"""
+windradii - Wind radii held as (fix, threshold, quadrant) arrays
+
+The wind contours of a fix give, for each wind speed threshold, the radius
+to which that wind speed extends in each quadrant. `extractRadii` collects
+the contours of many fixes into a single float array of shape
+(fix, threshold, quadrant), converting thresholds to knots and radii to
+kilometres in bulk, one call to `converter.convert` per distinct unit. The
+derived quantities (`meanRadii`, `asymmetry`, `radiiArea`) are reductions
+over the quadrant axis, so they apply equally to every fix of a large
+ensemble without any Python loops.
+
+"""
+
+import numpy as np
+
+from converter import convertArray
+
+THRESHOLDS = np.array([34, 48, 64])
+THRESHOLD_UNITS = "kt"
+QUADRANTS = ["NEQ", "SEQ", "SWQ", "NWQ"]
+RADII_UNITS = "km"
+
+# Thresholds given in other units (e.g. 17, 25, 33 m/s) do not convert to
+# whole knots, so a threshold is matched to the nearest of THRESHOLDS within
+# this many knots:
+THRESHOLD_TOLERANCE = 1.5
+
+# Quadrant indices covered by each sector. Full-circle radii ("AAA", the
+# default sector in the schema) apply to all four quadrants; semicircles
+# and the cardinal quadrants are not represented.
+SECTORS = {"AAA": [0, 1, 2, 3], "full circle": [0, 1, 2, 3],
+           "NEQ": [0], "northeast quadrant": [0],
+           "SEQ": [1], "southeast quadrant": [1],
+           "SWQ": [2], "southwest quadrant": [2],
+           "NWQ": [3], "northwest quadrant": [3]}
+
+
+def extractRadii(fixes, units=RADII_UNITS):
+    """
+    Extract the wind contours of a sequence of fixes into a single array.
+
+    :param list fixes: `fix` elements.
+    :param str units: units of the returned radii (default "km").
+
+    :returns: :class:`numpy.ndarray` of shape (fix, threshold, quadrant),
+    with thresholds ordered as `THRESHOLDS` and quadrants as `QUADRANTS`.
+    Radii that are not given are NaN.
+    """
+    rows, speeds, speedUnits, radii, radiiUnits, quadrants = \
+        [], [], [], [], [], []
+    for n, fix in enumerate(fixes):
+        for elem in fix.findall('cycloneData/windContours/windSpeed'):
+            if not (elem.text or "").strip():
+                continue
+            for r in elem.findall('radius'):
+                for q in SECTORS.get(r.attrib.get('sector', "AAA"), []):
+                    rows.append(n)
+                    speeds.append(elem.text)
+                    speedUnits.append(elem.attrib.get('units',
+                                                      THRESHOLD_UNITS))
+                    radii.append(r.text if r.text else "nan")
+                    radiiUnits.append(r.attrib.get('units', units))
+                    quadrants.append(q)
+
+    result = np.full((len(fixes), len(THRESHOLDS), len(QUADRANTS)), np.nan)
+    if not rows:
+        return result
+
+    speeds = convertArray(np.array(speeds, dtype=float), speedUnits,
+                          THRESHOLD_UNITS)
+    radii = convertArray(np.array(radii, dtype=float), radiiUnits, units)
+    nearest = np.abs(speeds[:, None] - THRESHOLDS[None, :]).argmin(axis=1)
+    valid = np.abs(speeds - THRESHOLDS[nearest]) <= THRESHOLD_TOLERANCE
+    result[np.array(rows)[valid], nearest[valid],
+           np.array(quadrants)[valid]] = radii[valid]
+    return result
+
+
+def radiiColumns():
+    """
+    Column names for the flattened (threshold, quadrant) axes, in the order
+    of `numpy.reshape`, e.g. "R34NEQ".
+    """
+    return [f"R{t:d}{q}" for t in THRESHOLDS for q in QUADRANTS]
+
+
+def radiiArray(tracks):
+    """
+    Wind radii of a set of tracks as a (..., threshold, quadrant) array.
+
+    :param tracks: :class:`pandas.DataFrame` with the `radiiColumns()`
+    columns (e.g. from `pycxml.loadfile`), or a
+    :class:`compact.CompactEnsemble`.
+
+    :returns: :class:`numpy.ndarray` of shape (fix, threshold, quadrant) for
+    a DataFrame, or (member, leadtime, threshold, quadrant) for a
+    `CompactEnsemble`.
+    """
+    columns = radiiColumns()
+    if hasattr(tracks, 'fields'):
+        index = [tracks.fields.index(c) for c in columns]
+        data = tracks.data[..., index]
+    else:
+        data = tracks.reindex(columns=columns).to_numpy(dtype=float)
+    return data.reshape(data.shape[:-1] +
+                        (len(THRESHOLDS), len(QUADRANTS)))
+
+
+def meanRadii(radii):
+    """
+    Mean radius of each wind threshold, over the quadrants that are given.
+
+    :param radii: array of shape (..., threshold, quadrant).
+
+    :returns: :class:`numpy.ndarray` of shape (..., threshold); NaN where no
+    quadrant is given.
+    """
+    count = np.sum(~np.isnan(radii), axis=-1)
+    total = np.nansum(radii, axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(count > 0, total / count, np.nan)
+
+
+def asymmetry(radii):
+    """
+    Asymmetry of each wind threshold: the difference between the largest and
+    smallest quadrant radius, relative to the mean radius. Zero for a
+    symmetric wind field.
+
+    :param radii: array of shape (..., threshold, quadrant).
+
+    :returns: :class:`numpy.ndarray` of shape (..., threshold); NaN unless
+    all four quadrants are given and the mean radius is positive.
+    """
+    mean = radii.mean(axis=-1)
+    spread = radii.max(axis=-1) - radii.min(axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(mean > 0, spread / mean, np.nan)
+
+
+def radiiArea(radii):
+    """
+    Area enclosed by each wind threshold, treating each quadrant as a
+    quarter circle of the quadrant's radius. Quadrants that are not given
+    contribute no area.
+
+    :param radii: array of shape (..., threshold, quadrant), in km.
+
+    :returns: :class:`numpy.ndarray` of shape (..., threshold), in km^2;
+    NaN where no quadrant is given.
+    """
+    area = np.pi / 4. * np.nansum(radii ** 2, axis=-1)
+    return np.where(np.isnan(radii).all(axis=-1), np.nan, area)
+
+
+def radiiStatistics(tracks):
+    """
+    Mean radius, asymmetry and area of each wind threshold, for every fix of
+    a set of tracks.
+
+    :param tracks: :class:`pandas.DataFrame` with wind radii columns, e.g.
+    from `pycxml.loadfile`.
+
+    :returns: :class:`pandas.DataFrame` with the same index as `tracks`, and
+    columns "R34", "R34asym" and "R34area" (and likewise for the other
+    thresholds).
+    """
+    import pandas as pd
+    radii = radiiArray(tracks)
+    stats = {}
+    for name, values in (("", meanRadii(radii)), ("asym", asymmetry(radii)),
+                         ("area", radiiArea(radii))):
+        for i, t in enumerate(THRESHOLDS):
+            stats[f"R{t:d}{name}"] = values[:, i]
+    columns = [f"R{t:d}{name}" for t in THRESHOLDS
+               for name in ("", "asym", "area")]
+    return pd.DataFrame(stats, index=tracks.index, columns=columns)